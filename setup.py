@@ -33,6 +33,9 @@ setup(name='stellar-py',
       setup_requires=['pytest-runner'],
       tests_require=['pytest'],
       extras_require={
-            'testing': ['httpretty', 'coveralls'],
+            'testing': ['httpretty', 'coveralls', 'pyyaml', 'numpy', 'scipy', 'pandas'],
+            'yaml': ['pyyaml'],
+            'local': ['numpy', 'scipy'],
+            'pandas': ['pandas'],
       },
       packages=find_packages())
@@ -22,6 +22,8 @@ __copyright__ = """
 __license__ = "Apache 2.0"
 
 from .session import create_session
-from .ingestion import create_schema
+from .ingestion import create_schema, create_schema_from_sources
+from .pipeline import create_pipeline
+from .local import create_local_session
 import stellar.model
 import stellar.entity
@@ -0,0 +1,158 @@
+"""Result Cache
+
+Local cache of task results keyed by payload and input files, so identical submissions do not have to be run again
+by the coordinator.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import List, Optional, Tuple
+
+from stellar.payload import Payload
+
+
+def fingerprint(path: str) -> Optional[str]:
+    """Fingerprint of a file or directory from size and modification time of its files
+
+    :param path:    path to file or directory
+    :return:        fingerprint string, or None if the path is not visible from the client, e.g. only mounted on the
+                    coordinator
+    """
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return "{}:{}:{}".format(path, st.st_size, st.st_mtime_ns)
+    if os.path.isdir(path):
+        parts = list()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for f in sorted(files):
+                parts.append(fingerprint(os.path.join(root, f)))
+        return "\n".join(parts)
+    return None
+
+
+def payload_paths(payload: Payload) -> List[str]:
+    """Input paths referred to by a payload
+
+    :param payload: task payload
+    :return:        list of paths
+    """
+    paths = list(getattr(payload, 'sources', []))
+    if hasattr(payload, 'input'):
+        paths.append(payload.input)
+    return sorted(paths)
+
+
+class ResultCache:
+    """SQLite store of successful task results, evicting least recently used entries above a size limit
+
+    Only the metadata of results is stored, and counted towards the size limit. The result graphs stay where the
+    task wrote them, and are not deleted on eviction.
+    """
+    def __init__(self, path: str, max_bytes: int = 16 * 1024 * 1024) -> None:
+        """Initialise
+
+        :param path:        path to SQLite database file
+        :param max_bytes:   maximum total size of cached entries, not including their result graphs
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, task TEXT, session_id TEXT, "
+                         "status TEXT, dir TEXT, size INTEGER, accessed REAL)")
+
+    def __repr__(self):
+        return "ResultCache(path=\"{}\")".format(self.path)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def key(task_name: str, payload: Payload) -> Optional[str]:
+        """Cache key of a task from its payload without session ID and the fingerprints of its inputs
+
+        :param task_name:   name of task
+        :param payload:     task payload
+        :return:            cache key, or None if an input cannot be fingerprinted, so changes to it would go unnoticed
+        """
+        h = hashlib.sha256(task_name.encode('utf-8'))
+        h.update(json.dumps({k: v for k, v in payload.__dict__.items() if k != 'sessionId'},
+                            sort_keys=True, separators=(',', ':')).encode('utf-8'))
+        for path in payload_paths(payload):
+            fp = fingerprint(path)
+            if fp is None:
+                return None
+            h.update(fp.encode('utf-8'))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str, str]]:
+        """Look up a cached result
+
+        :param key:     cache key
+        :return:        tuple of (session ID, status, output path), or None if not cached or the output is gone
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT session_id, status, dir FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row[2]):
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def put(self, key: str, task_name: str, session_id: str, status: str, output: str) -> None:
+        """Store a result, then evict least recently used entries above the size limit
+
+        :param key:         cache key
+        :param task_name:   name of task
+        :param session_id:  session ID of the task
+        :param status:      final status of the task
+        :param output:      path to result graph
+        """
+        size = len(key) + len(task_name) + len(session_id) + len(status) + len(output)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, task_name, session_id, status, output, size, time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            for k, s in conn.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM results WHERE key = ?", (k,))
+                total -= s
+
+    def clear(self) -> None:
+        """Remove all cached results
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM results")
@@ -0,0 +1,227 @@
+"""Diff
+
+Differences between two EPGM directories, e.g. the input and output graphs of an ER or NAI task. The elements of the
+last graph of each directory are sorted by ID with an external merge sort, spilling sorted runs to temporary files when
+there are more than fit in a run, and the two sorted streams are then merge-joined. Only one run of elements, and the
+differences found, are held in memory.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import heapq
+import json
+import os
+import tempfile
+from contextlib import ExitStack
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import stellar.epgm as epgm
+
+GraphElement = Dict[str, Any]
+
+# elements sorted in memory at a time
+RUN_SIZE = 100000
+
+
+class ElementDiff:
+    """Differences between the elements of one kind of two graphs
+
+    Attributes:
+        added (List[str]):      IDs of elements only in the other graph
+        removed (List[str]):    IDs of elements only in this graph
+        changed (Dict[str, Dict[str, Tuple[Any, Any]]]):    (old, new) value of each differing attribute of elements
+            in both graphs, by element ID. Differing labels, sources and targets are reported under the keys ':label',
+            ':source' and ':target', and a missing attribute has the value None.
+    """
+    def __init__(self) -> None:
+        self.added = list()  # type: List[str]
+        self.removed = list()  # type: List[str]
+        self.changed = dict()  # type: Dict[str, Dict[str, Tuple[Any, Any]]]
+
+    def __repr__(self):
+        return "ElementDiff(added={},removed={},changed={})".format(
+            len(self.added), len(self.removed), len(self.changed))
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+class GraphDiff:
+    """Differences between two graphs
+
+    Attributes:
+        vertices (ElementDiff):     differences between vertices
+        edges (ElementDiff):        differences between edges
+    """
+    def __init__(self, vertices: ElementDiff, edges: ElementDiff) -> None:
+        self.vertices = vertices
+        self.edges = edges
+
+    def __repr__(self):
+        return "GraphDiff(vertices={},edges={})".format(self.vertices, self.edges)
+
+    def __bool__(self):
+        return bool(self.vertices or self.edges)
+
+
+def _write_run(run: List[Tuple[Any, str]], workdir: str, index: int) -> str:
+    """Write a sorted run of elements to a temporary file, one key and JSON element per line
+
+    :param run:         sorted list of (key, JSON line)
+    :param workdir:     directory of temporary files
+    :param index:       run number
+    :return:            path of run file
+    """
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, 'run{}'.format(index))
+    with open(path, 'w', encoding='utf-8') as fp:
+        for key, line in run:
+            fp.write(json.dumps(key))  # JSON cannot contain a raw tab
+            fp.write('\t')
+            fp.write(line)
+            fp.write('\n')
+    return path
+
+
+def _read_run(fp) -> Iterator[Tuple[Any, str]]:
+    for line in fp:
+        key, element = line.split('\t', 1)
+        yield json.loads(key), element.rstrip('\n')
+
+
+def external_sort(items: Iterable[Tuple[Any, str]], workdir: str, stack: ExitStack,
+                  run_size: int = RUN_SIZE) -> Iterator[Tuple[Any, str]]:
+    """Sort JSON lines by key with an external merge sort. Lines with equal keys stay in input order.
+
+    :param items:       iterator of (key, JSON line without newline). Keys are strings or lists of strings
+    :param workdir:     directory of temporary run files
+    :param stack:       exit stack closing the run files
+    :param run_size:    number of lines sorted in memory at a time
+    :return:            iterator of (key, JSON line) in key order
+    """
+    runs = list()  # type: List[str]
+    run = list()  # type: List[Tuple[Any, str]]
+    for item in items:
+        run.append(item)
+        if len(run) >= run_size:
+            run.sort(key=itemgetter(0))
+            runs.append(_write_run(run, workdir, len(runs)))
+            run = list()
+    run.sort(key=itemgetter(0))  # stable, so later versions stay last
+    if not runs:
+        return iter(run)
+    runs.append(_write_run(run, workdir, len(runs)))
+    streams = [_read_run(stack.enter_context(open(r, 'r', encoding='utf-8'))) for r in runs]
+    return heapq.merge(*streams, key=itemgetter(0))  # ties keep run order, so later versions stay last
+
+
+def sorted_elements(path: str, kind: str, graph_id: str, workdir: str, stack: ExitStack,
+                    run_size: int = RUN_SIZE) -> Iterator[Tuple[str, GraphElement]]:
+    """Elements of a graph sorted by ID, with only the last version of elements appearing more than once
+
+    :param path:        EPGM directory
+    :param kind:        'vertices' | 'edges'
+    :param graph_id:    ID of the graph whose elements are sorted
+    :param workdir:     directory of temporary run files
+    :param stack:       exit stack closing the run files
+    :param run_size:    number of elements sorted in memory at a time
+    :return:            iterator of (ID, element) in ID order
+    """
+    def members() -> Iterator[Tuple[str, str]]:
+        for line in epgm.iter_lines(path, kind):
+            if graph_id not in line:
+                continue
+            element = json.loads(line)
+            if graph_id in element['meta'].get('graphs', []):
+                yield element['id'], line.rstrip('\n')
+
+    previous = None  # type: Optional[Tuple[str, str]]
+    for item in external_sort(members(), workdir, stack, run_size):
+        if previous is not None and previous[0] != item[0]:
+            yield previous[0], json.loads(previous[1])
+        previous = item
+    if previous is not None:
+        yield previous[0], json.loads(previous[1])
+
+
+def _changes(old: GraphElement, new: GraphElement) -> Dict[str, Tuple[Any, Any]]:
+    """Differing attributes of two versions of an element
+
+    :param old:     element in this graph
+    :param new:     element in the other graph
+    :return:        (old, new) value of each differing attribute
+    """
+    changes = dict()
+    for k in set(old['data']) | set(new['data']):
+        if k not in old['data'] or k not in new['data'] or old['data'][k] != new['data'][k]:
+            changes[k] = (old['data'].get(k), new['data'].get(k))
+    if old['meta'].get('label') != new['meta'].get('label'):
+        changes[':label'] = (old['meta'].get('label'), new['meta'].get('label'))
+    for k in ('source', 'target'):
+        if old.get(k) != new.get(k):
+            changes[':' + k] = (old.get(k), new.get(k))
+    return changes
+
+
+def merge_join(left: Iterator[Tuple[str, GraphElement]], right: Iterator[Tuple[str, GraphElement]]) -> ElementDiff:
+    """Compare two streams of elements sorted by ID
+
+    :param left:    (ID, element) of this graph
+    :param right:   (ID, element) of the other graph
+    :return:        differences
+    """
+    result = ElementDiff()
+    a, b = next(left, None), next(right, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            result.removed.append(a[0])
+            a = next(left, None)
+        elif a is None or b[0] < a[0]:
+            result.added.append(b[0])
+            b = next(right, None)
+        else:
+            changes = _changes(a[1], b[1])
+            if changes:
+                result.changed[a[0]] = changes
+            a, b = next(left, None), next(right, None)
+    return result
+
+
+def diff(path: str, other_path: str, run_size: int = RUN_SIZE, workdir: Optional[str] = None) -> GraphDiff:
+    """Differences between the last graphs of two EPGM directories
+
+    :param path:        EPGM directory of this graph
+    :param other_path:  EPGM directory of the other graph
+    :param run_size:    number of elements sorted in memory at a time
+    :param workdir:     directory of temporary run files. Defaulted to the system temporary directory
+    :return:            differences
+    """
+    graph_ids = [list(epgm.iter_elements(p, 'graphs'))[-1]['id'] for p in (path, other_path)]
+    kinds = dict()
+    for kind in ('vertices', 'edges'):
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp, ExitStack() as stack:
+            left, right = [sorted_elements(p, kind, g, os.path.join(tmp, str(i)), stack, run_size)
+                           for i, (p, g) in enumerate(zip((path, other_path), graph_ids))]
+            kinds[kind] = merge_join(left, right)
+    return GraphDiff(kinds['vertices'], kinds['edges'])
@@ -0,0 +1,234 @@
+"""Embeddings
+
+Node embeddings exported with NAI results, stored in the EPGM directory as a float32 NumPy matrix with one row per
+vertex, and the vertex IDs of the rows. The matrix is memory-mapped rather than read, so opening the embeddings of a
+large graph is immediate and rows are paged in as they are used. Requires NumPy.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+MATRIX_FILE = 'embeddings.npy'
+IDS_FILE = 'embeddings.ids.json'
+INDEX_FILE = 'embeddings.ivf.npz'
+
+# rows multiplied at a time in exact searches, to bound memory
+_BLOCK_ROWS = 65536
+
+
+def write_embeddings(path: str, ids: List[str], matrix: np.ndarray) -> None:
+    """Write embeddings to an EPGM directory
+
+    :param path:    EPGM directory
+    :param ids:     vertex ID of each row
+    :param matrix:  matrix with one embedding per row
+    """
+    if len(ids) != len(matrix):
+        raise ValueError("{} IDs for {} embeddings".format(len(ids), len(matrix)))
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, MATRIX_FILE), np.ascontiguousarray(matrix, dtype=np.float32))
+    with open(os.path.join(path, IDS_FILE), 'w', encoding='utf-8') as fp:
+        json.dump(list(ids), fp)
+
+
+def has_embeddings(path: str) -> bool:
+    """Check that an EPGM directory has embeddings
+
+    :param path:    EPGM directory
+    :return:        true if embeddings were exported
+    """
+    return os.path.isfile(os.path.join(path, MATRIX_FILE)) and os.path.isfile(os.path.join(path, IDS_FILE))
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows with the highest scores, best first
+
+    :param scores:  score of each row
+    :param rows:    row numbers
+    :param k:       number of rows
+    :return:        (rows, scores)
+    """
+    if k < len(scores):
+        best = np.argpartition(-scores, k)[:k]
+        scores, rows = scores[best], rows[best]
+    order = np.argsort(-scores, kind='stable')
+    return rows[order], scores[order]
+
+
+class EmbeddingStore:
+    """Memory-mapped embeddings of the vertices of a graph
+
+    Attributes:
+        path (str):             EPGM directory
+        ids (List[str]):        vertex ID of each row
+        matrix (np.ndarray):    read-only memory-mapped float32 matrix with one embedding per row
+    """
+    def __init__(self, path: str) -> None:
+        if not has_embeddings(path):
+            raise FileNotFoundError("No embeddings in {}".format(path))
+        self.path = path
+        self.matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode='r')
+        with open(os.path.join(path, IDS_FILE), 'r', encoding='utf-8') as fp:
+            self.ids = json.load(fp)  # type: List[str]
+        self._rows = None  # type: Optional[Dict[str, int]]
+        self._index = None  # type: Optional[IVFIndex]
+
+    def __repr__(self):
+        return "EmbeddingStore(path=\"{}\",rows={},dimensions={})".format(self.path, *self.matrix.shape)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, vertex_id: str) -> int:
+        """Row of a vertex
+
+        :param vertex_id:   vertex ID
+        :return:            row number
+        """
+        if self._rows is None:
+            self._rows = {v: i for i, v in enumerate(self.ids)}
+        return self._rows[vertex_id]
+
+    def __getitem__(self, vertex_id: str) -> np.ndarray:
+        return self.matrix[self.row(vertex_id)]
+
+    def build_index(self, lists: Optional[int] = None, iterations: int = 10, seed: Optional[int] = None) -> 'IVFIndex':
+        """Build and save an inverted-file index of the embeddings for approximate nearest-neighbour queries
+
+        :param lists:       number of clusters. Defaulted to the square root of the number of rows
+        :param iterations:  number of k-means iterations
+        :param seed:        random seed
+        :return:            index
+        """
+        self._index = IVFIndex.build(_normalized(np.asarray(self.matrix)), lists, iterations, seed)
+        self._index.save(os.path.join(self.path, INDEX_FILE))
+        return self._index
+
+    @property
+    def index(self) -> Optional['IVFIndex']:
+        """Saved nearest-neighbour index, if one was built"""
+        if self._index is None and os.path.isfile(os.path.join(self.path, INDEX_FILE)):
+            self._index = IVFIndex.load(os.path.join(self.path, INDEX_FILE))
+        return self._index
+
+    def nearest(self, query: Union[str, np.ndarray], k: int = 10, probes: int = 8,
+                exact: bool = False) -> List[Tuple[str, float]]:
+        """Vertices with the most similar embeddings, by cosine similarity.
+
+        Uses the saved index when there is one, searching the clusters closest to the query, and otherwise compares
+        the query with every row.
+
+        :param query:   vertex ID, or embedding
+        :param k:       number of vertices
+        :param probes:  number of index clusters searched
+        :param exact:   compare with every row even if there is an index
+        :return:        list of (vertex ID, similarity), most similar first, excluding a query vertex itself
+        """
+        skip = None
+        if isinstance(query, str):
+            skip = self.row(query)
+            query = self.matrix[skip]
+        query = _normalized(np.asarray(query, dtype=np.float32)[None, :])[0]
+        wanted = k + (skip is not None)
+        if self.index is not None and not exact:
+            rows = self.index.candidates(query, probes)
+            rows, scores = _top_k(_normalized(np.asarray(self.matrix[rows])) @ query, rows, wanted)
+        else:
+            rows, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            for start in range(0, len(self), _BLOCK_ROWS):
+                block = _normalized(np.asarray(self.matrix[start:start + _BLOCK_ROWS])) @ query
+                rows, scores = _top_k(np.concatenate([scores, block]),
+                                      np.concatenate([rows, np.arange(start, start + len(block))]), wanted)
+        return [(self.ids[r], float(s)) for r, s in zip(rows, scores) if r != skip][:k]
+
+
+class IVFIndex:
+    """Inverted-file index: rows clustered by spherical k-means, so that queries only compare rows of nearby clusters
+
+    Attributes:
+        centroids (np.ndarray):     unit-length centroid of each cluster
+        offsets (np.ndarray):       start of each cluster's rows in rows, and the end of the last
+        rows (np.ndarray):          row numbers, grouped by cluster
+    """
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray) -> None:
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    def __repr__(self):
+        return "IVFIndex(lists={},rows={})".format(len(self.centroids), len(self.rows))
+
+    @classmethod
+    def build(cls, normalized: np.ndarray, lists: Optional[int] = None, iterations: int = 10,
+              seed: Optional[int] = None) -> 'IVFIndex':
+        """Cluster rows
+
+        :param normalized:  matrix of unit-length rows
+        :param lists:       number of clusters. Defaulted to the square root of the number of rows
+        :param iterations:  number of k-means iterations
+        :param seed:        random seed
+        :return:            index
+        """
+        rng = np.random.default_rng(seed)
+        lists = max(1, min(lists or int(np.sqrt(len(normalized))), len(normalized)))
+        centroids = normalized[rng.choice(len(normalized), lists, replace=False)]
+        for _ in range(iterations):
+            assignment = (normalized @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, normalized)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalized(sums)
+        assignment = (normalized @ centroids.T).argmax(axis=1)
+        rows = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=lists), out=offsets[1:])
+        return cls(centroids.astype(np.float32), offsets, rows.astype(np.int64))
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """Rows of the clusters closest to a query
+
+        :param query:   unit-length query
+        :param probes:  number of clusters
+        :return:        row numbers
+        """
+        closest = np.argsort(-(self.centroids @ query))[:probes]
+        return np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in closest])
+
+    def save(self, path: str) -> None:
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, rows=self.rows)
+
+    @classmethod
+    def load(cls, path: str) -> 'IVFIndex':
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['rows'])
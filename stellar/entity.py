@@ -25,7 +25,7 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
-from typing import Dict
+from typing import Dict, List, Optional
 
 
 class StellarEntityResolver:
@@ -39,6 +39,32 @@ class StellarEntityResolver:
 class EntityResolution(StellarEntityResolver):
     """Entity Resolution using SERF
 
+    Parameters trade recall for runtime: vertices are only compared with vertices sharing a block, and fewer, smaller
+    blocks mean fewer comparisons. Parameters left as None are not sent, and the module's defaults are used.
     """
-    def __init__(self):
-        StellarEntityResolver.__init__(self, {})
+    def __init__(self, blocking_keys: Optional[List[str]] = None, max_block_size: Optional[int] = None,
+                 max_candidates: Optional[int] = None, num_perm: Optional[int] = None,
+                 bands: Optional[int] = None) -> None:
+        """Initialise
+
+        :param blocking_keys:   attributes to block on. Defaulted to the attributes with thresholds
+        :param max_block_size:  blocks with more vertices are skipped as uninformative
+        :param max_candidates:  maximum number of later vertices, in input order, each vertex is compared with. A
+                                vertex can still be compared with more vertices before it
+        :param num_perm:        number of MinHash functions used for blocking
+        :param bands:           number of LSH bands the MinHash signatures are split into; more bands find more
+                                candidates
+        """
+        params = {
+            'blocking_keys': blocking_keys,
+            'max_block_size': max_block_size,
+            'max_candidates': max_candidates,
+            'num_perm': num_perm,
+            'bands': bands
+        }
+        for name in ('max_block_size', 'max_candidates', 'num_perm', 'bands'):
+            if params[name] is not None and params[name] < 1:
+                raise ValueError("{} must be positive".format(name))
+        if num_perm is not None and bands is not None and num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        StellarEntityResolver.__init__(self, {k: v for k, v in params.items() if v is not None})
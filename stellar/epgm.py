@@ -0,0 +1,164 @@
+"""EPGM
+
+Methods for streaming, writing and merging EPGM directories, which hold a graphs.json, vertices.json and edges.json file
+with one JSON element per line.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Iterable, Iterator, Optional, Tuple
+
+GraphElement = Dict[str, any]
+
+KINDS = ('graphs', 'vertices', 'edges')
+
+# vertex attribute holding the ID of the node in its data source
+ID_ATTRIBUTE = '__id'
+
+
+def element_path(path: str, kind: str) -> str:
+    """Path to the file of an element kind
+
+    :param path:    EPGM directory
+    :param kind:    'graphs' | 'vertices' | 'edges'
+    :return:        file path
+    """
+    return os.path.join(path, kind + '.json')
+
+
+def new_id() -> str:
+    """Generate a new element ID
+
+    :return:    ID in the format used by Stellar
+    """
+    return uuid.uuid4().hex.upper()
+
+
+def iter_lines(path: str, kind: str) -> Iterator[str]:
+    """Stream raw lines of an element file, skipping blank lines
+
+    :param path:    EPGM directory
+    :param kind:    'graphs' | 'vertices' | 'edges'
+    :return:        iterator of JSON lines
+    """
+    with open(element_path(path, kind), 'r', encoding='utf-8') as fp:
+        for line in fp:
+            if line.strip():
+                yield line
+
+
+def iter_elements(path: str, kind: str) -> Iterator[GraphElement]:
+    """Stream elements of an element file
+
+    :param path:    EPGM directory
+    :param kind:    'graphs' | 'vertices' | 'edges'
+    :return:        iterator of elements
+    """
+    return (json.loads(line) for line in iter_lines(path, kind))
+
+
+def write_elements(path: str, kind: str, elements: Iterable[GraphElement], append: bool = False) -> int:
+    """Write elements to an element file, one JSON element per line
+
+    :param path:        EPGM directory, created if it does not exist
+    :param kind:        'graphs' | 'vertices' | 'edges'
+    :param elements:    elements to write
+    :param append:      add the elements to the end of the file instead of replacing it
+    :return:            number of elements written
+    """
+    os.makedirs(path, exist_ok=True)
+    count = 0
+    with open(element_path(path, kind), 'a' if append else 'w', encoding='utf-8') as fp:
+        for element in elements:
+            fp.write(json.dumps(element, separators=(',', ':')))
+            fp.write('\n')
+            count += 1
+    return count
+
+
+def graph_head(label: str, graph_id: str = None) -> GraphElement:
+    """Create a graph head element
+
+    :param label:       graph label
+    :param graph_id:    graph ID. Defaulted to a new ID
+    :return:            graph element
+    """
+    return {'data': {'timestamp': int(time.time())}, 'meta': {'label': label}, 'id': graph_id or new_id()}
+
+
+def merge(paths: List[str], output_path: str, label: str, key: Optional[str] = None) -> str:
+    """Merge EPGM directories into one, with a new graph containing all their elements.
+
+    Elements with the same ID are merged into one: their data is combined and their graph membership is unioned.
+    With a key attribute, vertices with the same label and key value are merged too, e.g. the vertices of one source
+    node ingested in different shards, and edge endpoints are changed to the merged vertices. Graph heads of the inputs
+    are kept, and the new graph is added last.
+
+    :param paths:           EPGM directories to merge
+    :param output_path:     output EPGM directory
+    :param label:           label of the new graph
+    :param key:             vertex attribute identifying the same vertex across inputs, e.g. ID_ATTRIBUTE
+    :return:                ID of the new graph
+    """
+    head = graph_head(label)
+    graphs = OrderedDict()
+    for path in paths:
+        for g in iter_elements(path, 'graphs'):
+            graphs.setdefault(g['id'], g)
+    graphs[head['id']] = head
+    write_elements(output_path, 'graphs', graphs.values())
+
+    def add(elements: Dict, identity, el: GraphElement) -> GraphElement:
+        merged = elements.get(identity)
+        if merged is None:
+            el['meta']['graphs'] = list(el['meta'].get('graphs', [])) + [head['id']]
+            elements[identity] = el
+            return el
+        merged['data'].update(el['data'])
+        merged['meta']['graphs'] += [g for g in el['meta'].get('graphs', []) if g not in merged['meta']['graphs']]
+        return merged
+
+    vertices = OrderedDict()  # type: Dict[Tuple, GraphElement]
+    renamed = list()  # type: List[Dict[str, str]]
+    for path in paths:
+        ids = dict()  # type: Dict[str, str]
+        for el in iter_elements(path, 'vertices'):
+            identity = (el['meta'].get('label'), el['data'][key]) if key in el['data'] else (None, el['id'])
+            merged_id = add(vertices, identity, el)['id']
+            if merged_id != el['id']:
+                ids[el['id']] = merged_id
+        renamed.append(ids)
+    write_elements(output_path, 'vertices', vertices.values())
+
+    edges = OrderedDict()  # type: Dict[str, GraphElement]
+    for path, ids in zip(paths, renamed):
+        for el in iter_elements(path, 'edges'):
+            el['source'], el['target'] = ids.get(el['source'], el['source']), ids.get(el['target'], el['target'])
+            add(edges, el['id'], el)
+    write_elements(output_path, 'edges', edges.values())
+    return head['id']
@@ -40,5 +40,7 @@ class StellarERPayload(Payload):
         Payload.__init__(self, session_id, label)
         self.input = graph.path
 
-        # no parameters
-        print("WARNING: Current version does not allow tuning of ER parameters. Continuing with default parameters...")
+        for attribute, threshold in (attribute_thresholds or {}).items():
+            if not 0 <= threshold <= 1:
+                raise ValueError("threshold of '{}' must be between 0 and 1".format(attribute))
+        self.parameters = dict(resolver.params, attribute_thresholds=attribute_thresholds or {})
@@ -29,7 +29,15 @@ import networkx as nx
 import os
 import json
 import re
-from typing import Dict, List, Tuple, Optional
+import tempfile
+import time
+from contextlib import ExitStack
+from typing import Dict, Iterator, List, Tuple, Optional, Set
+
+from stellar.instrument import span
+import stellar.epgm as epgm
+import stellar.sampling as sampling
+from stellar.diff import GraphDiff, RUN_SIZE, diff, external_sort
 
 GraphElement = Dict[str, any]
 EPGM = Dict[str, List[GraphElement]]
@@ -38,10 +46,17 @@ GraphDict = Dict[str, Tuple]
 
 class StellarGraph:
     """Reference to a Stellar Graph
+
+    Attributes:
+        path (str):     EPGM directory
+        label (str):    graph label
+        model:          for the output of StellarSession.predict, the model with the artifact of the trained model,
+                        to reuse for inference on other graphs. Otherwise None.
     """
     def __init__(self, path: str, label: str):
         self.path = path
         self.label = label
+        self.model = None
 
     def __repr__(self):
         m = re.search("([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})", self.path)
@@ -58,10 +73,19 @@ class StellarGraph:
 
         g = {'graphs': list(), 'vertices': list(), 'edges': list()}
 
-        for k in g.keys():
-            fname = os.path.join(self.path, str(k) + '.json')
-            with open(fname, 'r', encoding='utf-8') as fp:
-                g[k] = [json.loads(l) for l in fp.readlines()]
+        with span('graph.load', path=self.path) as s:
+            read_bytes, parse_time = 0, 0.0
+            for k in g.keys():
+                fname = os.path.join(self.path, str(k) + '.json')
+                with open(fname, 'r', encoding='utf-8') as fp:
+                    lines = fp.readlines()
+                begin = time.perf_counter()
+                g[k] = [json.loads(l) for l in lines]
+                parse_time += time.perf_counter() - begin
+                read_bytes += os.path.getsize(fname)
+            s.set_attribute('bytes', read_bytes)
+            s.set_attribute('elements', sum(len(v) for v in g.values()))
+            s.set_attribute('parse_time', parse_time)
 
         return g
 
@@ -97,12 +121,172 @@ class StellarGraph:
         :param inc_type_as:     Specify name of "type" attribute to include it as an attribute
         :return:                networkx MultiDiGraph
         """
-        graph_dict = self._load_graph(meta_keys={inc_type_as: 'label'}) if inc_type_as else self._load_graph()
-        g = nx.MultiDiGraph()
-        g.add_nodes_from(graph_dict['vertices'])
-        g.add_edges_from(graph_dict['edges'])
+        with span('graph.to_networkx', path=self.path):
+            graph_dict = self._load_graph(meta_keys={inc_type_as: 'label'}) if inc_type_as else self._load_graph()
+            g = nx.MultiDiGraph()
+            g.add_nodes_from(graph_dict['vertices'])
+            g.add_edges_from(graph_dict['edges'])
         return g
 
+    def read_attribute(self, name: str, node_type: Optional[str] = None, as_series: bool = False):
+        """Read one attribute of the vertices of the graph, e.g. the target attribute after predict.
+
+        Only the vertex file is read. Lines that cannot be vertices of the graph with the attribute, because they do
+        not contain the graph ID, the attribute name and the node type, are skipped without being decoded.
+
+        :param name:        attribute name
+        :param node_type:   vertex label. Defaulted to all vertices
+        :param as_series:   return a pandas Series indexed by vertex ID. Requires pandas.
+        :return:            dict of attribute value by vertex ID, for the vertices that have one
+        """
+        graph_id = list(epgm.iter_elements(self.path, 'graphs'))[-1]['id']
+        # non-ASCII text is escaped or not depending on how the file was written
+        keys = set(json.dumps(name, ensure_ascii=a) for a in (True, False))
+        label = None
+        if node_type is not None:
+            types = '|'.join(re.escape(json.dumps(node_type, ensure_ascii=a)) for a in (True, False))
+            label = re.compile(r'"label"\s*:\s*(?:' + types + ')')
+        values = dict()
+        with span('graph.read_attribute', path=self.path, attribute=name) as s:
+            decoded = 0
+            for line in epgm.iter_lines(self.path, 'vertices'):
+                if not any(k in line for k in keys) or graph_id not in line or \
+                        (label is not None and not label.search(line)):
+                    continue
+                decoded += 1
+                v = json.loads(line)
+                if name in v['data'] and graph_id in v['meta']['graphs'] and \
+                        (node_type is None or v['meta']['label'] == node_type):
+                    values[v['id']] = v['data'][name]
+            s.set_attribute('decoded', decoded)
+        if as_series:
+            import pandas as pd
+            return pd.Series(values, name=name, dtype=object)
+        return values
+
+    def compact(self, output_path: str, keep: Optional[List[str]] = None, sort: bool = False,
+                run_size: int = RUN_SIZE, workdir: Optional[str] = None) -> 'StellarGraph':
+        """Write a compacted copy of the EPGM directory.
+
+        Only graphs with the given labels are kept, along with the elements belonging to them. Graph membership of each
+        element is reduced to the kept graphs, and only the last version of elements appearing more than once is kept.
+        Elements are streamed twice: first to find the line of the last version of each element, then to write them.
+
+        :param output_path: Output EPGM directory
+        :param keep:        Labels of graphs to keep. Defaulted to keep all graphs
+        :param sort:        Sort vertices by ID and edges by source, for faster lookups when loading
+        :param run_size:    number of elements sorted in memory at a time
+        :param workdir:     directory of temporary files when sorting. Defaulted to the system temporary directory
+        :return:            Compacted graph object
+        """
+        heads = [g for g in epgm.iter_elements(self.path, 'graphs') if keep is None or g['meta']['label'] in keep]
+        graph_ids = set(g['id'] for g in heads)
+
+        def last_versions(kind: str) -> Dict[str, int]:
+            lines = dict()
+            for i, el in enumerate(epgm.iter_elements(self.path, kind)):
+                if any(g in graph_ids for g in el['meta'].get('graphs', [])):
+                    lines[el['id']] = i
+                else:
+                    lines.pop(el['id'], None)
+            return lines
+
+        def kept(kind: str, lines: Dict[str, int]) -> Iterator[GraphElement]:
+            for i, el in enumerate(epgm.iter_elements(self.path, kind)):
+                if lines.get(el['id']) != i:
+                    continue
+                if kind == 'edges' and (el['source'] not in vertices or el['target'] not in vertices):
+                    continue
+                el['meta']['graphs'] = [g for g in el['meta']['graphs'] if g in graph_ids]
+                yield el
+
+        def sorted_by(kind: str, lines: Dict[str, int], key) -> Iterator[GraphElement]:
+            items = ((key(el), json.dumps(el, separators=(',', ':'))) for el in kept(kind, lines))
+            for _, line in external_sort(items, os.path.join(tmp, kind), stack, run_size):
+                yield json.loads(line)
+
+        vertices = last_versions('vertices')
+        edges = last_versions('edges')
+        epgm.write_elements(output_path, 'graphs', heads)
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp, ExitStack() as stack:
+            if sort:
+                epgm.write_elements(output_path, 'vertices', sorted_by('vertices', vertices, lambda v: v['id']))
+                epgm.write_elements(output_path, 'edges', sorted_by('edges', edges, lambda e: [e['source'], e['id']]))
+            else:
+                epgm.write_elements(output_path, 'vertices', kept('vertices', vertices))
+                epgm.write_elements(output_path, 'edges', kept('edges', edges))
+        return StellarGraph(output_path, self.label)
+
+    def _write_sample(self, vertices: Set[str], output_path: str, label: Optional[str]) -> 'StellarGraph':
+        with span('graph.sample', path=self.path, vertices=len(vertices)):
+            sampling.write_subgraph(self.path, vertices, output_path, label or self.label)
+        return StellarGraph(output_path, label or self.label)
+
+    def k_hop(self, seeds: List[str], k: int, output_path: str, node_types: Optional[List[str]] = None,
+              label: Optional[str] = None) -> 'StellarGraph':
+        """Extract the neighbourhood of some vertices, e.g. the nodes to predict attributes of
+
+        :param seeds:           IDs of seed vertices
+        :param k:               number of hops, ignoring edge direction
+        :param output_path:     output EPGM directory
+        :param node_types:      vertex labels that can be reached. Defaulted to all vertices
+        :param label:           label of the new graph. Defaulted to the label of this graph
+        :return:                subgraph
+        """
+        return self._write_sample(sampling.k_hop(self.path, seeds, k, node_types), output_path, label)
+
+    def subgraph(self, node_types: List[str], output_path: str, label: Optional[str] = None) -> 'StellarGraph':
+        """Extract the subgraph of some vertex types
+
+        :param node_types:      vertex labels to keep
+        :param output_path:     output EPGM directory
+        :param label:           label of the new graph. Defaulted to the label of this graph
+        :return:                subgraph
+        """
+        return self._write_sample(set(sampling.vertex_ids(self.path, node_types)), output_path, label)
+
+    def sample(self, size: int, output_path: str, method: str = 'uniform', node_types: Optional[List[str]] = None,
+               seed: Optional[int] = None, label: Optional[str] = None) -> 'StellarGraph':
+        """Extract the subgraph induced by a sample of vertices
+
+        :param size:            number of vertices
+        :param output_path:     output EPGM directory
+        :param method:          'uniform' | 'forest_fire'
+        :param node_types:      vertex labels to sample from. Defaulted to all vertices
+        :param seed:            random seed
+        :param label:           label of the new graph. Defaulted to the label of this graph
+        :return:                subgraph
+        """
+        if method == 'uniform':
+            vertices = sampling.uniform(self.path, size, node_types, seed)
+        elif method == 'forest_fire':
+            vertices = sampling.forest_fire(self.path, size, node_types=node_types, seed=seed)
+        else:
+            raise ValueError("Unknown sampling method '{}'".format(method))
+        return self._write_sample(vertices, output_path, label)
+
+    def diff(self, other: 'StellarGraph', run_size: int = RUN_SIZE, workdir: Optional[str] = None) -> GraphDiff:
+        """Differences with another graph, e.g. the output of entity_resolution or predict on this graph.
+
+        The elements of both graphs are streamed and sorted by ID, in runs spilled to temporary files for large graphs,
+        and then merge-joined, so neither graph is loaded whole.
+
+        :param other:       other graph
+        :param run_size:    number of elements sorted in memory at a time
+        :param workdir:     directory of temporary files. Defaulted to the system temporary directory
+        :return:            added, removed and changed vertices and edges, from this graph to the other
+        """
+        with span('graph.diff', path=self.path, other=other.path):
+            return diff(self.path, other.path, run_size, workdir)
+
+    def embeddings(self):
+        """Node embeddings exported with the graph by predict(..., export_embeddings=True). Requires NumPy.
+
+        :return:    stellar.embeddings.EmbeddingStore, memory-mapping the embeddings
+        """
+        from stellar.embeddings import EmbeddingStore
+        return EmbeddingStore(self.path)
+
     def to_graphml(self, filepath: str, inc_type_as: Optional[str] = None) -> bool:
         """Write graph out to GraphML format
 
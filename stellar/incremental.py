@@ -0,0 +1,305 @@
+"""Incremental Ingestion
+
+Checkpoints of append-only data sources, so that only rows appended since the last ingestion have to be ingested, and
+an index of the vertices ingested so far by type and source ID, so that the new elements can be appended to the graph.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, BinaryIO
+
+import stellar.epgm as epgm
+
+Watermark = Dict[str, any]
+
+_BLOCK_SIZE = 64 * 1024
+
+# source IDs per lookup query, below the SQLite limit on query parameters
+_LOOKUP_SIZE = 500
+
+
+def _line_start(fp: BinaryIO, end: int) -> int:
+    """Find the start of the line ending at an offset
+
+    :param fp:      binary file object
+    :param end:     offset just after the line's newline
+    :return:        offset of the first byte of the line
+    """
+    pos = end - 1  # skip the newline ending the line
+    while pos > 0:
+        size = min(_BLOCK_SIZE, pos)
+        fp.seek(pos - size)
+        i = fp.read(size).rfind(b'\n')
+        if i >= 0:
+            return pos - size + i + 1
+        pos -= size
+    return 0
+
+
+def _complete_end(fp: BinaryIO, size: int) -> int:
+    """Find the end of the last complete line, ignoring a partially written last line
+
+    :param fp:      binary file object
+    :param size:    file size
+    :return:        offset just after the last newline
+    """
+    if size == 0:
+        return 0
+    fp.seek(size - 1)
+    if fp.read(1) == b'\n':
+        return size
+    return _line_start(fp, size + 1)
+
+
+def _checksum(fp: BinaryIO, offset: int) -> str:
+    """Hash of the line ending at an offset
+
+    :param fp:      binary file object
+    :param offset:  offset just after the line's newline
+    :return:        checksum
+    """
+    start = _line_start(fp, offset)
+    fp.seek(start)
+    return hashlib.sha1(fp.read(offset - start)).hexdigest()
+
+
+def watermark(path: str) -> Watermark:
+    """High-water mark at the end of the last complete row of a source
+
+    :param path:    path to source file
+    :return:        dict of {'offset', 'checksum'}
+    """
+    with open(path, 'rb') as fp:
+        offset = _complete_end(fp, os.path.getsize(path))
+        return {'offset': offset, 'checksum': _checksum(fp, offset)}
+
+
+def is_appended(path: str, mark: Watermark) -> bool:
+    """Check that a source still contains the rows up to its high-water mark, i.e. has only been appended to
+
+    :param path:    path to source file
+    :param mark:    previous high-water mark
+    :return:        true if the row before the mark is unchanged
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) < mark['offset']:
+        return False
+    with open(path, 'rb') as fp:
+        return _checksum(fp, mark['offset']) == mark['checksum']
+
+
+def write_delta(path: str, mark: Optional[Watermark], output_path: str) -> Watermark:
+    """Write the header and the complete rows after a high-water mark to a new file
+
+    :param path:            path to source file
+    :param mark:            previous high-water mark. None to write all complete rows
+    :param output_path:     path to delta file
+    :return:                new high-water mark, at the end of the rows written
+    """
+    with open(path, 'rb') as fp, open(output_path, 'wb') as out:
+        end = _complete_end(fp, os.path.getsize(path))
+        fp.seek(0)
+        out.write(fp.readline())
+        start = fp.tell() if mark is None else mark['offset']
+        fp.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = fp.read(min(_BLOCK_SIZE, remaining))
+            out.write(block)
+            remaining -= len(block)
+        return {'offset': end, 'checksum': _checksum(fp, end)}
+
+
+class VertexIndex:
+    """SQLite index of the vertices of an incrementally ingested graph by type and source ID, so that new rows can be
+    resolved against the vertices ingested before without reading the graph
+
+    """
+    def __init__(self, path: str) -> None:
+        """Initialise
+
+        :param path:    path to SQLite database file
+        """
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS vertices (label TEXT, source_id TEXT, id TEXT, "
+                         "PRIMARY KEY (label, source_id))")
+
+    def __repr__(self):
+        return "VertexIndex(path=\"{}\")".format(self.path)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM vertices").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, vertices: Iterable[Tuple[str, str, str]]) -> None:
+        """Add vertices, replacing vertices with the same type and source ID
+
+        :param vertices:    iterable of (type, source ID, vertex ID)
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO vertices VALUES (?, ?, ?)", vertices)
+
+    def lookup(self, label: str, source_ids: List[str]) -> Dict[str, str]:
+        """Find vertices of a type by source ID
+
+        :param label:       vertex type
+        :param source_ids:  source IDs to look up
+        :return:            dict of {source ID: vertex ID} of the vertices found
+        """
+        found = dict()
+        with closing(self._connect()) as conn:
+            for i in range(0, len(source_ids), _LOOKUP_SIZE):
+                batch = source_ids[i:i + _LOOKUP_SIZE]
+                found.update(conn.execute("SELECT source_id, id FROM vertices WHERE label = ? AND source_id IN ({})"
+                                          .format(','.join('?' * len(batch))), [label] + batch).fetchall())
+        return found
+
+    def clear(self) -> None:
+        """Remove all vertices
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM vertices")
+
+
+def _graph_id(path: str) -> str:
+    return list(epgm.iter_elements(path, 'graphs'))[-1]['id']
+
+
+def index_graph(path: str, index: VertexIndex) -> None:
+    """Replace the contents of an index with the vertices of the last graph of an EPGM directory
+
+    :param path:    EPGM directory
+    :param index:   vertex index
+    """
+    graph_id = _graph_id(path)
+    index.clear()
+    index.add((v['meta']['label'], v['data'][epgm.ID_ATTRIBUTE], v['id']) for v in epgm.iter_elements(path, 'vertices')
+              if graph_id in v['meta']['graphs'] and epgm.ID_ATTRIBUTE in v['data'])
+
+
+def append_graph(path: str, delta_path: str, index: VertexIndex, chunk_size: int = 10000) -> None:
+    """Append the elements of the last graph of a delta EPGM directory to the last graph of another.
+
+    Delta vertices with the type and source ID of an indexed vertex are written as a new version of it, with the
+    attributes of the new rows, unless they have no attributes, and the other delta vertices are added to the index.
+    Delta edges are changed to refer to the indexed vertices. Only the delta is read.
+
+    :param path:        EPGM directory to append to
+    :param delta_path:  EPGM directory of the delta
+    :param index:       index of the vertices of the graph appended to
+    :param chunk_size:  number of vertices looked up at a time
+    """
+    graph_id, delta_id = _graph_id(path), _graph_id(delta_path)
+    ids = dict()  # type: Dict[str, str]
+
+    def resolve(chunk: List[Dict]) -> Iterator[Dict]:
+        found = dict()
+        for label in set(v['meta']['label'] for v in chunk):
+            found[label] = index.lookup(label, [v['data'][epgm.ID_ATTRIBUTE] for v in chunk
+                                                if v['meta']['label'] == label and epgm.ID_ATTRIBUTE in v['data']])
+        added = list()
+        for v in chunk:
+            existing = found[v['meta']['label']].get(v['data'].get(epgm.ID_ATTRIBUTE))
+            v['meta']['graphs'] = [graph_id]
+            if existing is None:
+                if epgm.ID_ATTRIBUTE in v['data']:
+                    added.append((v['meta']['label'], v['data'][epgm.ID_ATTRIBUTE], v['id']))
+                yield v
+                continue
+            ids[v['id']] = existing
+            if set(v['data']) - {epgm.ID_ATTRIBUTE}:
+                v['id'] = existing
+                yield v
+        index.add(added)
+
+    def vertices() -> Iterator[Dict]:
+        chunk = list()
+        for v in epgm.iter_elements(delta_path, 'vertices'):
+            if delta_id in v['meta']['graphs']:
+                chunk.append(v)
+            if len(chunk) >= chunk_size:
+                yield from resolve(chunk)
+                chunk = list()
+        yield from resolve(chunk)
+
+    def edges() -> Iterator[Dict]:
+        for e in epgm.iter_elements(delta_path, 'edges'):
+            if delta_id in e['meta']['graphs']:
+                e['source'], e['target'] = ids.get(e['source'], e['source']), ids.get(e['target'], e['target'])
+                e['meta']['graphs'] = [graph_id]
+                yield e
+
+    epgm.write_elements(path, 'vertices', vertices(), append=True)
+    epgm.write_elements(path, 'edges', edges(), append=True)
+
+
+class IngestCheckpoint:
+    """High-water marks of the sources of an ingestion, and the graph they were ingested into
+
+    Attributes:
+        path (str):                         path to checkpoint file
+        key (str):                          hash of schema, mappings and label the checkpoint applies to
+        graph (str):                        path to graph containing all rows up to the marks
+        marks (Dict[str, Watermark]):       high-water mark of each source
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.key = None  # type: Optional[str]
+        self.graph = None  # type: Optional[str]
+        self.marks = dict()  # type: Dict[str, Watermark]
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as fp:
+                state = json.load(fp)
+            self.key, self.graph, self.marks = state['key'], state['graph'], state['marks']
+
+    def __repr__(self):
+        return "IngestCheckpoint(path=\"{}\",graph=\"{}\")".format(self.path, self.graph)
+
+    def is_valid(self, key: str) -> bool:
+        """Check that the checkpoint applies to an ingestion and that all its sources have only been appended to
+
+        :param key:     hash of schema, mappings and label of the ingestion
+        :return:        true if only rows after the marks have to be ingested
+        """
+        return self.graph is not None and self.key == key and all(is_appended(p, m) for p, m in self.marks.items())
+
+    def save(self, key: str, graph: str, marks: Dict[str, Watermark]) -> None:
+        """Record a successful ingestion
+
+        :param key:     hash of schema, mappings and label of the ingestion
+        :param graph:   path to graph containing all rows up to the marks
+        :param marks:   high-water mark of each source
+        """
+        self.key, self.graph, self.marks = key, graph, marks
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            json.dump({'key': key, 'graph': graph, 'marks': marks}, fp, indent=4)
+        os.replace(tmp, self.path)
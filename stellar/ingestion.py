@@ -26,7 +26,16 @@ __copyright__ = """
 __license__ = "Apache 2.0"
 
 from stellar.payload import Payload
-from typing import Dict, Optional, List, Union
+from stellar.sources import SourceScanner, SourceStats, read_header, invalid_values, reservoir_sample, infer_type
+from typing import Dict, Optional, List, Union, Set, Tuple, Iterator
+import hashlib
+import json
+import os
+import pickle
+
+
+# version of the pickled schemas cached by GraphSchema.from_file, to be increased when the schema classes change
+_CACHE_FORMAT = 1
 
 
 class NodeMapping:
@@ -73,6 +82,7 @@ class ElementType:
     def __init__(self, name: str, attribute_types: Dict[str, str]) -> None:
         self.name = name
         self.attribute_types = attribute_types or {}
+        self._attribute_keys = frozenset(self.attribute_types.keys())
 
     def validate_attributes(self, attributes: Dict[str, str]):
         """Require attributes to be validated
@@ -80,11 +90,7 @@ class ElementType:
         :param attributes:  element attributes
         :return:            element attributes
         """
-        if not attributes:
-            return attributes
-        schema_props_keys = set(self.attribute_types.keys())
-        mapping_props_keys = set(attributes.keys())
-        if len(mapping_props_keys - schema_props_keys.intersection(mapping_props_keys)) > 0:
+        if attributes and not self._attribute_keys.issuperset(attributes.keys()):
             raise KeyError("invalid attributes")
         return attributes
 
@@ -136,6 +142,40 @@ class EdgeType(ElementType):
         return EdgeMapping(self.name, self.src_type, path, src, dst, self.validate_attributes(map_attributes))
 
 
+class ValidationReport:
+    """Problems found in data sources before ingestion
+
+    Attributes:
+        errors (List[str]):                 description of each problem
+        sources (Dict[str, SourceStats]):   rows and bytes read from each source
+    """
+    _MAX_EXAMPLES = 5
+
+    def __init__(self) -> None:
+        self.errors = list()  # type: List[str]
+        self.sources = dict()  # type: Dict[str, SourceStats]
+
+    def __repr__(self):
+        return "ValidationReport(valid={},errors={})".format(self.valid, len(self.errors))
+
+    def __str__(self):
+        return "\n".join(self.errors) if self.errors else "No problems found"
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def add(self, message: str, examples: Optional[List] = None) -> None:
+        """Add a problem
+
+        :param message:     description of problem
+        :param examples:    offending values, of which the first few are included in the description
+        """
+        if examples:
+            message += ", e.g. {}".format(examples[:self._MAX_EXAMPLES])
+        self.errors.append(message)
+
+
 class GraphSchema:
     """Used to create and define a Graph Schema
 
@@ -143,6 +183,8 @@ class GraphSchema:
     def __init__(self):
         self.node = {}  # type: Dict[str, NodeType]
         self.edge = {}  # type: Dict[str, EdgeType]
+        self._payload = None  # type: Optional[Dict[str, List[Dict]]]
+        self._references = {}  # type: Dict[str, Set[str]]
 
     def add_node_type(self, name: str, attribute_types: Optional[Dict[str, str]] = None):
         """Add node class definition to schema
@@ -153,6 +195,7 @@ class GraphSchema:
         if name in self.node.keys():
             print("WARNING: Overwriting existing node type '{}'".format(name))
         self.node[name] = NodeType(name, attribute_types)
+        self._payload = None
         return self
 
     def add_edge_type(self, name: str, src_type: str, dst_type: str,
@@ -166,9 +209,400 @@ class GraphSchema:
         """
         if name in self.edge.keys():
             print("WARNING: Overwriting existing edge type '{}'".format(name))
-        self.edge[name] = EdgeType(name, src_type, dst_type, attribute_types)
+        self._set_edge_type(EdgeType(name, src_type, dst_type, attribute_types))
+        self._payload = None
+        return self
+
+    def _set_edge_type(self, edge_type: EdgeType) -> None:
+        """Add or replace an edge class, keeping the type-reference index up to date
+
+        :param edge_type:   edge class
+        """
+        old = self.edge.get(edge_type.name)
+        if old is not None:
+            for node_type in (old.src_type, old.dst_type):
+                self._references[node_type].discard(old.name)
+                if not self._references[node_type]:
+                    del self._references[node_type]
+        self.edge[edge_type.name] = edge_type
+        for node_type in (edge_type.src_type, edge_type.dst_type):
+            self._references.setdefault(node_type, set()).add(edge_type.name)
+
+    def add_node_types(self, node_types: Dict[str, Optional[Dict[str, str]]]):
+        """Add several node class definitions to schema
+
+        :param node_types:  dict of {name of node class: dict of attributes to their types}
+        """
+        overwritten = [name for name in node_types.keys() if name in self.node]
+        if overwritten:
+            print("WARNING: Overwriting existing node types {}".format(overwritten))
+        for name, attribute_types in node_types.items():
+            self.node[name] = NodeType(name, attribute_types)
+        self._payload = None
+        return self
+
+    def add_edge_types(self, edge_types: Dict[str, Tuple]):
+        """Add several edge class definitions to schema. All source and destination node classes are checked before
+        any edge class is added.
+
+        :param edge_types:  dict of {name of edge class: (source node class, destination node class[, attribute types])}
+        """
+        unknown = sorted(set(t for spec in edge_types.values() for t in spec[:2] if t not in self.node))
+        if unknown:
+            raise KeyError("node types {} are not in schema".format(unknown))
+        overwritten = [name for name in edge_types.keys() if name in self.edge]
+        if overwritten:
+            print("WARNING: Overwriting existing edge types {}".format(overwritten))
+        for name, spec in edge_types.items():
+            self._set_edge_type(EdgeType(name, spec[0], spec[1], spec[2] if len(spec) > 2 else None))
+        self._payload = None
         return self
 
+    def edge_types_of(self, node_type: str) -> List[str]:
+        """Edge classes with a node class as source or destination
+
+        :param node_type:   name of node class
+        :return:            names of edge classes
+        """
+        return sorted(self._references.get(node_type, set()))
+
+    def dangling_references(self) -> Dict[str, List[str]]:
+        """Node classes referred to by edge classes but not defined in the schema
+
+        :return:    dict of {name of missing node class: names of edge classes referring to it}
+        """
+        return {node_type: sorted(edges) for node_type, edges in self._references.items()
+                if node_type not in self.node}
+
+    def validate(self):
+        """Require every edge class to refer to node classes in the schema
+
+        :return:    self
+        """
+        dangling = self.dangling_references()
+        if dangling:
+            raise KeyError("edge types refer to missing node types: {}".format(dangling))
+        return self
+
+    def create_maps(self, specs: List[Dict]) -> List[Union[NodeMapping, EdgeMapping]]:
+        """Create several mappings, checking all of them before raising.
+
+        Each spec holds either a 'node_type' with the arguments of NodeType.create_map, or an 'edge_type' with the
+        arguments of EdgeType.create_map, e.g. {'node_type': 'Paper', 'path': 'papers.csv', 'column': 'id'}.
+
+        :param specs:   list of mapping specs
+        :return:        list of mappings, in the order of the specs
+        """
+        mappings = list()
+        errors = list()
+        for i, spec in enumerate(specs):
+            args = dict(spec)
+            is_node = 'node_type' in args
+            name = args.pop('node_type') if is_node else args.pop('edge_type', None)
+            element_type = self.node.get(name) if is_node else self.edge.get(name)
+            if element_type is None:
+                errors.append("{}: type '{}' is not in schema".format(i, name))
+                continue
+            try:
+                mappings.append(element_type.create_map(**args))
+            except (KeyError, TypeError) as e:
+                errors.append("{}: {}".format(i, e))
+        if errors:
+            raise KeyError("invalid mappings: {}".format("; ".join(errors)))
+        return mappings
+
+    @classmethod
+    def from_file(cls, path: str, cache_dir: Optional[str] = None) -> 'GraphSchema':
+        """Load a schema from a file written by to_file.
+
+        The format is chosen by extension: ".yaml"/".yml" (requires PyYAML), ".jsonl" with one class or class link per
+        line, which is read line by line, or JSON otherwise. With a cache directory, the loaded schema is pickled under
+        the hash of the file and the cache format, and later loads of the same file content unpickle it instead. A
+        cached schema that cannot be unpickled is removed and the file is read again. Only use a cache directory that
+        you trust.
+
+        :param path:        path to schema file
+        :param cache_dir:   directory for cached schemas. Defaulted to no caching
+        :return:            graph schema object
+        """
+        cache_path = None
+        if cache_dir is not None:
+            cache_path = os.path.join(cache_dir, '{}.v{}.pickle'.format(_file_hash(path), _CACHE_FORMAT))
+            if os.path.isfile(cache_path):
+                try:
+                    with open(cache_path, 'rb') as fp:
+                        return pickle.load(fp)
+                except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError,
+                        ValueError):
+                    os.remove(cache_path)
+
+        classes, links = list(), list()
+        for element in _read_schema_elements(path):
+            (links if 'source' in element else classes).append(element)
+        schema = cls()
+        schema.add_node_types({c['name']: c.get('props') for c in classes})
+        schema.add_edge_types({cl['name']: (cl['source'], cl['target'], cl.get('props')) for cl in links})
+
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = cache_path + '.tmp'
+            with open(tmp, 'wb') as fp:
+                pickle.dump(schema, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        return schema
+
+    def to_file(self, path: str) -> None:
+        """Write the schema to a file, in the format chosen by extension as for from_file
+
+        :param path:    path to schema file
+        """
+        payload = self.to_payload()
+        with open(path, 'w', encoding='utf-8') as fp:
+            if _is_yaml(path):
+                _yaml().safe_dump(payload, fp, default_flow_style=False, sort_keys=False)
+            elif path.endswith('.jsonl'):
+                for element in payload['classes'] + payload['classLinks']:
+                    fp.write(json.dumps(element, separators=(',', ':')))
+                    fp.write('\n')
+            else:
+                json.dump(payload, fp, indent=4)
+
+    def load_mappings(self, path: str) -> List[Union[NodeMapping, EdgeMapping]]:
+        """Load mappings written by save_mappings, validated against the schema
+
+        :param path:    path to JSON or YAML mappings file
+        :return:        list of mappings
+        """
+        with open(path, 'r', encoding='utf-8') as fp:
+            specs = _yaml().safe_load(fp) if _is_yaml(path) else json.load(fp)
+        return self.create_maps(specs)
+
+    def to_payload(self) -> Dict[str, List[Dict]]:
+        """Schema as the "graphSchema" element of an ingestion payload.
+
+        The result is memoized until a node or edge type is added, and must not be modified.
+
+        :return:    dict of {"classes", "classLinks"}
+        """
+        if self._payload is None:
+            self._payload = {
+                "classes": [StellarIngestPayload.nt2c(vc) for vc in self.node.values()],
+                "classLinks": [StellarIngestPayload.et2cl(ec) for ec in self.edge.values()]
+            }
+        return self._payload
+
+    def validate_sources(self, mappings: List[Union[NodeMapping, EdgeMapping]], sample: Optional[int] = None,
+                         chunk_size: int = 10000) -> ValidationReport:
+        """Check data sources against mappings and schema before ingestion.
+
+        Checks that files and mapped columns exist and that mapped values parse as their attribute types. When reading
+        whole files, also checks that every edge source and destination ID is the ID of a mapped node of that type.
+        Each file is read once, however many mappings refer to it.
+
+        :param mappings:    List of data-source mappings
+        :param sample:      Number of rows to check per source. Defaulted to check all rows
+        :param chunk_size:  Number of rows read at a time
+        :return:            Validation report
+        """
+        report = ValidationReport()
+        scanner = SourceScanner(chunk_size, sample)
+        checks = list()  # type: List[_MappingCheck]
+        headers = dict()  # type: Dict[str, Set[str]]
+
+        for m in mappings:
+            if not os.path.isfile(m.path):
+                report.add("{}: file does not exist".format(m.path))
+                continue
+            is_node = isinstance(m, NodeMapping)
+            element_type = self.node.get(m.node_type) if is_node else self.edge.get(m.edge_type)
+            if element_type is None:
+                report.add("{}: type '{}' is not in schema".format(m.path, m.node_type if is_node else m.edge_type))
+                continue
+            check = _MappingCheck(m, element_type)
+            if m.path not in headers:
+                headers[m.path] = set(read_header(m.path))
+            missing = [c for c in check.columns() if c not in headers[m.path]]
+            if missing:
+                report.add("{}: missing columns {} for '{}'".format(m.path, missing, element_type.name))
+                continue
+            checks.append(check)
+            scanner.add(m.path, check.consume)
+
+        report.sources = scanner.scan()
+
+        node_ids = dict()  # type: Dict[str, Set[str]]
+        for check in checks:
+            check.report_invalid(report)
+            if isinstance(check.mapping, NodeMapping):
+                node_ids.setdefault(check.mapping.node_type, set()).update(check.ids[check.mapping.node_id])
+        if sample is None:
+            for check in checks:
+                if isinstance(check.mapping, EdgeMapping):
+                    check.report_dangling(report, node_ids)
+        return report
+
+
+def _is_yaml(path: str) -> bool:
+    return path.endswith(('.yaml', '.yml'))
+
+
+def _yaml():
+    """Import PyYAML, which is only needed for YAML files
+
+    :return:    yaml module
+    """
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError("PyYAML is required to read or write YAML files: pip install pyyaml")
+    return yaml
+
+
+def _file_hash(path: str) -> str:
+    """Hash of a file's content
+
+    :param path:    path to file
+    :return:        hex digest
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_schema_elements(path: str) -> Iterator[Dict]:
+    """Stream the classes and class links of a schema file
+
+    :param path:    path to schema file
+    :return:        iterator of "class" and "class link" elements
+    """
+    with open(path, 'r', encoding='utf-8') as fp:
+        if path.endswith('.jsonl'):
+            for line in fp:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        payload = _yaml().safe_load(fp) if _is_yaml(path) else json.load(fp)
+    yield from payload.get('classes', [])
+    yield from payload.get('classLinks', [])
+
+
+def mapping_spec(mapping: Union[NodeMapping, EdgeMapping]) -> Dict:
+    """Mapping as a spec accepted by GraphSchema.create_maps
+
+    :param mapping:     node or edge mapping
+    :return:            mapping spec
+    """
+    if isinstance(mapping, NodeMapping):
+        return {'node_type': mapping.node_type, 'path': mapping.path, 'column': mapping.node_id,
+                'map_attributes': mapping.attributes}
+    return {'edge_type': mapping.edge_type, 'path': mapping.path, 'src': mapping.src, 'dst': mapping.dst,
+            'map_attributes': mapping.attributes}
+
+
+def save_mappings(mappings: List[Union[NodeMapping, EdgeMapping]], path: str) -> None:
+    """Write mappings to a JSON or YAML file, to be loaded with GraphSchema.load_mappings
+
+    :param mappings:    list of node and edge mappings
+    :param path:        path to mappings file
+    """
+    specs = [mapping_spec(m) for m in mappings]
+    with open(path, 'w', encoding='utf-8') as fp:
+        if _is_yaml(path):
+            _yaml().safe_dump(specs, fp, default_flow_style=False, sort_keys=False)
+        else:
+            json.dump(specs, fp, indent=4)
+
+
+def map_source_ids(schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]],
+                   attribute: str) -> Tuple[GraphSchema, List[Union[NodeMapping, EdgeMapping]]]:
+    """Copy of a schema and mappings that also map the ID column of each node source to a vertex attribute, so that
+    vertices of the same source node ingested separately can be matched by type and source ID
+
+    :param schema:      graph schema
+    :param mappings:    list of node and edge mappings
+    :param attribute:   name of the vertex attribute holding the source ID
+    :return:            (schema, mappings)
+    """
+    mapped = GraphSchema()
+    for name, node_type in schema.node.items():
+        mapped.node[name] = NodeType(name, dict(node_type.attribute_types, **{attribute: 'string'}))
+    for edge_type in schema.edge.values():
+        mapped._set_edge_type(edge_type)
+    result = list()
+    for m in mappings:
+        if isinstance(m, NodeMapping):
+            m = NodeMapping(m.node_type, m.path, m.node_id, dict(m.attributes, **{attribute: m.node_id}))
+        result.append(m)
+    return mapped, result
+
+
+class _MappingCheck:
+    """Checks chunks of a data source against a single mapping
+
+    """
+    def __init__(self, mapping: Union[NodeMapping, EdgeMapping], element_type: ElementType) -> None:
+        self.mapping = mapping
+        self.element_type = element_type
+        self.invalid = {attr: 0 for attr in mapping.attributes.keys()}  # type: Dict[str, int]
+        self.examples = {attr: list() for attr in mapping.attributes.keys()}  # type: Dict[str, List[str]]
+        self.ids = {c: set() for c in self.id_columns()}  # type: Dict[str, Set[str]]
+
+    def id_columns(self) -> List[str]:
+        """Columns containing node IDs
+
+        :return:    list of column names
+        """
+        if isinstance(self.mapping, NodeMapping):
+            return [self.mapping.node_id]
+        return [self.mapping.src, self.mapping.dst]
+
+    def columns(self) -> List[str]:
+        """All mapped columns
+
+        :return:    list of column names
+        """
+        return self.id_columns() + list(self.mapping.attributes.values())
+
+    def consume(self, start: int, chunk: Dict[str, List[str]]) -> None:
+        """Check a chunk of the data source
+
+        :param start:   index of first row in chunk
+        :param chunk:   dict of {column: values}
+        """
+        for attr, column in self.mapping.attributes.items():
+            bad = invalid_values(chunk[column], self.element_type.attribute_types.get(attr, 'string'))
+            self.invalid[attr] += len(bad)
+            examples = self.examples[attr]
+            examples.extend(chunk[column][i] for i in bad[:ValidationReport._MAX_EXAMPLES - len(examples)])
+        for column, ids in self.ids.items():
+            ids.update(chunk[column])
+
+    def report_invalid(self, report: ValidationReport) -> None:
+        """Report values that do not parse as their attribute types
+
+        :param report:  validation report
+        """
+        for attr, count in self.invalid.items():
+            if count:
+                report.add("{}: {} values of column '{}' are not {} ('{}.{}')".format(
+                    self.mapping.path, count, self.mapping.attributes[attr],
+                    self.element_type.attribute_types[attr], self.element_type.name, attr), self.examples[attr])
+
+    def report_dangling(self, report: ValidationReport, node_ids: Dict[str, Set[str]]) -> None:
+        """Report edge endpoints with no mapped node
+
+        :param report:      validation report
+        :param node_ids:    dict of {node type: mapped node IDs}
+        """
+        m = self.mapping
+        for column, node_type in [(m.src, m.src_type), (m.dst, self.element_type.dst_type)]:
+            dangling = sorted(self.ids[column] - node_ids.get(node_type, set()))
+            if dangling:
+                report.add("{}: {} IDs in column '{}' of '{}' have no '{}' node".format(
+                    m.path, len(dangling), column, m.edge_type, node_type), dangling)
+
 
 class StellarIngestPayload(Payload):
     """Payload object used to start ingestion
@@ -181,14 +615,19 @@ class StellarIngestPayload(Payload):
     def __init__(self, session_id: str, schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]],
                  label: str):
         Payload.__init__(self, session_id, label)
-        self.sources = list(set([m.path for m in mappings]))
-        self.graphSchema = {
-            "classes": [self.nt2c(vc) for vc in schema.node.values()],
-            "classLinks": [self.et2cl(ec) for ec in schema.edge.values()]
-        }
+        sources = dict()  # type: Dict[str, None]
+        nodes, links = list(), list()
+        for m in mappings:
+            sources[m.path] = None
+            if isinstance(m, NodeMapping):
+                nodes.append(self.nm2node(m))
+            elif isinstance(m, EdgeMapping):
+                links.append(self.em2link(m))
+        self.sources = list(sources.keys())
+        self.graphSchema = schema.to_payload()
         self.mapping = {
-            "nodes": [self.nm2node(m) for m in mappings if isinstance(m, NodeMapping)],
-            "links": [self.em2link(m) for m in mappings if isinstance(m, EdgeMapping)]
+            "nodes": nodes,
+            "links": links
         }
 
     @staticmethod
@@ -245,6 +684,115 @@ class StellarIngestPayload(Payload):
         return link
 
 
+class ColumnProfile:
+    """Attribute type inferred for a column from a sample of its values
+
+    Attributes:
+        type (str):             inferred attribute type
+        confidence (float):     confidence in the type, see stellar.sources.infer_type
+        sampled (int):          number of values sampled
+        missing (int):          number of sampled values that are empty
+    """
+    def __init__(self, attribute_type: str, confidence: float, sampled: int, missing: int) -> None:
+        self.type = attribute_type
+        self.confidence = confidence
+        self.sampled = sampled
+        self.missing = missing
+
+    def __repr__(self):
+        return "ColumnProfile(type=\"{}\",confidence={:.2f},sampled={},missing={})".format(
+            self.type, self.confidence, self.sampled, self.missing)
+
+
+class SchemaProposal:
+    """Schema and mappings inferred from data sources, to be reviewed before ingestion
+
+    Attributes:
+        schema (GraphSchema):                               proposed graph schema
+        mappings (List[Union[NodeMapping, EdgeMapping]]):   proposed mappings, one per source
+        columns (Dict[str, Dict[str, ColumnProfile]]):      dict of {path: {column: profile}} of mapped attributes
+        sources (Dict[str, SourceStats]):                   rows and bytes read from each source
+    """
+    def __init__(self) -> None:
+        self.schema = GraphSchema()
+        self.mappings = list()  # type: List[Union[NodeMapping, EdgeMapping]]
+        self.columns = dict()  # type: Dict[str, Dict[str, ColumnProfile]]
+        self.sources = dict()  # type: Dict[str, SourceStats]
+
+    def __repr__(self):
+        return "SchemaProposal(nodes={},edges={})".format(list(self.schema.node.keys()), list(self.schema.edge.keys()))
+
+    def __str__(self):
+        lines = list()
+        for path, profiles in self.columns.items():
+            lines.append("{} ({} rows)".format(path, self.sources[path].rows))
+            lines.extend("    {}: {} ({:.0%} confidence, {} of {} sampled values missing)".format(
+                column, p.type, p.confidence, p.missing, p.sampled) for column, p in profiles.items())
+        return "\n".join(lines)
+
+    def uncertain(self, threshold: float = 0.99) -> List[Tuple[str, str, ColumnProfile]]:
+        """Columns whose inferred type is below a confidence threshold
+
+        :param threshold:   minimum confidence
+        :return:            list of (path, column, profile)
+        """
+        return [(path, column, p) for path, profiles in self.columns.items()
+                for column, p in profiles.items() if p.confidence < threshold]
+
+
+def create_schema_from_sources(paths: List[str], id_columns: Dict[str, Union[str, Tuple[str, str, str, str]]],
+                               sample_rows: int = 1000, limit: Optional[int] = None, min_confidence: float = 0.95,
+                               names: Optional[Dict[str, str]] = None, seed: Optional[int] = None) -> SchemaProposal:
+    """Propose a graph schema and mappings by profiling data sources.
+
+    Each source becomes one node or edge type named after its file, with an attribute for every other column. Types are
+    inferred from a uniform sample of each source, so memory is bounded by the sample size however large the files.
+    Node types are created before edge types, so edges may refer to nodes of any source.
+
+    :param paths:           paths to CSV files
+    :param id_columns:      dict of {path: ID column} for node sources, and of {path: (source column, source node type,
+                            destination column, destination node type)} for edge sources
+    :param sample_rows:     number of rows sampled per source
+    :param limit:           maximum number of rows read per source. Defaulted to read all rows
+    :param min_confidence:  minimum fraction of sampled values that must parse as a type other than string
+    :param names:           dict of {path: type name}. Defaulted to file names without extension
+    :param seed:            random seed for sampling
+    :return:                schema proposal
+    """
+    proposal = SchemaProposal()
+    nodes, edges = dict(), dict()
+    node_specs, edge_specs = list(), list()
+    for path in paths:
+        if path not in id_columns:
+            raise KeyError("no ID columns for source '{}'".format(path))
+        ids = id_columns[path]
+        name = (names or {}).get(path) or os.path.splitext(os.path.basename(path))[0]
+        stats = SourceStats(path)
+        sample = reservoir_sample(path, sample_rows, limit, seed, stats)
+        id_cols = {ids} if isinstance(ids, str) else {ids[0], ids[2]}
+        profiles = dict()
+        for column in read_header(path):
+            if column in id_cols:
+                continue
+            values = sample.get(column, [])
+            attribute_type, confidence = infer_type(values, min_confidence)
+            profiles[column] = ColumnProfile(attribute_type, confidence, len(values), values.count(''))
+        proposal.columns[path] = profiles
+        proposal.sources[path] = stats
+        attribute_types = {column: p.type for column, p in profiles.items()}
+        attributes = {column: column for column in profiles.keys()}
+        if isinstance(ids, str):
+            nodes[name] = attribute_types
+            node_specs.append({'node_type': name, 'path': path, 'column': ids, 'map_attributes': attributes})
+        else:
+            edges[name] = (ids[1], ids[3], attribute_types)
+            edge_specs.append({'edge_type': name, 'path': path, 'src': ids[0], 'dst': ids[2],
+                               'map_attributes': attributes})
+    proposal.schema.add_node_types(nodes).add_edge_types(edges)
+    proposal.mappings = proposal.schema.create_maps(node_specs + edge_specs)
+    return proposal
+
+
 def create_schema() -> GraphSchema:
     """Exposed method to create graph schema
 
@@ -0,0 +1,193 @@
+"""Instrumentation
+
+Timing hooks across the session lifecycle. Sessions, tasks and graphs report spans to the installed instrument, which
+does nothing by default. Install an InMemoryRecorder to get a per-phase timing breakdown, or an OpenTelemetryInstrument
+to forward spans to an OpenTelemetry tracer.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Iterator
+
+
+class Span:
+    """Timed phase of work
+
+    Attributes:
+        name (str):         phase name, e.g. 'http.post' or 'task.running'
+        attributes (dict):  additional information, e.g. endpoint or bytes read
+        start (float):      wall-clock start time in seconds since the epoch
+        duration (float):   duration in seconds
+    """
+    def __init__(self, name: str, attributes: Optional[Dict[str, any]] = None, start: Optional[float] = None,
+                 duration: float = 0.0) -> None:
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start = time.time() if start is None else start
+        self.duration = duration
+
+    def __repr__(self):
+        return "Span(name=\"{}\",duration={:.6f})".format(self.name, self.duration)
+
+    def set_attribute(self, key: str, value: any) -> None:
+        """Set span attribute
+
+        :param key:     attribute name
+        :param value:   attribute value
+        """
+        self.attributes[key] = value
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+class Instrument:
+    """Base instrument. Receives each finished span and ignores it.
+
+    """
+    def on_span(self, span: Span) -> None:
+        """Called when a span has finished
+
+        :param span:    finished span
+        """
+        pass
+
+
+class InMemoryRecorder(Instrument):
+    """Keeps finished spans in memory and summarises them per phase
+
+    """
+    def __init__(self) -> None:
+        self.spans = list()  # type: List[Span]
+        self._lock = threading.Lock()
+
+    def on_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        """Discard recorded spans
+        """
+        with self._lock:
+            self.spans = list()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Timing summary per phase, in order of first occurrence
+
+        :return:    dict of {phase: {'count', 'total', 'mean', 'max'}}
+        """
+        summary = OrderedDict()
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            s = summary.setdefault(span.name, {'count': 0, 'total': 0.0, 'mean': 0.0, 'max': 0.0})
+            s['count'] += 1
+            s['total'] += span.duration
+            s['max'] = max(s['max'], span.duration)
+        for s in summary.values():
+            s['mean'] = s['total'] / s['count']
+        return summary
+
+    def format_report(self) -> str:
+        """Per-phase timing breakdown as a table
+
+        :return:    report text
+        """
+        lines = ["{:<24} {:>6} {:>10} {:>10} {:>10}".format('phase', 'count', 'total(s)', 'mean(s)', 'max(s)')]
+        for name, s in self.summary().items():
+            lines.append("{:<24} {:>6d} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+                name, s['count'], s['total'], s['mean'], s['max']))
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        """Print per-phase timing breakdown
+        """
+        print(self.format_report())
+
+
+class OpenTelemetryInstrument(Instrument):
+    """Forwards spans to an OpenTelemetry tracer
+
+    """
+    def __init__(self, tracer) -> None:
+        """Initialise
+
+        :param tracer:  OpenTelemetry tracer, e.g. from opentelemetry.trace.get_tracer(__name__)
+        """
+        self._tracer = tracer
+
+    def on_span(self, span: Span) -> None:
+        otel_span = self._tracer.start_span(span.name, attributes=span.attributes, start_time=int(span.start * 1e9))
+        otel_span.end(end_time=int(span.end * 1e9))
+
+
+_instrument = Instrument()
+
+
+def set_instrument(instrument: Optional[Instrument]) -> None:
+    """Install instrument receiving spans from all sessions, tasks and graphs
+
+    :param instrument:  instrument to install, or None to stop instrumenting
+    """
+    global _instrument
+    _instrument = instrument or Instrument()
+
+
+def get_instrument() -> Instrument:
+    """Currently installed instrument
+
+    :return:    instrument
+    """
+    return _instrument
+
+
+def record(name: str, duration: float, **attributes) -> None:
+    """Report a span measured by the caller
+
+    :param name:        phase name
+    :param duration:    duration in seconds
+    :param attributes:  span attributes
+    """
+    _instrument.on_span(Span(name, attributes, start=time.time() - duration, duration=duration))
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time the enclosed block and report it as a span
+
+    :param name:        phase name
+    :param attributes:  span attributes
+    :return:            span, to set further attributes on
+    """
+    s = Span(name, attributes)
+    begin = time.perf_counter()
+    try:
+        yield s
+    finally:
+        s.duration = time.perf_counter() - begin
+        _instrument.on_span(s)
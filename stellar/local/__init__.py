@@ -0,0 +1,112 @@
+"""Local Backend
+
+Runs Stellar modules in-process in place of the Stellar Coordinator, e.g. for development, CI and small jobs.
+A session created with a LocalCoordinator sends its payloads to the local engines and writes results to a working
+directory.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import json
+import os
+import uuid
+from typing import Callable, Dict
+
+from stellar.payload import Payload
+from stellar.session import StellarSession, StellarResult, CompletedTask
+from stellar.instrument import span
+from stellar.local.ingest import ingest
+
+Engine = Callable[[Dict, str], str]
+
+
+def _nai(payload: Dict, output_path: str) -> str:
+    """Run a NAI payload, importing the engines and NumPy only when needed
+
+    :param payload:     NAI payload, as sent to the coordinator
+    :param output_path: output EPGM directory
+    :return:            output EPGM directory
+    """
+    from stellar.local.nai import nai
+    return nai(payload, output_path)
+
+
+def _er(payload: Dict, output_path: str) -> str:
+    """Run an ER payload, importing the engine, NumPy and SciPy only when needed
+
+    :param payload:     ER payload, as sent to the coordinator
+    :param output_path: output EPGM directory
+    :return:            output EPGM directory
+    """
+    from stellar.local.er import er
+    return er(payload, output_path)
+
+
+class LocalCoordinator:
+    """Runs tasks in-process with local engines
+
+    """
+    def __init__(self, workdir: str) -> None:
+        """Initialise
+
+        :param workdir:     directory to write result graphs to
+        """
+        self.workdir = workdir
+        self._engines = {
+            'ingest': ingest,
+            'er': _er,
+            'nai': _nai
+        }  # type: Dict[str, Engine]
+
+    def __repr__(self):
+        return "LocalCoordinator(workdir=\"{}\")".format(self.workdir)
+
+    def start(self, task_name: str, create_payload: Callable[[str], Payload]) -> CompletedTask:
+        """Run a task to completion
+
+        :param task_name:       name of task
+        :param create_payload:  callable to create payload with session ID
+        :return:                completed task
+        """
+        session_id = str(uuid.uuid4())
+        payload = json.loads(create_payload(session_id).to_json(compact=True))
+        output_path = os.path.join(self.workdir, session_id)
+        engine = self._engines.get(task_name)
+        if engine is None:
+            result = StellarResult('failed', {'error': "Task '{}' cannot be run locally".format(task_name)})
+        else:
+            try:
+                with span('local.' + task_name):
+                    result = StellarResult('completed', {'output': engine(payload, output_path)})
+            except (OSError, KeyError, ValueError, ImportError) as e:
+                result = StellarResult('failed', {'error': "{}: {}".format(type(e).__name__, e)})
+        return CompletedTask(task_name, session_id, result)
+
+
+def create_local_session(workdir: str) -> StellarSession:
+    """Create a new session running tasks in-process
+
+    :param workdir:     directory to write result graphs to
+    :return:            New session object
+    """
+    return StellarSession('localhost', 0, backend=LocalCoordinator(workdir))
@@ -0,0 +1,300 @@
+"""Local Entity Resolution
+
+Resolves duplicate vertices in-process, from an ER payload. Candidate pairs are vertices of the same type that share a
+MinHash-LSH bucket of the trigrams of their compared attributes, so candidate generation grows with the number of
+vertices times the bucket size rather than quadratically. Candidates are accepted when the trigram Jaccard similarity
+of every compared attribute reaches its threshold, computed for many pairs at once with SciPy sparse products. Each
+duplicate gets a 'duplicate-of' edge to the first vertex of its cluster, in a new graph containing the input graph.
+Requires NumPy and SciPy.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from stellar.local.ingest import ID_ATTRIBUTE
+from stellar.instrument import span
+import stellar.epgm as epgm
+
+DUPLICATE_OF = 'duplicate-of'
+DEFAULT_THRESHOLD = 0.8
+
+_TOKEN_BITS = 20
+_PRIME = (1 << 61) - 1
+# vertices or pairs per task, so that results do not depend on the number of worker processes
+_ROWS_PER_TASK = 50000
+
+_shared = dict()  # type: Dict[str, any]
+
+
+def trigrams(value: str) -> List[str]:
+    """Character trigrams of a normalised value, padded so that short values have trigrams
+
+    :param value:   attribute value
+    :return:        list of distinct trigrams
+    """
+    text = "  {} ".format(" ".join(str(value).lower().split()))
+    return sorted(set(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def token_matrix(values: List[Optional[str]], prefix: str = '') -> sp.csr_matrix:
+    """Binary matrix of hashed trigrams, with one row per value
+
+    :param values:  attribute values, None where missing
+    :param prefix:  string prepended to each trigram before hashing
+    :return:        sparse matrix with 2^20 columns
+    """
+    indptr, indices = [0], []
+    mask = (1 << _TOKEN_BITS) - 1
+    for value in values:
+        if value is not None and value != '':
+            indices.extend(sorted(set(zlib.crc32((prefix + t).encode('utf-8')) & mask for t in trigrams(value))))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float64)
+    return sp.csr_matrix((data, np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                         shape=(len(values), 1 << _TOKEN_BITS))
+
+
+def _minhash_task(args: Tuple[int, int]) -> np.ndarray:
+    start, stop = args
+    tokens = _shared['tokens'][start:stop]
+    a, b = _shared['hash_params']
+    values = (a[None, :] * tokens.indices[:, None].astype(np.uint64) + b[None, :]) % np.uint64(_PRIME)
+    signatures = np.full((tokens.shape[0], len(a)), np.iinfo(np.uint64).max, dtype=np.uint64)
+    rows = np.flatnonzero(np.diff(tokens.indptr))
+    if len(rows):
+        signatures[rows] = np.minimum.reduceat(values, tokens.indptr[rows], axis=0)
+    return signatures
+
+
+def _score_task(args: Tuple[int, int]) -> np.ndarray:
+    start, stop = args
+    left, right = _shared['pairs'][0][start:stop], _shared['pairs'][1][start:stop]
+    return pair_similarities(_shared['matrices'], left, right)
+
+
+def _init_worker(shared: Dict[str, any]) -> None:
+    _shared.clear()
+    _shared.update(shared)
+
+
+def _run(task, shared: Dict[str, any], total: int, workers: Optional[int]) -> List[np.ndarray]:
+    """Run a task over fixed-size ranges of rows, in worker processes when there is more than one range
+
+    :param task:        function of a (start, stop) range, reading the shared data
+    :param shared:      data shared with the workers
+    :param total:       number of rows
+    :param workers:     number of worker processes. Defaulted to the number of CPUs
+    :return:            results of each range, in order
+    """
+    ranges = [(i, min(i + _ROWS_PER_TASK, total)) for i in range(0, total, _ROWS_PER_TASK)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        _init_worker(shared)
+        return [task(r) for r in ranges]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        return list(pool.map(task, ranges))
+
+
+def minhash(tokens: sp.csr_matrix, num_perm: int, seed: int = 1, workers: Optional[int] = None) -> np.ndarray:
+    """MinHash signatures of the token sets in the rows of a matrix
+
+    :param tokens:      binary token matrix
+    :param num_perm:    number of hash functions
+    :param seed:        random seed of the hash functions
+    :param workers:     number of worker processes. Defaulted to the number of CPUs
+    :return:            matrix of signatures, the maximum integer for empty rows
+    """
+    rng = np.random.default_rng(seed)
+    hash_params = (rng.integers(1, 1 << 29, num_perm, dtype=np.uint64),
+                   rng.integers(0, 1 << 29, num_perm, dtype=np.uint64))
+    results = _run(_minhash_task, {'tokens': tokens, 'hash_params': hash_params}, tokens.shape[0], workers)
+    return np.vstack(results) if results else np.empty((0, num_perm), dtype=np.uint64)
+
+
+def candidate_pairs(signatures: np.ndarray, groups: np.ndarray, bands: int, max_block_size: int) -> np.ndarray:
+    """Pairs of rows in the same group that share a band of their signatures. Buckets with more than max_block_size
+    rows are too common to be informative, and are skipped.
+
+    :param signatures:      matrix of MinHash signatures
+    :param groups:          group of each row, e.g. its vertex type
+    :param bands:           number of bands the signatures are split into
+    :param max_block_size:  maximum number of rows in a bucket
+    :return:                sorted array of pair keys i * n + j, with i < j
+    """
+    n = len(signatures)
+    empty = signatures[:, 0] == np.iinfo(np.uint64).max
+    width = signatures.shape[1] // bands
+    keys = [np.empty(0, dtype=np.int64)]
+    for band in range(bands):
+        rows = np.column_stack([groups.astype(np.uint64), signatures[:, band * width:(band + 1) * width]])
+        _, bucket = np.unique(rows, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        bucket[empty] = -1
+        sizes = np.bincount(bucket[bucket >= 0], minlength=n)
+        member = (bucket >= 0) & (sizes[np.maximum(bucket, 0)] <= max_block_size)
+        order = np.flatnonzero(member)
+        order = order[np.argsort(bucket[order], kind='stable')]
+        for d in range(1, min(max_block_size, len(order))):
+            same = bucket[order[:-d]] == bucket[order[d:]]
+            if not same.any():
+                break
+            i, j = order[:-d][same], order[d:][same]
+            keys.append(np.minimum(i, j) * n + np.maximum(i, j))
+    return np.unique(np.concatenate(keys))
+
+
+def pair_similarities(matrices: List[sp.csr_matrix], left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Trigram Jaccard similarity of pairs of rows, for each matrix
+
+    :param matrices:    binary token matrix of each attribute
+    :param left:        first row of each pair
+    :param right:       second row of each pair
+    :return:            matrix with one column per attribute, NaN where a value is missing
+    """
+    scores = np.empty((len(left), len(matrices)))
+    for k, m in enumerate(matrices):
+        sizes = np.diff(m.indptr)
+        inter = np.asarray(m[left].multiply(m[right]).sum(axis=1)).ravel()
+        union = sizes[left] + sizes[right] - inter
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores[:, k] = np.where((sizes[left] > 0) & (sizes[right] > 0), inter / union, np.nan)
+    return scores
+
+
+class _Clusters:
+    """Union-find over vertex positions, keeping the smallest position as the root
+
+    """
+    def __init__(self, n: int) -> None:
+        self.parent = np.arange(n)
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i: int, j: int) -> None:
+        a, b = self.find(i), self.find(j)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def resolve(vertices: List[Dict], thresholds: Dict[str, float], num_perm: int = 32, bands: int = 8,
+            max_block_size: int = 100, max_candidates: Optional[int] = None, blocking_keys: Optional[List[str]] = None,
+            workers: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Find duplicate vertices
+
+    :param vertices:        vertex elements
+    :param thresholds:      dict of {attribute: minimum similarity}. Defaulted to all string attributes, at 0.8
+    :param num_perm:        number of MinHash functions
+    :param bands:           number of LSH bands, of num_perm / bands hash values each
+    :param max_block_size:  maximum number of vertices in an LSH bucket
+    :param max_candidates:  maximum number of later vertices each vertex is compared with. Defaulted to no limit
+    :param blocking_keys:   attributes whose trigrams are blocked on. Defaulted to the compared attributes
+    :param workers:         number of worker processes. Defaulted to the number of CPUs
+    :return:                list of (duplicate position, position of first vertex of its cluster)
+    """
+    if not thresholds:
+        thresholds = {k: DEFAULT_THRESHOLD for v in vertices for k, value in v['data'].items()
+                      if k != ID_ATTRIBUTE and isinstance(value, str)}
+    attributes = sorted(thresholds.keys())
+    if not vertices or not attributes:
+        return []
+    values = {a: [v['data'].get(a) for v in vertices] for a in attributes}
+    matrices = [token_matrix(values[a]) for a in attributes]
+    keys_data = [[v['data'].get(a) for v in vertices] for a in (blocking_keys or attributes)]
+    blocking = token_matrix([" ".join(str(column[i]) for column in keys_data if column[i] not in (None, ''))
+                             for i in range(len(vertices))])
+    labels = {label: k for k, label in enumerate(sorted(set(v['meta']['label'] for v in vertices)))}
+    groups = np.array([labels[v['meta']['label']] for v in vertices], dtype=np.int64)
+
+    with span('er.blocking', vertices=len(vertices)) as s:
+        signatures = minhash(blocking, num_perm, workers=workers)
+        keys = candidate_pairs(signatures, groups, bands, max_block_size)
+        if max_candidates is not None:
+            first = keys // len(vertices)
+            starts = np.flatnonzero(np.r_[True, first[1:] != first[:-1]]) if len(keys) else first
+            rank = np.arange(len(keys)) - np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+            keys = keys[rank < max_candidates]
+        s.set_attribute('candidates', len(keys))
+    left, right = keys // len(vertices), keys % len(vertices)
+
+    with span('er.scoring', candidates=len(keys)):
+        results = _run(_score_task, {'matrices': matrices, 'pairs': (left, right)}, len(keys), workers)
+        scores = np.vstack(results) if results else np.empty((0, len(attributes)))
+    limits = np.array([thresholds[a] for a in attributes])
+    present = ~np.isnan(scores)
+    # an attribute missing on both vertices does not count against a match, but one missing on either does
+    empty = np.column_stack([np.diff(m.indptr) == 0 for m in matrices])
+    both_missing = empty[left] & empty[right]
+    with np.errstate(invalid='ignore'):
+        matched = np.where(present, scores >= limits, both_missing).all(axis=1) & present.any(axis=1)
+
+    clusters = _Clusters(len(vertices))
+    for i, j in zip(left[matched], right[matched]):
+        clusters.union(int(i), int(j))
+    return [(i, int(clusters.find(i))) for i in range(len(vertices)) if clusters.find(i) != i]
+
+
+def er(payload: Dict, output_path: str, workers: Optional[int] = None) -> str:
+    """Resolve duplicate vertices of the input graph of an ER payload
+
+    :param payload:         ER payload, as sent to the coordinator
+    :param output_path:     output EPGM directory
+    :param workers:         number of worker processes. Defaulted to the number of CPUs
+    :return:                output EPGM directory
+    """
+    parameters = payload.get('parameters') or {}
+    path = payload['input']
+    heads = list(epgm.iter_elements(path, 'graphs'))
+    head = epgm.graph_head(payload['label'])
+    vertices = list(epgm.iter_elements(path, 'vertices'))
+    duplicates = resolve(vertices, parameters.get('attribute_thresholds') or {},
+                         num_perm=parameters.get('num_perm', 32), bands=parameters.get('bands', 8),
+                         max_block_size=parameters.get('max_block_size', 100),
+                         max_candidates=parameters.get('max_candidates'), blocking_keys=parameters.get('blocking_keys'),
+                         workers=workers)
+
+    def added(kind: str):
+        for el in epgm.iter_elements(path, kind):
+            el['meta']['graphs'].append(head['id'])
+            yield el
+        if kind == 'edges':
+            for i, j in duplicates:
+                yield {'data': {}, 'meta': {'label': DUPLICATE_OF, 'graphs': [head['id']]}, 'id': epgm.new_id(),
+                       'source': vertices[i]['id'], 'target': vertices[j]['id']}
+
+    epgm.write_elements(output_path, 'graphs', heads + [head])
+    epgm.write_elements(output_path, 'vertices', added('vertices'))
+    epgm.write_elements(output_path, 'edges', added('edges'))
+    return output_path
@@ -0,0 +1,263 @@
+"""Local GCN
+
+Graph convolutional network for the local GCN pipeline. A two-layer GCN is trained on the subgraph of the nodes of one
+type, with SciPy sparse products for the adjacency and NumPy dense products, which use the threads of its BLAS library,
+for the weights. Requires NumPy and SciPy.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from stellar.local.nai import InputGraph, check_predictors, load_model, save_model, write_predictions
+from stellar.instrument import span
+from stellar.model import ARTIFACT_MISMATCH
+
+
+def normalized_adjacency(n: int, src: np.ndarray, dst: np.ndarray) -> sp.csr_matrix:
+    """Symmetrically normalised adjacency with self loops, D^-1/2 (A + I) D^-1/2, of an undirected graph
+
+    :param n:       number of nodes
+    :param src:     source node of each edge
+    :param dst:     destination node of each edge
+    :return:        sparse matrix
+    """
+    a = sp.coo_matrix((np.ones(2 * len(src)), (np.concatenate([src, dst]), np.concatenate([dst, src]))), shape=(n, n))
+    a = a.tocsr()
+    a.data[:] = 1.0  # parallel edges count once
+    a = a + sp.identity(n, format='csr') - sp.diags(a.diagonal())
+    scale = 1.0 / np.sqrt(np.asarray(a.sum(axis=1)).ravel())
+    return sp.diags(scale) @ a @ sp.diags(scale)
+
+
+class _Adam:
+    """Adam optimiser of a list of parameters
+
+    """
+    def __init__(self, params: List[np.ndarray], rate: float, beta1: float = 0.9, beta2: float = 0.999) -> None:
+        self.params = params
+        self.rate = rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.m = [np.zeros_like(p) for p in params]
+        self.v = [np.zeros_like(p) for p in params]
+        self.t = 0
+
+    def step(self, grads: List[np.ndarray]) -> None:
+        self.t += 1
+        for p, g, m, v in zip(self.params, grads, self.m, self.v):
+            m *= self.beta1
+            m += (1 - self.beta1) * g
+            v *= self.beta2
+            v += (1 - self.beta2) * g * g
+            p -= self.rate * (m / (1 - self.beta1 ** self.t)) / (np.sqrt(v / (1 - self.beta2 ** self.t)) + 1e-8)
+
+
+class GCNClassifier:
+    """Two-layer GCN, softmax(Â relu(Â X W1) W2), trained on labelled nodes with cross-entropy and weight decay.
+
+    Â X is computed once, so each step needs one sparse product. In mini-batch training, each step only computes the
+    hidden layer of the neighbours of the batch.
+    """
+    def __init__(self, hidden: int = 16, epochs: int = 200, rate: float = 0.01, weight_decay: float = 5e-4,
+                 batch_size: Optional[int] = None, seed: Optional[int] = None) -> None:
+        """Initialise
+
+        :param hidden:          number of hidden units
+        :param epochs:          number of passes over the labelled nodes
+        :param rate:            learning rate
+        :param weight_decay:    L2 penalty on the first layer weights
+        :param batch_size:      number of labelled nodes per step. Defaulted to full-batch training
+        :param seed:            random seed
+        """
+        self.hidden = hidden
+        self.epochs = epochs
+        self.rate = rate
+        self.weight_decay = weight_decay
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.w1 = self.w2 = None  # type: Optional[np.ndarray]
+
+    def _glorot(self, rows: int, cols: int) -> np.ndarray:
+        limit = np.sqrt(6.0 / (rows + cols))
+        return self.rng.uniform(-limit, limit, (rows, cols))
+
+    def _step(self, adj: sp.csr_matrix, ax, batch: np.ndarray, y: np.ndarray) -> List[np.ndarray]:
+        """Gradients of the loss on a batch of labelled nodes
+
+        :param adj:     normalised adjacency
+        :param ax:      Â X
+        :param batch:   labelled nodes in the batch
+        :param y:       class index of each node in the batch
+        :return:        gradients of [W1, W2]
+        """
+        rows = adj[batch]
+        neighbours = np.unique(rows.indices)
+        a2 = rows[:, neighbours]
+        ax1 = ax[neighbours]
+        m1 = ax1 @ self.w1
+        h = np.maximum(m1, 0)
+        a2h = np.asarray(a2 @ h)
+        logits = a2h @ self.w2
+        logits -= logits.max(axis=1, keepdims=True)
+        grad = np.exp(logits)
+        grad /= grad.sum(axis=1, keepdims=True)
+        grad[np.arange(len(y)), y] -= 1
+        grad /= len(y)
+        dw2 = a2h.T @ grad
+        dm1 = np.asarray(a2.T @ (grad @ self.w2.T)) * (m1 > 0)
+        dw1 = np.asarray(ax1.T @ dm1) + self.weight_decay * self.w1
+        return [dw1, dw2]
+
+    def fit(self, adj: sp.csr_matrix, x, labelled: np.ndarray, y: np.ndarray, classes: int) -> 'GCNClassifier':
+        """Train the network
+
+        :param adj:         normalised adjacency
+        :param x:           dense or sparse feature matrix
+        :param labelled:    labelled nodes
+        :param y:           class index of each labelled node
+        :param classes:     number of classes
+        :return:            self
+        """
+        ax = adj @ x
+        self.w1 = self._glorot(x.shape[1], self.hidden)
+        self.w2 = self._glorot(self.hidden, classes)
+        adam = _Adam([self.w1, self.w2], self.rate)
+        size = self.batch_size or len(labelled)
+        for _ in range(self.epochs):
+            order = self.rng.permutation(len(labelled)) if size < len(labelled) else np.arange(len(labelled))
+            for start in range(0, len(labelled), size):
+                batch = order[start:start + size]
+                adam.step(self._step(adj, ax, labelled[batch], y[batch]))
+        return self
+
+    def embed(self, adj: sp.csr_matrix, x) -> np.ndarray:
+        """Hidden layer of each node
+
+        :param adj:     normalised adjacency
+        :param x:       dense or sparse feature matrix
+        :return:        matrix with one row of hidden units per node
+        """
+        return np.maximum(np.asarray((adj @ x) @ self.w1), 0)
+
+    def predict(self, adj: sp.csr_matrix, x, hidden: Optional[np.ndarray] = None) -> np.ndarray:
+        """Most likely class of each node
+
+        :param adj:     normalised adjacency
+        :param x:       dense or sparse feature matrix
+        :param hidden:  hidden layer, if already computed with embed
+        :return:        class indices
+        """
+        h = self.embed(adj, x) if hidden is None else hidden
+        return np.asarray(adj @ (h @ self.w2)).argmax(axis=1)
+
+
+def features(graph: InputGraph, nodes: np.ndarray, parameters: Dict, names: Optional[List[str]] = None,
+             mean: Optional[np.ndarray] = None, std: Optional[np.ndarray] = None) -> Tuple:
+    """Standardised numeric attributes of nodes, or one-hot node identities if they have none
+
+    :param graph:       input graph
+    :param nodes:       positions of the nodes in the input graph
+    :param parameters:  "parameters" of the NAI payload
+    :param names:       predictor attributes. Defaulted to all numeric attributes not ignored
+    :param mean:        mean of each predictor, e.g. of a trained model. Defaulted to the mean over the nodes
+    :param std:         standard deviation of each predictor. Defaulted to the standard deviation over the nodes
+    :return:            (dense or sparse feature matrix with one row per node, mean, standard deviation)
+    """
+    x = graph.predictors(parameters['node_type'], parameters['target_attribute'],
+                         parameters.get('attributes_to_ignore') or [], names)[nodes]
+    if not x.shape[1]:
+        return sp.identity(len(nodes), format='csr'), np.zeros(0), np.zeros(0)
+    mean = x.mean(axis=0) if mean is None else mean
+    std = x.std(axis=0) if std is None else std
+    return (x - mean) / np.where(std > 0, std, 1.0), mean, std
+
+
+def subgraph(graph: InputGraph, node_type: str) -> Tuple[np.ndarray, sp.csr_matrix]:
+    """Normalised adjacency of the subgraph induced by the nodes of a type
+
+    :param graph:       input graph
+    :param node_type:   node type
+    :return:            (positions of the nodes in the input graph, normalised adjacency)
+    """
+    nodes = np.array([i for i, v in enumerate(graph.vertices) if v['meta']['label'] == node_type], dtype=np.int64)
+    local = np.full(len(graph), -1, dtype=np.int64)
+    local[nodes] = np.arange(len(nodes))
+    src, dst = local[graph.src], local[graph.dst]
+    keep = (src >= 0) & (dst >= 0)
+    return nodes, normalized_adjacency(len(nodes), src[keep], dst[keep])
+
+
+def gcn(payload: Dict, output_path: str, hidden: int = 16, epochs: int = 200, rate: float = 0.01,
+        weight_decay: float = 5e-4, batch_size: Optional[int] = None, seed: Optional[int] = None) -> str:
+    """Infer a node attribute with a GCN on the subgraph of the nodes of the payload's node type.
+
+    The trained weights are saved as a model artifact with the output graph. With a "model_artifact" parameter, they
+    are loaded instead of training, which applies to any graph whose nodes have the same predictor attributes.
+
+    :param payload:         NAI payload, as sent to the coordinator
+    :param output_path:     output EPGM directory
+    :param hidden:          number of hidden units
+    :param epochs:          number of passes over the labelled nodes
+    :param rate:            learning rate
+    :param weight_decay:    L2 penalty on the first layer weights
+    :param batch_size:      number of labelled nodes per step. Defaulted to full-batch training
+    :param seed:            random seed
+    :return:                output EPGM directory
+    """
+    parameters = payload['parameters']
+    graph = InputGraph(payload['input'], payload['inputs']['in_data']['dataset_name'])
+    nodes, adj = subgraph(graph, parameters['node_type'])
+    local = {int(i): k for k, i in enumerate(nodes)}
+    if parameters.get('model_artifact'):
+        meta, arrays = load_model(parameters['model_artifact'], payload['pipelineFilename'], parameters)
+        check_predictors(graph, meta, parameters)
+        if not meta['predictors'] and meta['fingerprint'] != graph.fingerprint():
+            raise ValueError("{}: {} was trained on the node identities of another graph"
+                             .format(ARTIFACT_MISMATCH, parameters['model_artifact']))
+        x, _, _ = features(graph, nodes, parameters, meta['predictors'], arrays['mean'], arrays['std'])
+        model = GCNClassifier(hidden=arrays['w1'].shape[1])
+        model.w1, model.w2 = arrays['w1'], arrays['w2']
+        classes, unlabelled = meta['classes'], graph.unlabelled(parameters['node_type'],
+                                                                parameters['target_attribute'])
+    else:
+        labelled, y, classes, unlabelled = graph.task(parameters['node_type'], parameters['target_attribute'])
+        names = graph.predictor_names(parameters['node_type'], parameters['target_attribute'],
+                                      parameters.get('attributes_to_ignore') or [])
+        x, mean, std = features(graph, nodes, parameters, names)
+        with span('gcn.train', nodes=len(nodes), edges=adj.nnz, features=x.shape[1]):
+            model = GCNClassifier(hidden, epochs, rate, weight_decay, batch_size, seed)
+            model.fit(adj, x, np.array([local[int(i)] for i in labelled], dtype=np.int64), y, len(classes))
+        save_model(output_path, {'pipeline': payload['pipelineFilename'], 'node_type': parameters['node_type'],
+                                  'target_attribute': parameters['target_attribute'], 'classes': classes,
+                                  'predictors': names, 'fingerprint': graph.fingerprint()},
+                   {'w1': model.w1, 'w2': model.w2, 'mean': mean, 'std': std})
+    hidden = model.embed(adj, x)
+    predicted = model.predict(adj, x, hidden)
+    predictions = {graph.vertices[i]['id']: classes[predicted[local[int(i)]]] for i in unlabelled}
+    export = (nodes, hidden) if parameters.get('export_embeddings') else None
+    return write_predictions(graph, output_path, payload['label'], parameters['target_attribute'], predictions,
+                             export)
@@ -0,0 +1,128 @@
+"""Local Ingestion
+
+Creates an EPGM graph from CSV data sources in-process, from the same payload sent to the Stellar Ingestor module.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from stellar.sources import SourceScanner, Chunk, parse_values
+import stellar.epgm as epgm
+from stellar.epgm import ID_ATTRIBUTE
+
+
+class _Ingestion:
+    """Vertices and edges collected from the data sources
+
+    """
+    def __init__(self, payload: Dict, graph_id: str) -> None:
+        self.graph_id = graph_id
+        self.props = {c['name']: c['props'] for c in payload['graphSchema']['classes']}
+        self.links = {cl['name']: cl for cl in payload['graphSchema']['classLinks']}
+        self.vertices = OrderedDict()  # type: Dict[Tuple[str, str], Dict]
+        self.edges = list()  # type: List[Tuple[Dict, str, str, str, str]]
+
+    @staticmethod
+    def _attributes(mapping: Dict, props: Dict[str, str], chunk: Chunk) -> Dict[str, List]:
+        """Parse mapped attribute columns of a chunk
+
+        :param mapping:     node or link mapping from the payload
+        :param props:       attribute types of the element type
+        :param chunk:       dict of {column: values}
+        :return:            dict of {attribute: parsed values}
+        """
+        return {k: parse_values(chunk[v['column']], props.get(k, 'string'))
+                for k, v in mapping.items() if not k.startswith('@')}
+
+    @staticmethod
+    def _element_data(attributes: Dict[str, List], i: int) -> Dict:
+        return {k: values[i] for k, values in attributes.items() if values[i] is not None}
+
+    def add_nodes(self, mapping: Dict, chunk: Chunk) -> None:
+        """Add vertices from a chunk of a node mapping's source
+
+        :param mapping:     node mapping from the payload
+        :param chunk:       dict of {column: values}
+        """
+        node_type = mapping['@type']
+        attributes = self._attributes(mapping, self.props.get(node_type, {}), chunk)
+        for i, node_id in enumerate(chunk[mapping['@id']['column']]):
+            if not node_id:
+                continue
+            vertex = self.vertices.get((node_type, node_id))
+            if vertex is None:
+                vertex = {'data': {ID_ATTRIBUTE: node_id},
+                          'meta': {'label': node_type, 'graphs': [self.graph_id]}, 'id': epgm.new_id()}
+                self.vertices[(node_type, node_id)] = vertex
+            vertex['data'].update(self._element_data(attributes, i))
+
+    def add_links(self, mapping: Dict, chunk: Chunk) -> None:
+        """Collect edges from a chunk of a link mapping's source. Endpoints are resolved once all vertices are known.
+
+        :param mapping:     link mapping from the payload
+        :param chunk:       dict of {column: values}
+        """
+        link = self.links[mapping['@type']['name']]
+        attributes = self._attributes(mapping, link.get('props', {}), chunk)
+        src, dst = chunk[mapping['@src']['column']], chunk[mapping['@dest']['column']]
+        for i in range(len(src)):
+            self.edges.append((self._element_data(attributes, i), link['name'], link['source'], src[i],
+                               link['target'], dst[i]))
+
+    def resolved_edges(self) -> List[Dict]:
+        """Edges whose endpoints are both ingested vertices
+
+        :return:    list of edge elements
+        """
+        edges = list()
+        for data, name, src_type, src, dst_type, dst in self.edges:
+            source, target = self.vertices.get((src_type, src)), self.vertices.get((dst_type, dst))
+            if source is not None and target is not None:
+                edges.append({'data': data, 'meta': {'label': name, 'graphs': [self.graph_id]},
+                              'id': epgm.new_id(), 'source': source['id'], 'target': target['id']})
+        return edges
+
+
+def ingest(payload: Dict, output_path: str, chunk_size: int = 10000) -> str:
+    """Ingest data sources into a new EPGM directory
+
+    :param payload:     ingestion payload, as sent to the coordinator
+    :param output_path: output EPGM directory
+    :param chunk_size:  number of rows read at a time
+    :return:            output EPGM directory
+    """
+    head = epgm.graph_head(payload['label'])
+    ingestion = _Ingestion(payload, head['id'])
+    scanner = SourceScanner(chunk_size)
+    for mapping in payload['mapping']['nodes']:
+        scanner.add(mapping['@id']['source'], lambda _, chunk, m=mapping: ingestion.add_nodes(m, chunk))
+    for mapping in payload['mapping']['links']:
+        scanner.add(mapping['@src']['source'], lambda _, chunk, m=mapping: ingestion.add_links(m, chunk))
+    scanner.scan()
+
+    epgm.write_elements(output_path, 'graphs', [head])
+    epgm.write_elements(output_path, 'vertices', ingestion.vertices.values())
+    epgm.write_elements(output_path, 'edges', ingestion.resolved_edges())
+    return output_path
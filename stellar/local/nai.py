@@ -0,0 +1,345 @@
+"""Local Node Attribute Inference
+
+Runs the NAI pipelines of stellar.model in-process, from the same payload sent to the Stellar NAI module. The inferred
+attribute is written to the nodes missing it, and all elements of the input graph are added to a new graph. Requires
+NumPy.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import hashlib
+import importlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from stellar.local.ingest import ID_ATTRIBUTE
+from stellar.embeddings import write_embeddings
+from stellar.model import ARTIFACT_DIR, ARTIFACT_MISMATCH, MODEL_FILE
+import stellar.epgm as epgm
+
+WEIGHTS_FILE = 'weights.npz'
+
+# trained model metadata and arrays
+Artifact = Tuple[Dict, Dict[str, np.ndarray]]
+
+# pipeline file name: (module, function) of the local engine running it. There is no local metric learning engine,
+# so pipeline_full.json is only run by the coordinator.
+PIPELINES = {
+    'pipeline_basic.json': ('stellar.local.node2vec', 'node2vec'),
+    'pipeline_gcn.json': ('stellar.local.gcn', 'gcn')
+}
+
+
+class InputGraph:
+    """Elements of the input graph of a NAI payload, indexed for the local engines
+
+    Attributes:
+        path (str):                     input EPGM directory
+        graph_id (str):                 ID of the input graph
+        vertices (List[Dict]):          vertices of the input graph
+        index (Dict[str, int]):         dict of {vertex ID: position in vertices}
+        src (np.ndarray):               position of the source vertex of each edge
+        dst (np.ndarray):               position of the destination vertex of each edge
+    """
+    def __init__(self, path: str, label: str) -> None:
+        self.path = path
+        heads = list(epgm.iter_elements(path, 'graphs'))
+        labelled = [g for g in heads if g['meta']['label'] == label]
+        self.graph_id = (labelled or heads)[-1]['id']
+        self.vertices = [v for v in epgm.iter_elements(path, 'vertices') if self.graph_id in v['meta']['graphs']]
+        self.index = {v['id']: i for i, v in enumerate(self.vertices)}
+        ends = [(self.index[e['source']], self.index[e['target']]) for e in epgm.iter_elements(path, 'edges')
+                if self.graph_id in e['meta']['graphs'] and e['source'] in self.index and e['target'] in self.index]
+        self.src = np.array([s for s, _ in ends], dtype=np.int64)
+        self.dst = np.array([d for _, d in ends], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Undirected adjacency without self loops or parallel edges, in compressed sparse row format
+
+        :return:    (row offsets, column indices), with the columns of each row sorted
+        """
+        n = len(self)
+        keys = np.unique(np.concatenate([self.src * n + self.dst, self.dst * n + self.src]))
+        rows, cols = keys // n, keys % n
+        keep = rows != cols
+        rows, cols = rows[keep], cols[keep]
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr, cols
+
+    def fingerprint(self) -> str:
+        """Fingerprint of the vertices and edges of the graph, to check that a transductive model was trained on it
+
+        :return:    hex digest
+        """
+        h = hashlib.sha1('\n'.join(v['id'] for v in self.vertices).encode('utf-8'))
+        for a in self.csr():
+            h.update(a.tobytes())
+        return h.hexdigest()
+
+    def task(self, node_type: str, target: str) -> Tuple[np.ndarray, np.ndarray, List, np.ndarray]:
+        """Nodes to train on and nodes to infer the attribute of
+
+        :param node_type:   type of node to infer the attribute on
+        :param target:      attribute to infer
+        :return:            (positions of labelled nodes, their class indices, class values,
+                             positions of unlabelled nodes)
+        """
+        nodes = [i for i, v in enumerate(self.vertices) if v['meta']['label'] == node_type]
+        labelled = [i for i in nodes if self.vertices[i]['data'].get(target) not in (None, '')]
+        if not labelled:
+            raise ValueError("no '{}' nodes have a value of '{}' to train on".format(node_type, target))
+        values = [self.vertices[i]['data'][target] for i in labelled]
+        classes = sorted(set(values), key=str)
+        lookup = {c: k for k, c in enumerate(classes)}
+        return (np.array(labelled, dtype=np.int64), np.array([lookup[v] for v in values], dtype=np.int64), classes,
+                self.unlabelled(node_type, target))
+
+    def unlabelled(self, node_type: str, target: str) -> np.ndarray:
+        """Nodes to infer the attribute of
+
+        :param node_type:   type of node to infer the attribute on
+        :param target:      attribute to infer
+        :return:            positions of the nodes of the type without a value of the attribute
+        """
+        return np.array([i for i, v in enumerate(self.vertices) if v['meta']['label'] == node_type and
+                         v['data'].get(target) in (None, '')], dtype=np.int64)
+
+    def predictor_names(self, node_type: str, target: str, ignore: List[str]) -> List[str]:
+        """Attributes of the nodes of a type used as predictors
+
+        :param node_type:   type of node to infer the attribute on
+        :param target:      attribute to infer
+        :param ignore:      attributes not to use as predictors
+        :return:            sorted attribute names
+        """
+        skip = set(ignore) | {target, ID_ATTRIBUTE}
+        return sorted(set(k for v in self.vertices if v['meta']['label'] == node_type
+                          for k in v['data'].keys() if k not in skip))
+
+    def predictors(self, node_type: str, target: str, ignore: List[str],
+                   names: Optional[List[str]] = None) -> np.ndarray:
+        """Numeric attributes of the nodes of a type, as a matrix with one row per vertex
+
+        :param node_type:   type of node to infer the attribute on
+        :param target:      attribute to infer
+        :param ignore:      attributes not to use as predictors
+        :param names:       predictor attributes, e.g. of a trained model. Defaulted to predictor_names
+        :return:            matrix of predictors, zero for vertices of other types
+        """
+        names = self.predictor_names(node_type, target, ignore) if names is None else names
+        x = np.zeros((len(self), len(names)))
+        for i, v in enumerate(self.vertices):
+            if v['meta']['label'] != node_type:
+                continue
+            for j, name in enumerate(names):
+                try:
+                    x[i, j] = float(v['data'][name])
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError("attribute '{}' of node {} is missing or not numeric, add it to the attributes "
+                                     "to ignore".format(name, v['id']))
+        return x
+
+
+class SoftmaxClassifier:
+    """Multinomial logistic regression trained by full-batch gradient descent
+
+    """
+    def __init__(self, iterations: int = 300, rate: float = 0.5, l2: float = 1e-3) -> None:
+        self.iterations = iterations
+        self.rate = rate
+        self.l2 = l2
+        self.weights = self.bias = None  # type: Optional[np.ndarray]
+
+    def fit(self, x: np.ndarray, y: np.ndarray, classes: int) -> 'SoftmaxClassifier':
+        """Train the classifier
+
+        :param x:           feature matrix
+        :param y:           class index of each row
+        :param classes:     number of classes
+        :return:            self
+        """
+        self.weights = np.zeros((x.shape[1], classes))
+        self.bias = np.zeros(classes)
+        for _ in range(self.iterations):
+            grad = self.probabilities(x)
+            grad[np.arange(len(y)), y] -= 1
+            grad /= len(y)
+            self.weights -= self.rate * (x.T @ grad + self.l2 * self.weights)
+            self.bias -= self.rate * grad.sum(axis=0)
+        return self
+
+    def probabilities(self, x: np.ndarray) -> np.ndarray:
+        """Class probabilities
+
+        :param x:   feature matrix
+        :return:    matrix with one row of class probabilities per row of x
+        """
+        logits = x @ self.weights + self.bias
+        logits -= logits.max(axis=1, keepdims=True)
+        p = np.exp(logits)
+        return p / p.sum(axis=1, keepdims=True)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Most likely class of each row
+
+        :param x:   feature matrix
+        :return:    class indices
+        """
+        return self.probabilities(x).argmax(axis=1)
+
+
+def save_model(output_path: str, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+    """Save a trained model artifact with the output graph
+
+    :param output_path: output EPGM directory
+    :param meta:        JSON metadata, e.g. node type, target attribute, classes and predictors
+    :param arrays:      trained weights
+    """
+    path = os.path.join(output_path, ARTIFACT_DIR)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, MODEL_FILE), 'w', encoding='utf-8') as fp:
+        json.dump(meta, fp)
+    np.savez(os.path.join(path, WEIGHTS_FILE), **arrays)
+
+
+def load_model(path: str, pipeline: str, parameters: Dict) -> Artifact:
+    """Load a trained model artifact, checking that it was trained for the task
+
+    :param path:        artifact directory
+    :param pipeline:    pipeline file name of the task
+    :param parameters:  "parameters" of the NAI payload
+    :return:            (metadata, trained weights)
+    """
+    with open(os.path.join(path, MODEL_FILE), 'r', encoding='utf-8') as fp:
+        meta = json.load(fp)
+    for key, value in [('pipeline', pipeline), ('node_type', parameters['node_type']),
+                       ('target_attribute', parameters['target_attribute'])]:
+        if meta[key] != value:
+            raise ValueError("{}: {} was trained with {} '{}', not '{}'".format(ARTIFACT_MISMATCH, path, key, meta[key],
+                                                                                value))
+    with np.load(os.path.join(path, WEIGHTS_FILE)) as data:
+        return meta, {k: data[k] for k in data.files}
+
+
+def check_predictors(graph: InputGraph, meta: Dict, parameters: Dict) -> None:
+    """Check that a graph has the predictor attributes a model was trained with
+
+    :param graph:       input graph
+    :param meta:        model artifact metadata
+    :param parameters:  "parameters" of the NAI payload
+    """
+    names = graph.predictor_names(parameters['node_type'], parameters['target_attribute'],
+                                  parameters.get('attributes_to_ignore') or [])
+    if names != meta['predictors']:
+        raise ValueError("{}: it was trained with predictors {}, the graph has {}".format(ARTIFACT_MISMATCH,
+                                                                                          meta['predictors'], names))
+
+
+def infer(graph: InputGraph, features: np.ndarray, parameters: Dict,
+          artifact: Optional[Artifact] = None) -> Tuple[Dict[str, any], Artifact]:
+    """Train a classifier on the labelled nodes, or use a trained one, and predict the target attribute of the
+    unlabelled ones
+
+    :param graph:       input graph
+    :param features:    matrix with one row of features per vertex, e.g. embeddings, used as they are. Numeric node
+                        attributes are standardised and added to them.
+    :param parameters:  "parameters" of the NAI payload
+    :param artifact:    trained classifier, from a previous call
+    :return:            (dict of {vertex ID: predicted value}, trained classifier)
+    """
+    node_type, target = parameters['node_type'], parameters['target_attribute']
+    ignore = parameters.get('attributes_to_ignore') or []
+    if artifact is None:
+        labelled, y, classes, unlabelled = graph.task(node_type, target)
+        names = graph.predictor_names(node_type, target, ignore)
+        predictors = graph.predictors(node_type, target, ignore, names)
+        mean, std = predictors[labelled].mean(axis=0), predictors[labelled].std(axis=0)
+    else:
+        meta, arrays = artifact
+        check_predictors(graph, meta, parameters)
+        classes, names, mean, std = meta['classes'], meta['predictors'], arrays['mean'], arrays['std']
+        unlabelled = graph.unlabelled(node_type, target)
+        predictors = graph.predictors(node_type, target, ignore, names)
+    x = np.hstack([features, (predictors - mean) / np.where(std > 0, std, 1.0)])
+    classifier = SoftmaxClassifier()
+    if artifact is None:
+        classifier.fit(x[labelled], y, len(classes))
+        artifact = ({'node_type': node_type, 'target_attribute': target, 'classes': classes, 'predictors': names},
+                    {'weights': classifier.weights, 'bias': classifier.bias, 'mean': mean, 'std': std})
+    else:
+        classifier.weights, classifier.bias = artifact[1]['weights'], artifact[1]['bias']
+    if not len(unlabelled):
+        return dict(), artifact
+    return ({graph.vertices[i]['id']: classes[k] for i, k in zip(unlabelled, classifier.predict(x[unlabelled]))},
+            artifact)
+
+
+def write_predictions(graph: InputGraph, output_path: str, label: str, target: str, predictions: Dict[str, any],
+                      embeddings: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> str:
+    """Write the input EPGM with predicted values and a new graph containing the elements of the input graph
+
+    :param graph:           input graph
+    :param output_path:     output EPGM directory
+    :param label:           label of the new graph
+    :param target:          attribute predicted
+    :param predictions:     dict of {vertex ID: predicted value}
+    :param embeddings:      (positions of vertices, matrix with their embeddings) to export with the graph
+    :return:                output EPGM directory
+    """
+    if embeddings is not None:
+        write_embeddings(output_path, [graph.vertices[i]['id'] for i in embeddings[0]], embeddings[1])
+    head = epgm.graph_head(label)
+    epgm.write_elements(output_path, 'graphs', list(epgm.iter_elements(graph.path, 'graphs')) + [head])
+
+    def updated(kind: str):
+        for el in epgm.iter_elements(graph.path, kind):
+            if graph.graph_id in el['meta']['graphs']:
+                el['meta']['graphs'].append(head['id'])
+            if el['id'] in predictions and kind == 'vertices':
+                el['data'][target] = predictions[el['id']]
+            yield el
+
+    epgm.write_elements(output_path, 'vertices', updated('vertices'))
+    epgm.write_elements(output_path, 'edges', updated('edges'))
+    return output_path
+
+
+def nai(payload: Dict, output_path: str) -> str:
+    """Run the pipeline of a NAI payload
+
+    :param payload:     NAI payload, as sent to the coordinator
+    :param output_path: output EPGM directory
+    :return:            output EPGM directory
+    """
+    pipeline = PIPELINES.get(payload.get('pipelineFilename'))
+    if pipeline is None:
+        raise ValueError("pipeline '{}' cannot be run locally".format(payload.get('pipelineFilename')))
+    engine = getattr(importlib.import_module(pipeline[0]), pipeline[1])
+    return engine(payload, output_path)
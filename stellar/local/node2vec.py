@@ -0,0 +1,243 @@
+"""Local Node2Vec
+
+Node2Vec representation learning for the local NAI pipelines. Second-order biased random walks are generated for all
+walkers at once with NumPy, in parallel processes for large graphs, and node embeddings are the truncated SVD of the
+positive pointwise mutual information of node co-occurrences within the walks, which is the matrix that skip-gram with
+negative sampling implicitly factorises.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from stellar.local.nai import InputGraph, infer, load_model, save_model, write_predictions
+from stellar.instrument import span
+from stellar.model import ARTIFACT_MISMATCH
+
+# walks generated per task, so that results do not depend on the number of worker processes
+_WALKS_PER_TASK = 10000
+
+
+def _is_edge(keys: np.ndarray, n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Vectorised adjacency test by binary search of the sorted edge keys u * n + v
+
+    :param keys:    sorted edge keys
+    :param n:       number of nodes
+    :param u:       source nodes
+    :param v:       destination nodes
+    :return:        boolean array, true where u and v are adjacent
+    """
+    k = u * n + v
+    i = np.minimum(np.searchsorted(keys, k), len(keys) - 1)
+    return keys[i] == k if len(keys) else np.zeros(len(k), dtype=bool)
+
+
+def random_walks(indptr: np.ndarray, indices: np.ndarray, starts: np.ndarray, length: int, p: float, q: float,
+                 seed: Optional[int] = None) -> np.ndarray:
+    """Node2Vec walks from each start node, advancing all walkers one step at a time.
+
+    The next node is drawn uniformly from the neighbours of the current node and accepted with probability proportional
+    to its search bias: 1/p to return to the previous node, 1 for a neighbour of the previous node and 1/q otherwise.
+    Rejected walkers draw again. This needs no per-edge alias tables, whose memory grows with the sum of squared
+    degrees. Walkers on isolated nodes stay where they are.
+
+    :param indptr:      CSR row offsets
+    :param indices:     CSR column indices, sorted within each row
+    :param starts:      start node of each walk
+    :param length:      number of nodes per walk
+    :param p:           return parameter
+    :param q:           in-out parameter
+    :param seed:        random seed
+    :return:            matrix with one walk per row
+    """
+    rng = np.random.default_rng(seed)
+    n = len(indptr) - 1
+    degree = np.diff(indptr)
+    keys = np.repeat(np.arange(n, dtype=np.int64), degree) * n + indices
+    bias = np.array([1.0 / p, 1.0, 1.0 / q])
+    max_bias = bias.max()
+
+    walks = np.empty((len(starts), length), dtype=np.int64)
+    walks[:, 0] = starts
+    for t in range(1, length):
+        cur = walks[:, t - 1]
+        nxt = cur.copy()
+        pending = np.flatnonzero(degree[cur] > 0)
+        while pending.size:
+            c = cur[pending]
+            x = indices[indptr[c] + (rng.random(pending.size) * degree[c]).astype(np.int64)]
+            if t == 1:
+                nxt[pending] = x
+                break
+            prev = walks[pending, t - 2]
+            kind = np.where(x == prev, 0, np.where(_is_edge(keys, n, prev, x), 1, 2))
+            accept = rng.random(pending.size) * max_bias < bias[kind]
+            nxt[pending[accept]] = x[accept]
+            pending = pending[~accept]
+        walks[:, t] = nxt
+    return walks
+
+
+def _walk_task(args: Tuple) -> np.ndarray:
+    return random_walks(*args)
+
+
+def generate_walks(indptr: np.ndarray, indices: np.ndarray, walks_per_node: int, length: int, p: float, q: float,
+                   workers: Optional[int] = None, seed: Optional[int] = None) -> np.ndarray:
+    """Walks from every node, split into tasks run in worker processes when there is more than one
+
+    :param indptr:          CSR row offsets
+    :param indices:         CSR column indices, sorted within each row
+    :param walks_per_node:  number of walks starting at each node
+    :param length:          number of nodes per walk
+    :param p:               return parameter
+    :param q:               in-out parameter
+    :param workers:         number of worker processes. Defaulted to the number of CPUs
+    :param seed:            random seed
+    :return:                matrix with one walk per row
+    """
+    n = len(indptr) - 1
+    starts = np.tile(np.arange(n, dtype=np.int64), walks_per_node)
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-len(starts) // _WALKS_PER_TASK)))
+    tasks = [(indptr, indices, starts[i * _WALKS_PER_TASK:(i + 1) * _WALKS_PER_TASK], length, p, q, s)
+             for i, s in enumerate(seeds)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        return np.vstack([_walk_task(t) for t in tasks])
+    with ProcessPoolExecutor(workers) as pool:
+        return np.vstack(list(pool.map(_walk_task, tasks)))
+
+
+class _CooccurrenceMatrix:
+    """Sparse symmetric matrix in coordinate format, sorted by row
+
+    """
+    def __init__(self, n: int, rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> None:
+        self.n = n
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+        self._starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else rows
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        """Matrix product with a dense matrix
+
+        :param x:   dense matrix with n rows
+        :return:    dense matrix with n rows
+        """
+        out = np.zeros((self.n, x.shape[1]))
+        if len(self.rows):
+            out[self.rows[self._starts]] = np.add.reduceat(self.values[:, None] * x[self.cols], self._starts, axis=0)
+        return out
+
+
+def ppmi(walks: np.ndarray, n: int, window: int) -> _CooccurrenceMatrix:
+    """Positive pointwise mutual information of nodes occurring within a window of each other in the walks
+
+    :param walks:   matrix with one walk per row
+    :param n:       number of nodes
+    :param window:  maximum distance between co-occurring nodes
+    :return:        sparse PPMI matrix
+    """
+    keys, counts = np.empty(0, dtype=np.int64), np.empty(0)
+    for d in range(1, min(window, walks.shape[1] - 1) + 1):
+        a, b = walks[:, :-d].ravel(), walks[:, d:].ravel()
+        distinct = a != b
+        a, b = a[distinct], b[distinct]
+        pair_keys, pair_counts = np.unique(np.concatenate([a * n + b, b * n + a]), return_counts=True)
+        keys, inverse = np.unique(np.concatenate([keys, pair_keys]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([counts, pair_counts]), minlength=len(keys))
+    rows, cols = keys // n, keys % n
+    totals = np.bincount(rows, weights=counts, minlength=n)
+    values = np.log(counts * counts.sum() / (totals[rows] * totals[cols])) if len(keys) else counts
+    keep = values > 0
+    return _CooccurrenceMatrix(n, rows[keep], cols[keep], values[keep])
+
+
+def embed(matrix: _CooccurrenceMatrix, dimensions: int, iterations: int = 4,
+          seed: Optional[int] = None) -> np.ndarray:
+    """Node embeddings from a randomised truncated SVD of a symmetric matrix
+
+    :param matrix:      sparse symmetric matrix
+    :param dimensions:  number of dimensions
+    :param iterations:  number of power iterations
+    :param seed:        random seed
+    :return:            matrix with one embedding per node
+    """
+    rng = np.random.default_rng(seed)
+    k = min(dimensions, matrix.n)
+    q, _ = np.linalg.qr(matrix.dot(rng.standard_normal((matrix.n, min(k + 10, matrix.n)))))
+    for _ in range(iterations):
+        q, _ = np.linalg.qr(matrix.dot(q))
+    u, s, _ = np.linalg.svd(matrix.dot(q).T, full_matrices=False)
+    return (q @ u[:, :k]) * np.sqrt(s[:k])
+
+
+def node2vec(payload: Dict, output_path: str, dimensions: int = 64, walks_per_node: int = 10, walk_length: int = 20,
+             window: int = 5, p: float = 1.0, q: float = 1.0, workers: Optional[int] = None,
+             seed: Optional[int] = None) -> str:
+    """Infer a node attribute from Node2Vec embeddings and numeric node attributes.
+
+    The embeddings and the trained classifier are saved as a model artifact with the output graph. With a
+    "model_artifact" parameter, they are loaded instead, which is only possible for the same graph structure, e.g. with
+    new attribute values.
+
+    :param payload:         NAI payload, as sent to the coordinator
+    :param output_path:     output EPGM directory
+    :param dimensions:      number of embedding dimensions
+    :param walks_per_node:  number of walks starting at each node
+    :param walk_length:     number of nodes per walk
+    :param window:          maximum distance between co-occurring nodes in a walk
+    :param p:               return parameter
+    :param q:               in-out parameter
+    :param workers:         number of worker processes for walks. Defaulted to the number of CPUs
+    :param seed:            random seed
+    :return:                output EPGM directory
+    """
+    parameters = payload['parameters']
+    graph = InputGraph(payload['input'], payload['inputs']['in_data']['dataset_name'])
+    fingerprint = graph.fingerprint()
+    artifact = None
+    if parameters.get('model_artifact'):
+        artifact = load_model(parameters['model_artifact'], payload['pipelineFilename'], parameters)
+        if artifact[0]['fingerprint'] != fingerprint:
+            raise ValueError("{}: {} was trained on another graph, and Node2Vec embeddings only apply to the graph "
+                             "they were learned on".format(ARTIFACT_MISMATCH, parameters['model_artifact']))
+        embeddings = artifact[1]['embeddings']
+    else:
+        indptr, indices = graph.csr()
+        with span('node2vec.walks', nodes=len(graph), edges=len(indices)):
+            walks = generate_walks(indptr, indices, walks_per_node, walk_length, p, q, workers, seed)
+        with span('node2vec.embed', dimensions=dimensions):
+            embeddings = embed(ppmi(walks, len(graph), window), dimensions, seed=seed)
+    predictions, trained = infer(graph, embeddings, parameters, artifact)
+    if artifact is None:
+        save_model(output_path, dict(trained[0], pipeline=payload['pipelineFilename'], fingerprint=fingerprint),
+                   dict(trained[1], embeddings=embeddings))
+    export = (np.arange(len(graph)), embeddings) if parameters.get('export_embeddings') else None
+    return write_predictions(graph, output_path, payload['label'], parameters['target_attribute'], predictions,
+                             export)
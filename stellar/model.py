@@ -25,21 +25,53 @@ __copyright__ = """
 """
 __license__ = "Apache 2.0"
 
-from typing import Dict
+import copy
+from typing import Dict, Optional
+
+# directory of the trained model artifact in the output graph of a NAI task, and its metadata file
+ARTIFACT_DIR = 'model'
+MODEL_FILE = 'model.json'
+
+# start of the failure reason of NAI tasks whose model artifact does not apply to the task or graph
+ARTIFACT_MISMATCH = 'model artifact does not apply'
 
 
 class StellarMLModel:
     """Base class for Stellar ML Models
 
+    Attributes:
+        params (Dict):              pipeline parameters
+        artifact (Optional[str]):   path to a trained model artifact. When set, NAI tasks with this model only run
+                                    inference with the trained model instead of training a new one. The output
+                                    graph of StellarSession.predict has a copy of the model with the artifact of
+                                    the trained model, as its model attribute.
     """
-    def __init__(self, params: Dict) -> None:
+
+    # whether a trained model only applies to the graph it was trained on
+    transductive = False
+
+    def __init__(self, params: Dict, artifact: Optional[str] = None) -> None:
         self.params = params
+        self.artifact = artifact
+
+    def with_artifact(self, artifact: Optional[str]) -> 'StellarMLModel':
+        """Copy of the model using a trained model artifact
+
+        :param artifact:    path to a trained model artifact, or None to train a new model
+        :return:            model object
+        """
+        model = copy.copy(self)
+        model.artifact = artifact
+        return model
 
 
 class Node2Vec(StellarMLModel):
     """Node2Vec ML Model
 
     """
+
+    transductive = True
+
     def __init__(self, metric_learning: bool = False) -> None:
         if metric_learning:
             StellarMLModel.__init__(self, {'pipelineFilename': 'pipeline_full.json'})
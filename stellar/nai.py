@@ -36,7 +36,7 @@ class StellarNAIPayload(Payload):
 
     """
     def __init__(self, session_id: str, graph: StellarGraph, model: StellarMLModel, target_attribute: str,
-                 node_type: str, attributes_to_ignore: List[str], label: str):
+                 node_type: str, attributes_to_ignore: List[str], label: str, export_embeddings: bool = False):
         Payload.__init__(self, session_id, label)
         self.input = graph.path
         self.inputs = {
@@ -50,4 +50,8 @@ class StellarNAIPayload(Payload):
             'node_type': node_type,
             'attributes_to_ignore': attributes_to_ignore
         }
+        if export_embeddings:
+            self.parameters['export_embeddings'] = True
+        if model.artifact is not None:
+            self.parameters['model_artifact'] = model.artifact
         self.pipelineFilename = model.params.get('pipelineFilename', 'pipeline_basic.json')
@@ -41,9 +41,12 @@ class Payload:
         self.sessionId = session_id
         self.label = label
 
-    def to_json(self) -> str:
+    def to_json(self, compact: bool = False) -> str:
         """Turn payload into JSON string
 
+        :param compact: omit indentation and whitespace
         :return: JSON string
         """
+        if compact:
+            return json.dumps(self.__dict__, separators=(',', ':'))
         return json.dumps(self.__dict__, indent=4)
@@ -0,0 +1,209 @@
+"""Pipeline
+
+Declarative chaining of Stellar modules. Each stage is started as soon as the graph it depends on is available, so
+independent branches run concurrently.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional, Callable, Union
+
+from stellar.session import StellarSession, StellarTask, StellarResult
+from stellar.ingestion import GraphSchema, NodeMapping, EdgeMapping
+from stellar.graph import StellarGraph
+from stellar.model import StellarMLModel
+from stellar.entity import StellarEntityResolver
+
+GraphSource = Union[str, StellarGraph]
+
+
+class Stage:
+    """Single step of a pipeline
+
+    Attributes:
+        name (str):         Unique stage name
+        task_name (str):    'ingest' | 'er' | 'nai'
+        source:             Name of the stage producing the input graph, an input graph object, or None
+    """
+    def __init__(self, name: str, task_name: str, source: Optional[GraphSource],
+                 start: Callable[[Optional[StellarGraph]], StellarTask],
+                 label: Callable[[Optional[StellarGraph]], str]) -> None:
+        """Initialise
+
+        :param name:        stage name
+        :param task_name:   name of task
+        :param source:      input graph or name of stage producing it
+        :param start:       callable to start the task given the input graph
+        :param label:       callable to obtain the output label given the input graph
+        """
+        self.name = name
+        self.task_name = task_name
+        self.source = source
+        self.start = start
+        self.label = label
+
+    def __repr__(self):
+        return "Stage(name=\"{}\",task=\"{}\")".format(self.name, self.task_name)
+
+
+class Pipeline:
+    """Chains ingestion, entity resolution and node attribute inference stages
+
+    Attributes:
+        state (Dict[str, str]):         session ID of each started stage; pass it to run() to resume
+        timings (Dict[str, float]):     wall-clock seconds of each stage, from start to result
+    """
+    def __init__(self, session: StellarSession) -> None:
+        self._session = session
+        self._stages = dict()  # type: Dict[str, Stage]
+        self.state = dict()  # type: Dict[str, str]
+        self.timings = dict()  # type: Dict[str, float]
+
+    def __repr__(self):
+        return "Pipeline(stages={})".format(list(self._stages.keys()))
+
+    def _add(self, stage: Stage) -> 'Pipeline':
+        """Add stage to pipeline
+
+        :param stage:   stage to add
+        :return:        self
+        """
+        if stage.name in self._stages:
+            raise KeyError("Stage '{}' already exists".format(stage.name))
+        if isinstance(stage.source, str) and stage.source not in self._stages:
+            raise KeyError("Stage '{}' depends on unknown stage '{}'".format(stage.name, stage.source))
+        self._stages[stage.name] = stage
+        return self
+
+    def ingest(self, name: str, schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]],
+               label: str = 'ingest') -> 'Pipeline':
+        """Add an ingestion stage
+
+        :param name:        Stage name
+        :param schema:      Graph schema
+        :param mappings:    List of data-source mappings
+        :param label:       Label to be assigned to output graph
+        :return:            self
+        """
+        return self._add(Stage(name, StellarSession._TASK_INGEST, None,
+                               lambda _: self._session.ingest_start(schema, mappings, label),
+                               lambda _: label))
+
+    def entity_resolution(self, name: str, source: GraphSource, resolver: StellarEntityResolver,
+                          attribute_thresholds: Optional[Dict[str, float]] = None,
+                          label: str = 'er') -> 'Pipeline':
+        """Add an entity resolution stage
+
+        :param name:        Stage name
+        :param source:      Input graph object, or name of the stage producing it
+        :param resolver:    Entity Resolution technique to use
+        :param attribute_thresholds:      thresholds for each attribute as a dict - normalised between 0 and 1
+        :param label:       Label to be assigned to output graph
+        :return:            self
+        """
+        return self._add(Stage(name, StellarSession._TASK_ER, source,
+                               lambda g: self._session.er_start(g, resolver, attribute_thresholds or {}, label),
+                               lambda g: g.label))  # ER uses same label instead of creating new graph
+
+    def predict(self, name: str, source: GraphSource, model: StellarMLModel, target_attribute: str,
+                node_type: str, attributes_to_ignore: Optional[List[str]] = None,
+                label: str = 'nai') -> 'Pipeline':
+        """Add a node attribute inference stage
+
+        :param name:                    Stage name
+        :param source:                  Input graph object, or name of the stage producing it
+        :param model:                   Machine Learning model object
+        :param target_attribute:        Attribute to infer
+        :param node_type:               Type of node to infer attributes on
+        :param attributes_to_ignore:    List of attributes to ignore
+        :param label:                   Label to be assigned to output graph
+        :return:                        self
+        """
+        return self._add(Stage(name, StellarSession._TASK_NAI, source,
+                               lambda g: self._session.nai_start(g, model, target_attribute, node_type,
+                                                                 attributes_to_ignore or [], label),
+                               lambda g: g.label))  # NAI uses same label instead of creating new graph
+
+    def _resume(self, stage: Stage, session_id: str) -> Optional[StellarTask]:
+        """Re-attach to a task started by a previous run
+
+        :param stage:       stage of the task
+        :param session_id:  session ID recorded for the stage
+        :return:            task, or None if it cannot be resumed and must be started again
+        """
+        task = self._session.get_task(stage.task_name, session_id)
+        try:
+            if task.is_done() and not task.wait_for_result().success:
+                return None
+        except (TypeError, ValueError, KeyError):  # session state missing from Redis
+            return None
+        return task
+
+    def _run_stage(self, stage: Stage, source: Optional['Future[StellarGraph]'], resume: Dict[str, str],
+                   timeout: float) -> StellarGraph:
+        """Wait for the input graph, then start the stage and wait for its result
+
+        :param stage:       stage to run
+        :param source:      future of the input graph, if produced by another stage
+        :param resume:      session IDs recorded by a previous run
+        :param timeout:     timeout in seconds for the task. Zero to poll forever
+        :return:            output graph object
+        """
+        graph = source.result() if source is not None else stage.source
+        begin = time.monotonic()
+        task = self._resume(stage, resume[stage.name]) if stage.name in resume else None
+        if task is None:
+            task = stage.start(graph)
+        self.state[stage.name] = task.session_id
+        res = task.wait_for_result(timeout)  # type: StellarResult
+        self.timings[stage.name] = time.monotonic() - begin
+        return StellarSession._result_graph(res, stage.label(graph))
+
+    def run(self, max_in_flight: int = 4, timeout: float = 0,
+            resume: Optional[Dict[str, str]] = None) -> Dict[str, StellarGraph]:
+        """Run all stages
+
+        :param max_in_flight:   Maximum number of stages running at the same time
+        :param timeout:         Timeout in seconds for each stage. Defaulted to zero to poll forever.
+        :param resume:          State of a previous run; stages with a recorded session are not started again
+        :return:                Output graph object of each stage
+        """
+        resume = dict(resume or {})
+        futures = dict()  # type: Dict[str, Future]
+        # stages are added after their dependencies, so each one is submitted after the stage it waits on
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+            for stage in self._stages.values():
+                source = futures[stage.source] if isinstance(stage.source, str) else None
+                futures[stage.name] = pool.submit(self._run_stage, stage, source, resume, timeout)
+        return {name: f.result() for name, f in futures.items()}
+
+
+def create_pipeline(session: StellarSession) -> Pipeline:
+    """Create a new pipeline
+
+    :param session: Stellar session to run the pipeline with
+    :return:        New pipeline object
+    """
+    return Pipeline(session)
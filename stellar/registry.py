@@ -0,0 +1,172 @@
+"""Registry
+
+Local store of trained model artifacts, so that NAI tasks on graphs with the same schema can reuse a trained model for
+inference instead of training a new one. Artifacts are copied into the registry directory and indexed in SQLite, and
+least recently used artifacts are deleted above a size limit.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, Optional, Set
+
+from stellar.graph import StellarGraph
+import stellar.epgm as epgm
+from stellar.model import StellarMLModel, MODEL_FILE
+
+INDEX_FILE = 'registry.db'
+
+
+def _schema(path: str) -> Optional[List]:
+    """Vertex and edge labels of the last graph of an EPGM directory, with the attribute names of each
+
+    :param path:    EPGM directory
+    :return:        sorted list of [kind, label, attribute names], or None if the directory is not visible
+    """
+    if not os.path.isdir(path):
+        return None
+    graph_id = list(epgm.iter_elements(path, 'graphs'))[-1]['id']
+    schema = list()
+    for kind in ('vertices', 'edges'):
+        labels = dict()  # type: Dict[str, Set[str]]
+        for el in epgm.iter_elements(path, kind):
+            if graph_id in el['meta'].get('graphs', []):
+                labels.setdefault(el['meta'].get('label'), set()).update(el['data'])
+        schema += sorted([kind, label, sorted(names)] for label, names in labels.items())
+    return schema
+
+
+def _size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+class ModelRegistry:
+    """Directory of trained model artifacts, evicting least recently used artifacts above a size limit
+
+    """
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024) -> None:
+        """Initialise
+
+        :param path:        registry directory, created if it does not exist
+        :param max_bytes:   maximum total size of stored artifacts
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS models (key TEXT PRIMARY KEY, pipeline TEXT, size INTEGER, "
+                         "accessed REAL)")
+
+    def __repr__(self):
+        return "ModelRegistry(path=\"{}\")".format(self.path)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(os.path.join(self.path, INDEX_FILE), timeout=30)
+
+    @staticmethod
+    def key(model: StellarMLModel, target_attribute: str, node_type: str, attributes_to_ignore: List[str],
+            graph: StellarGraph) -> str:
+        """Registry key of the model trained by a NAI task. Models are only reused on graphs with the same element
+        labels and attribute names, and transductive models only on the same graph.
+
+        :param model:                   Machine Learning model object
+        :param target_attribute:        Attribute to infer
+        :param node_type:               Type of node to infer attributes on
+        :param attributes_to_ignore:    List of attributes to ignore
+        :param graph:                   Input graph object
+        :return:                        registry key
+        """
+        scope = [model.params, target_attribute, node_type, sorted(attributes_to_ignore), _schema(graph.path)]
+        if model.transductive:
+            scope.append(os.path.abspath(graph.path))
+        return hashlib.sha256(json.dumps(scope, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a stored artifact
+
+        :param key:     registry key
+        :return:        path to the artifact, or None if not stored
+        """
+        artifact = os.path.join(self.path, key)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT key FROM models WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.isdir(artifact):
+                conn.execute("DELETE FROM models WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE models SET accessed = ? WHERE key = ?", (time.time(), key))
+        return artifact
+
+    def put(self, key: str, artifact: str) -> str:
+        """Copy an artifact into the registry, then evict least recently used artifacts above the size limit
+
+        :param key:         registry key
+        :param artifact:    path to the artifact, e.g. in the output graph of a NAI task
+        :return:            path to the stored artifact
+        """
+        stored = os.path.join(self.path, key)
+        shutil.rmtree(stored, ignore_errors=True)
+        shutil.copytree(artifact, stored)
+        with open(os.path.join(stored, MODEL_FILE), 'r', encoding='utf-8') as fp:
+            pipeline = json.load(fp).get('pipeline')
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO models VALUES (?, ?, ?, ?)",
+                         (key, pipeline, _size(stored), time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM models").fetchone()[0]
+            for k, s in conn.execute("SELECT key, size FROM models WHERE key != ? ORDER BY accessed",
+                                     (key,)).fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM models WHERE key = ?", (k,))
+                shutil.rmtree(os.path.join(self.path, k), ignore_errors=True)
+                total -= s
+        return stored
+
+    def remove(self, key: str) -> None:
+        """Remove a stored artifact
+
+        :param key:     registry key
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM models WHERE key = ?", (key,))
+        shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+
+    def clear(self) -> None:
+        """Remove all stored artifacts
+        """
+        with closing(self._connect()) as conn, conn:
+            keys = [k for k, in conn.execute("SELECT key FROM models").fetchall()]
+            conn.execute("DELETE FROM models")
+        for k in keys:
+            shutil.rmtree(os.path.join(self.path, k), ignore_errors=True)
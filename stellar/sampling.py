@@ -0,0 +1,197 @@
+"""Sampling
+
+Methods for extracting subgraphs of an EPGM directory on the client, so that a smaller graph can be sent to the NAI and
+ER modules. Only the elements of the last graph of the input are sampled, in their last version. Element files are
+streamed, and only element IDs, and for forest-fire sampling the adjacency, are held in memory. The subgraph is written
+with the graph heads of the input and a new graph head, added last, containing all its elements.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import random
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import stellar.epgm as epgm
+
+
+def _last_versions(path: str, kind: str) -> Dict[str, int]:
+    """Position of the last version of each element of the last graph of an EPGM directory
+
+    :param path:        EPGM directory
+    :param kind:        'vertices' | 'edges'
+    :return:            dict of {element ID: position in element file}
+    """
+    graph_id = list(epgm.iter_elements(path, 'graphs'))[-1]['id']
+    return {el['id']: i for i, el in enumerate(epgm.iter_elements(path, kind))
+            if graph_id in el['meta'].get('graphs', [])}
+
+
+def _elements(path: str, kind: str, positions: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+    """Stream the last versions of elements
+
+    :param path:        EPGM directory
+    :param kind:        'vertices' | 'edges'
+    :param positions:   position of the last version of each element, from _last_versions
+    :return:            iterator of elements, in file order
+    """
+    for i, el in enumerate(epgm.iter_elements(path, kind)):
+        if positions.get(el['id']) == i:
+            yield el
+
+
+def vertex_ids(path: str, node_types: Optional[Iterable[str]] = None) -> List[str]:
+    """IDs of the vertices of the last graph of an EPGM directory, optionally of some types only
+
+    :param path:        EPGM directory
+    :param node_types:  vertex labels to keep. Defaulted to all vertices
+    :return:            list of vertex IDs, in file order
+    """
+    types = set(node_types) if node_types is not None else None
+    return [v['id'] for v in _elements(path, 'vertices', _last_versions(path, 'vertices'))
+            if types is None or v['meta']['label'] in types]
+
+
+def write_subgraph(path: str, vertices: Set[str], output_path: str, label: str) -> int:
+    """Write the subgraph of the last graph of an EPGM directory induced by a set of vertices
+
+    :param path:            input EPGM directory
+    :param vertices:        IDs of the vertices to keep
+    :param output_path:     output EPGM directory
+    :param label:           label of the new graph containing the subgraph
+    :return:                number of vertices written
+    """
+    head = epgm.graph_head(label)
+    epgm.write_elements(output_path, 'graphs', list(epgm.iter_elements(path, 'graphs')) + [head])
+    written = set()  # type: Set[str]
+
+    def kept(kind: str):
+        for el in _elements(path, kind, _last_versions(path, kind)):
+            if (el['id'] in vertices) if kind == 'vertices' else (el['source'] in written and el['target'] in written):
+                if kind == 'vertices':
+                    written.add(el['id'])
+                el['meta']['graphs'] = list(el['meta'].get('graphs', [])) + [head['id']]
+                yield el
+
+    count = epgm.write_elements(output_path, 'vertices', kept('vertices'))
+    epgm.write_elements(output_path, 'edges', kept('edges'))
+    return count
+
+
+def k_hop(path: str, seeds: Iterable[str], k: int, node_types: Optional[Iterable[str]] = None) -> Set[str]:
+    """Vertices of the last graph within k hops of seed vertices, ignoring edge direction. Each hop is one pass over the
+    edges.
+
+    :param path:        EPGM directory
+    :param seeds:       IDs of seed vertices
+    :param k:           number of hops
+    :param node_types:  vertex labels that can be reached. Defaulted to all vertices
+    :return:            set of vertex IDs, including the seeds
+    """
+    allowed = set(vertex_ids(path, node_types))
+    edges = _last_versions(path, 'edges')
+    reached = set(seeds)
+    frontier = set(reached)
+    for _ in range(k):
+        if not frontier:
+            break
+        found = set()
+        for e in _elements(path, 'edges', edges):
+            if e['source'] in frontier:
+                found.add(e['target'])
+            if e['target'] in frontier:
+                found.add(e['source'])
+        frontier = (found - reached) & allowed
+        reached |= frontier
+    return reached
+
+
+def uniform(path: str, size: int, node_types: Optional[Iterable[str]] = None,
+            seed: Optional[int] = None) -> Set[str]:
+    """Uniform sample of the vertices of the last graph
+
+    :param path:        EPGM directory
+    :param size:        number of vertices
+    :param node_types:  vertex labels to sample from. Defaulted to all vertices
+    :param seed:        random seed
+    :return:            set of vertex IDs
+    """
+    rng = random.Random(seed)
+    sample = list()  # type: List[str]
+    for i, vertex_id in enumerate(vertex_ids(path, node_types)):
+        if i < size:
+            sample.append(vertex_id)
+        else:
+            j = rng.randint(0, i)
+            if j < size:
+                sample[j] = vertex_id
+    return set(sample)
+
+
+def forest_fire(path: str, size: int, forward: float = 0.7, node_types: Optional[Iterable[str]] = None,
+                seed: Optional[int] = None) -> Set[str]:
+    """Forest-fire sample of vertices, which keeps more of the local structure of the graph than a uniform sample.
+
+    A fire starts at a random vertex and spreads to a geometrically distributed number of its unburnt neighbours, with
+    mean forward / (1 - forward), then from each of those in turn. A new fire starts whenever one dies out, until the
+    sample has the requested size.
+
+    :param path:        EPGM directory
+    :param size:        number of vertices
+    :param forward:     forward burning probability, below 1
+    :param node_types:  vertex labels to sample from. Defaulted to all vertices
+    :param seed:        random seed
+    :return:            set of vertex IDs
+    """
+    if not 0 <= forward < 1:
+        raise ValueError("forward burning probability must be in [0, 1)")
+    rng = random.Random(seed)
+    ids = vertex_ids(path, node_types)
+    known = set(ids)
+    neighbours = dict()  # type: Dict[str, List[str]]
+    for e in _elements(path, 'edges', _last_versions(path, 'edges')):
+        if e['source'] in known and e['target'] in known and e['source'] != e['target']:
+            neighbours.setdefault(e['source'], []).append(e['target'])
+            neighbours.setdefault(e['target'], []).append(e['source'])
+
+    burnt = set()  # type: Set[str]
+    unburnt = ids[:]
+    rng.shuffle(unburnt)
+    size = min(size, len(ids))
+    while len(burnt) < size:
+        start = unburnt.pop()
+        if start in burnt:
+            continue
+        burnt.add(start)
+        fire = deque([start])
+        while fire and len(burnt) < size:
+            vertex = fire.popleft()
+            spread = 0
+            while rng.random() < forward:
+                spread += 1
+            candidates = [n for n in sorted(set(neighbours.get(vertex, []))) if n not in burnt]
+            rng.shuffle(candidates)
+            for n in candidates[:min(spread, size - len(burnt))]:
+                burnt.add(n)
+                fire.append(n)
+    return burnt
@@ -30,17 +30,31 @@ __license__ = "Apache 2.0"
 import requests
 import redis
 import polling
+import copy
+import gzip
+import hashlib
 import json
+import os
 import re
-from typing import Dict, List, Optional, Callable, Union
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Callable, Union, Set, Tuple, Any
 
-from stellar.ingestion import StellarIngestPayload, GraphSchema, NodeMapping, EdgeMapping
+from stellar.ingestion import StellarIngestPayload, GraphSchema, NodeMapping, EdgeMapping, map_source_ids
 from stellar.nai import StellarNAIPayload
 from stellar.er import StellarERPayload
 from stellar.graph import StellarGraph
 from stellar.payload import Payload
-from stellar.model import StellarMLModel
+from stellar.model import StellarMLModel, ARTIFACT_DIR, ARTIFACT_MISMATCH
 from stellar.entity import StellarEntityResolver
+from stellar.cache import ResultCache
+from stellar.registry import ModelRegistry
+from stellar.instrument import span, record
+from stellar.sources import read_chunks, split_csv, write_known_ids
+from stellar.incremental import IngestCheckpoint, VertexIndex, append_graph, index_graph, write_delta
+import stellar.epgm as epgm
 
 
 class SessionError(Exception):
@@ -106,10 +120,17 @@ class StellarTask:
         self._r = redis.StrictRedis(host=url, port=port, db=0, decode_responses=True)
         self._session_id = self._REDIS_PREFIX + session_id
         self._name = name
+        self._callbacks = []  # type: List[Callable[[StellarResult], None]]
 
     def __repr__(self):
         return "StellarTask(name=\"{}\",id=\"{}\")".format(self._name, self._session_id)
 
+    @property
+    def session_id(self) -> str:
+        """Session ID of the task, without the Redis key prefix
+        """
+        return self._session_id[len(self._REDIS_PREFIX):]
+
     def check_status(self) -> str:
         """Check status of task
 
@@ -117,25 +138,163 @@ class StellarTask:
         """
         return json.loads(self._r.get(self._session_id))['status']
 
+    def _is_done_status(self, status: str) -> bool:
+        """Check if status means the task is completed or aborted/failed
+
+        :param status:  task status
+        :return:        true if done
+        """
+        return (self._STATUS_COMPLETE in status) or (self._STATUS_ABORT in status) or (self._STATUS_FAIL in status)
+
     def is_done(self) -> bool:
         """Check if task is completed or aborted/failed
 
         :return: true if done
         """
-        status = self.check_status()
-        return (self._STATUS_COMPLETE in status) or (self._STATUS_ABORT in status) or (self._STATUS_FAIL in status)
+        return self._is_done_status(self.check_status())
 
     def wait_for_result(self, timeout: float = 0) -> StellarResult:
         """Wait until result is available
 
+        Time spent in each status until it changes is reported as a 'task.<status>' span.
+
         :param timeout:     polling timeout in seconds. Defaulted to zero to poll forever
         :return:    StellarResult object
         """
-        if timeout <= 0:
-            polling.poll(self.is_done, step=1, poll_forever=True)
-        else:
-            polling.poll(self.is_done, step=1, timeout=timeout)
-        return StellarResult(self.check_status(), json.loads(self._r.get(self._session_id))[self._name])
+        current = {'status': None, 'since': time.perf_counter()}
+
+        def poll_status() -> bool:
+            status = self.check_status()
+            now = time.perf_counter()
+            if status != current['status']:
+                if current['status'] is not None:
+                    record('task.' + current['status'], now - current['since'], task=self._name)
+                current['status'], current['since'] = status, now
+            return self._is_done_status(status)
+
+        with span('task.wait', task=self._name):
+            if timeout <= 0:
+                polling.poll(poll_status, step=1, poll_forever=True)
+            else:
+                polling.poll(poll_status, step=1, timeout=timeout)
+        result = StellarResult(self.check_status(), json.loads(self._r.get(self._session_id))[self._name])
+        for callback in self._callbacks:
+            callback(result)
+        return result
+
+    def add_done_callback(self, callback: Callable[[StellarResult], None]) -> None:
+        """Add a callable to be called with the result once it has been waited for
+
+        :param callback:    callable taking the result
+        """
+        self._callbacks.append(callback)
+
+
+class CompletedTask(StellarTask):
+    """Task whose result is already known without contacting Redis, e.g. from the result cache
+
+    """
+    def __init__(self, name: str, session_id: str, result: StellarResult) -> None:
+        """Initialise
+
+        :param name:        task name ( ingest | er | nai )
+        :param session_id:  session key
+        :param result:      result of the task
+        """
+        self._r = None
+        self._session_id = self._REDIS_PREFIX + session_id
+        self._name = name
+        self._callbacks = []
+        self._result = result
+
+    def check_status(self) -> str:
+        return self._result.status
+
+    def wait_for_result(self, timeout: float = 0) -> StellarResult:
+        for callback in self._callbacks:
+            callback(self._result)
+        return self._result
+
+
+class SessionIdPool:
+    """Buffer of session IDs fetched ahead of time from the coordinator
+
+    IDs are refilled in a background thread, and IDs older than the TTL are discarded as stale.
+    """
+    def __init__(self, fetch: Callable[[], str], size: int, ttl: float) -> None:
+        """Initialise
+
+        :param fetch:   callable that obtains a new session ID
+        :param size:    number of session IDs to keep in the buffer
+        :param ttl:     seconds after which a buffered session ID is considered stale
+        """
+        self._fetch = fetch
+        self._size = size
+        self._ttl = ttl
+        self._ids = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+    def _evict_stale(self) -> None:
+        """Drop session IDs older than the TTL. Caller must hold the lock.
+        """
+        now = time.monotonic()
+        while self._ids and now - self._ids[0][1] > self._ttl:
+            self._ids.popleft()
+
+    def refill(self) -> None:
+        """Fetch session IDs until the buffer is full. Errors are ignored; take() falls back to fetching directly.
+        """
+        with self._lock:
+            self._evict_stale()
+        try:
+            while True:
+                with self._lock:
+                    if len(self._ids) >= self._size:
+                        return
+                try:
+                    session_id = self._fetch()
+                except (SessionError, requests.RequestException, ValueError):
+                    return
+                with self._lock:
+                    if len(self._ids) >= self._size:
+                        return
+                    self._ids.append((session_id, time.monotonic()))
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def refill_async(self) -> None:
+        """Schedule a background refill, unless one is already pending
+        """
+        with self._lock:
+            if self._refilling:
+                return
+            self._refilling = True
+        self._executor.submit(self.refill)
+
+    def take(self) -> str:
+        """Take a fresh session ID from the buffer, or fetch one directly if the buffer is empty
+
+        :return: session ID
+        """
+        with self._lock:
+            self._evict_stale()
+            session_id = self._ids.popleft()[0] if self._ids else None
+        self.refill_async()
+        return session_id if session_id is not None else self._fetch()
+
+    def close(self) -> None:
+        """Stop refilling and discard buffered session IDs
+        """
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._ids.clear()
 
 
 class StellarSession:
@@ -147,18 +306,38 @@ class StellarSession:
     _TASK_INGEST = 'ingest'
     _TASK_ER = 'er'
     _TASK_NAI = 'nai'
+    _RETRY_BACKOFF = 0.5
 
-    def __init__(self, url: str, port: int, redis_url: Optional[str] = None, redis_port: int = 6379) -> None:
+    def __init__(self, url: str, port: int, redis_url: Optional[str] = None, redis_port: int = 6379,
+                 prefetch: int = 0, session_ttl: float = 60, cache: Optional[ResultCache] = None,
+                 backend=None, compact: bool = False, compress: bool = False,
+                 registry: Optional[ModelRegistry] = None) -> None:
         """Create a Stellar Session Object
 
         :param url:         Stellar Coordinator URL
         :param port:        Stellar Coordinator Port
         :param redis_url:   Redis Server URL. Defaulted to same URL as Coordinator
         :param redis_port:  Redis Server Port. Defaulted to 6379
+        :param prefetch:    Number of session IDs to fetch ahead of time. Defaulted to zero to disable prefetching
+        :param session_ttl: Seconds after which a prefetched session ID is discarded as stale
+        :param cache:       Cache of results of identical tasks. Defaulted to no caching
+        :param backend:     Backend running tasks in place of the coordinator, e.g. stellar.local.LocalCoordinator
+        :param compact:     Send payloads as JSON without indentation
+        :param compress:    Send payloads as gzip-compressed compact JSON
+        :param registry:    Registry of trained models, reused by predict for inference. Defaulted to always train
         """
         self._url = "http://{}:{}".format(url, port)
         self._redis_url = redis_url or url
         self._redis_port = redis_port
+        self._cache = cache
+        self._registry = registry
+        self._backend = backend
+        self._compact = compact or compress
+        self._compress = compress
+        self._id_pool = None  # type: Optional[SessionIdPool]
+        if prefetch > 0:
+            self._id_pool = SessionIdPool(self._get_session_id, prefetch, session_ttl)
+            self._id_pool.refill_async()
 
     def __repr__(self):
         return "StellarSession(url=\"{}\")".format(self._url)
@@ -171,18 +350,28 @@ class StellarSession:
         :return:            Response
         """
         url = '/'.join([self._url.strip('/'), endpoint])
-        return requests.get(url, params=params) if params else requests.get(url)
+        with span('http.get', endpoint=endpoint) as s:
+            response = requests.get(url, params=params) if params else requests.get(url)
+            s.set_attribute('status_code', response.status_code)
+        return response
 
-    def _post(self, endpoint: str, data: str) -> requests.Response:
+    def _post(self, endpoint: str, data: str, compress: bool = False) -> requests.Response:
         """POST request to the coordinator/endpoint
 
         :param endpoint:    Specific endpoint
         :param data:        Data to POST
+        :param compress:    gzip-compress data
         :return:            Response
         """
         url = '/'.join([self._url.strip('/'), endpoint])
         headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        return requests.post(url, data=data, headers=headers)
+        if compress:
+            data = gzip.compress(data.encode('utf-8'))
+            headers['Content-Encoding'] = 'gzip'
+        with span('http.post', endpoint=endpoint, bytes=len(data)) as s:
+            response = requests.post(url, data=data, headers=headers)
+            s.set_attribute('status_code', response.status_code)
+        return response
 
     def _get_session_id(self) -> str:
         """Obtain new session ID from Stellar coordinator INIT endpoint
@@ -201,6 +390,20 @@ class StellarSession:
         else:
             raise SessionError(response.status_code, response.json()['reason'])
 
+    def _next_session_id(self) -> str:
+        """Obtain a session ID, from the prefetch pool if enabled
+
+        :return: new session ID
+        """
+        return self._id_pool.take() if self._id_pool else self._get_session_id()
+
+    def close(self) -> None:
+        """Stop prefetching session IDs
+        """
+        if self._id_pool:
+            self._id_pool.close()
+            self._id_pool = None
+
     def _start(self, task_name: str, create_payload: Callable[[str], Payload]) -> StellarTask:
         """Initialise a session and start a task
 
@@ -208,13 +411,101 @@ class StellarSession:
         :param create_payload:  callable to create payload with session ID
         :return:                StellarTask
         """
-        session_id = self._get_session_id()
-        payload = create_payload(session_id).to_json()
-        r = self._post(task_name + '/start', payload)
-        if r.status_code == 200:
-            return StellarTask(self._redis_url, self._redis_port, task_name, session_id)
+        with span('session.start', task=task_name):
+            return self._start_task(task_name, create_payload)
+
+    def _start_task(self, task_name: str, create_payload: Callable[[str], Payload]) -> StellarTask:
+        """Start a task, from the result cache if possible. Tasks with inputs not visible from the client are not
+        cached.
+
+        :param task_name:       name of task
+        :param create_payload:  callable to create payload with session ID
+        :return:                StellarTask
+        """
+        key = None
+        if self._cache is not None:
+            key = self._cache.key(task_name, create_payload(''))
+            hit = self._cache.get(key) if key is not None else None
+            if hit is not None:
+                session_id, status, output = hit
+                return CompletedTask(task_name, session_id, StellarResult(status, {'output': output}))
+        if self._backend is not None:
+            task = self._backend.start(task_name, create_payload)
+        else:
+            session_id = self._next_session_id()
+            payload = create_payload(session_id).to_json(self._compact)
+            r = self._post(task_name + '/start', payload, self._compress)
+            if r.status_code != 200:
+                raise SessionError(r.status_code, r.reason)
+            task = self.get_task(task_name, session_id)
+        if key is not None:
+            task.add_done_callback(lambda res: self._cache.put(key, task_name, task.session_id, res.status, res.dir)
+                                   if res.success else None)
+        return task
+
+    def _retry(self, start: Callable[[], StellarTask], retries: int) -> StellarTask:
+        """Start a task, retrying on transient (5xx) coordinator errors
+
+        :param start:       callable that starts the task
+        :param retries:     maximum number of retries
+        :return:            StellarTask
+        """
+        for attempt in range(retries + 1):
+            try:
+                return start()
+            except SessionError as e:
+                if not 500 <= e.status_code < 600 or attempt == retries:
+                    raise
+                time.sleep(self._RETRY_BACKOFF * 2 ** attempt)
+
+    def submit_many(self, specs: List[Tuple[str, Dict[str, Any]]], max_in_flight: int = 4,
+                    retries: int = 3) -> List[StellarTask]:
+        """Start several tasks concurrently.
+
+        Each spec is a tuple of task name ( ingest | er | nai ) and the keyword arguments for the corresponding
+        ``*_start`` method, e.g. ``('nai', dict(graph=g, model=Node2Vec(), target_attribute='venue', ...))``.
+
+        :param specs:           List of (task name, keyword arguments)
+        :param max_in_flight:   Maximum number of tasks being started at the same time
+        :param retries:         Number of retries for each task on transient (5xx) errors
+        :return:                List of StellarTask objects, in the same order as specs
+        """
+        starters = {
+            self._TASK_INGEST: self.ingest_start,
+            self._TASK_ER: self.er_start,
+            self._TASK_NAI: self.nai_start
+        }
+
+        def submit(spec: Tuple[str, Dict[str, Any]]) -> StellarTask:
+            task_name, kwargs = spec
+            if task_name not in starters:
+                raise ValueError("Unknown task '{}'".format(task_name))
+            return self._retry(lambda: starters[task_name](**kwargs), retries)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+            return list(pool.map(submit, specs))
+
+    def get_task(self, task_name: str, session_id: str) -> StellarTask:
+        """Get a previously started task
+
+        :param task_name:   name of task ( ingest | er | nai )
+        :param session_id:  session ID of the task
+        :return:            StellarTask
+        """
+        return StellarTask(self._redis_url, self._redis_port, task_name, session_id)
+
+    @staticmethod
+    def _result_graph(res: StellarResult, label: str) -> StellarGraph:
+        """Output graph of a finished task
+
+        :param res:     task result
+        :param label:   label of output graph
+        :return:        Output graph object
+        """
+        if res.success:
+            return StellarGraph(res.dir, label)
         else:
-            raise SessionError(r.status_code, r.reason)
+            raise SessionError(500, res.reason)
 
     def ingest_start(self, schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]],
                      label: str) -> StellarTask:
@@ -228,21 +519,139 @@ class StellarSession:
         return self._start(self._TASK_INGEST, lambda sid: StellarIngestPayload(sid, schema, mappings, label))
 
     def ingest(self, schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]], label: str = 'ingest',
-               timeout: float = 0) -> StellarGraph:
+               timeout: float = 0, partitions: int = 1, output_path: Optional[str] = None,
+               checkpoint: Optional[str] = None) -> StellarGraph:
         """Ingest from a data source to create a graph.
 
+        With more than one partition, each source is split on row boundaries into that many shards, written next to the
+        source in a '<source>.shards' directory. The shards are ingested concurrently, each with the IDs of the nodes
+        its edges refer to, and their graphs are merged into one by the type and source ID of vertices. The node IDs of
+        all node sources are read on the client first.
+
+        With a checkpoint file, the rows ingested are first copied next to the source as '<source>.delta', and the end
+        of each source is recorded after ingesting. If the sources have only been appended to since, the next ingestion
+        with the same checkpoint only ingests the new rows, and appends them to the previous graph, matching vertices
+        by type and source ID.
+
         :param schema:      Graph schema
         :param mappings:    List of data-source mappings
         :param label:       Label to be assigned to output graph
         :param timeout:     Timeout in seconds. Defaulted to zero to poll forever.
+        :param partitions:  Number of shards to ingest concurrently. Defaulted to ingest sources whole
+        :param output_path: Path of merged graph when partitioned. Defaulted to the first shard's graph path + '.merged'
+        :param checkpoint:  Path to checkpoint file for incremental ingestion. Defaulted to ingest all rows
         :return:            Output graph object
         """
+        if checkpoint is not None:
+            return self._ingest_incremental(schema, mappings, label, timeout, partitions, checkpoint)
+        if partitions > 1:
+            return self._ingest_partitioned(schema, mappings, label, timeout, partitions, output_path)
         task = self.ingest_start(schema, mappings, label)
-        res = task.wait_for_result(timeout)
-        if res.success:
-            return StellarGraph(res.dir, label)
+        return self._result_graph(task.wait_for_result(timeout), label)
+
+    def _ingest_incremental(self, schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]], label: str,
+                            timeout: float, partitions: int, checkpoint: str) -> StellarGraph:
+        """Ingest rows appended since the checkpoint and append them to the previous graph
+
+        The rows up to the end of each source are copied before ingesting, and the checkpoint is only saved once they
+        are ingested, so rows appended meanwhile are left for the next ingestion. The vertices ingested so far are
+        indexed by type and source ID in '<checkpoint>.vertices.db'. New edge rows are ingested with the IDs of the
+        indexed vertices they refer to, and new vertices and edges are then appended to the previous graph, with new
+        rows of indexed vertices written as new versions of them.
+
+        :param schema:      Graph schema
+        :param mappings:    List of data-source mappings
+        :param label:       Label to be assigned to output graph
+        :param timeout:     Timeout in seconds. Zero to poll forever.
+        :param partitions:  Number of shards
+        :param checkpoint:  Path to checkpoint file
+        :return:            Output graph object
+        """
+        state = IngestCheckpoint(checkpoint)
+        payload = StellarIngestPayload('', schema, mappings, label)
+        key = hashlib.sha1(json.dumps([payload.graphSchema, payload.mapping, label], sort_keys=True)
+                           .encode('utf-8')).hexdigest()
+        sources = sorted(set(m.path for m in mappings))
+        index = VertexIndex(checkpoint + '.vertices.db')
+        previous = state.graph if state.is_valid(key) and len(index) else None
+
+        marks = {path: write_delta(path, state.marks[path] if previous else None, path + '.delta')
+                 for path in sources}
+        if previous and marks == state.marks:
+            return StellarGraph(previous, label)  # nothing appended
+        delta_mappings = list()
+        for m in mappings:
+            m = copy.copy(m)
+            m.path = m.path + '.delta'
+            delta_mappings.append(m)
+        schema, delta_mappings = map_source_ids(schema, delta_mappings, epgm.ID_ATTRIBUTE)
+        edges = [m for m in delta_mappings if isinstance(m, EdgeMapping)]
+        if previous and edges:
+            columns = [c for m in edges for c in ((m.path, m.src, m.src_type),
+                                                  (m.path, m.dst, schema.edge[m.edge_type].dst_type))]
+            known = write_known_ids(columns, lambda t, ids: set(index.lookup(t, ids)), checkpoint + '.endpoints',
+                                    epgm.ID_ATTRIBUTE)
+            ids = {epgm.ID_ATTRIBUTE: epgm.ID_ATTRIBUTE}
+            delta_mappings += [schema.node[t].create_map(path, epgm.ID_ATTRIBUTE, ids) for t, path in known.items()]
+        graph = self.ingest(schema, delta_mappings, label, timeout, partitions)
+        if previous:
+            append_graph(previous, graph.path, index)
+            graph = StellarGraph(previous, label)
         else:
-            raise SessionError(500, res.reason)
+            index_graph(graph.path, index)
+        state.save(key, graph.path, marks)
+        return graph
+
+    def _ingest_partitioned(self, schema: GraphSchema, mappings: List[Union[NodeMapping, EdgeMapping]], label: str,
+                            timeout: float, partitions: int, output_path: Optional[str]) -> StellarGraph:
+        """Ingest sources split into shards concurrently and merge the resulting graphs.
+
+        The ID column of node sources is also mapped to the vertex attribute epgm.ID_ATTRIBUTE, and each shard also
+        ingests the IDs of the known endpoints of its edges, so that edges between vertices of different shards are
+        kept. The vertices of the same source node are merged by type and source ID.
+
+        :param schema:      Graph schema
+        :param mappings:    List of data-source mappings
+        :param label:       Label to be assigned to output graph
+        :param timeout:     Timeout in seconds. Zero to poll forever.
+        :param partitions:  Number of shards
+        :param output_path: Path of merged graph
+        :return:            Output graph object
+        """
+        schema, mappings = map_source_ids(schema, mappings, epgm.ID_ATTRIBUTE)
+        node_ids = dict()  # type: Dict[str, Set[str]]
+        for m in mappings:
+            if isinstance(m, NodeMapping):
+                ids = node_ids.setdefault(m.node_type, set())
+                for _, chunk in read_chunks(m.path):
+                    ids.update(chunk[m.node_id])
+        shards = {path: split_csv(path, partitions, path + '.shards') for path in set(m.path for m in mappings)}
+
+        def shard_mappings(index: int) -> List[Union[NodeMapping, EdgeMapping]]:
+            result = list()
+            for m in mappings:
+                m = copy.copy(m)
+                m.path = shards[m.path][index]
+                result.append(m)
+            edges = [m for m in result if isinstance(m, EdgeMapping)]
+            if edges:
+                columns = [c for m in edges for c in ((m.path, m.src, m.src_type),
+                                                      (m.path, m.dst, schema.edge[m.edge_type].dst_type))]
+                known = write_known_ids(columns, lambda t, ids: node_ids.get(t, set()).intersection(ids),
+                                        os.path.splitext(edges[0].path)[0] + '.ids', epgm.ID_ATTRIBUTE)
+                result += [schema.node[t].create_map(path, epgm.ID_ATTRIBUTE, {epgm.ID_ATTRIBUTE: epgm.ID_ATTRIBUTE})
+                           for t, path in known.items()]
+            return result
+
+        specs = [(self._TASK_INGEST, dict(schema=schema, mappings=shard_mappings(i), label=label))
+                 for i in range(partitions)]
+        tasks = self.submit_many(specs, max_in_flight=partitions)
+        with ThreadPoolExecutor(max_workers=partitions) as pool:
+            results = list(pool.map(lambda t: t.wait_for_result(timeout), tasks))
+        dirs = [self._result_graph(res, label).path for res in results]
+        output_path = output_path or dirs[0].rstrip('/') + '.merged'
+        epgm.merge(dirs, output_path, label, key=epgm.ID_ATTRIBUTE)
+        return StellarGraph(output_path, label)
 
     def er_start(self, graph: StellarGraph, resolver: StellarEntityResolver, attribute_thresholds: Dict[str, float],
                  label: str) -> StellarTask:
@@ -279,7 +688,7 @@ class StellarSession:
             raise SessionError(500, res.reason)
 
     def nai_start(self, graph: StellarGraph, model: StellarMLModel, target_attribute: str, node_type: str,
-                  attributes_to_ignore: List[str], label: str) -> StellarTask:
+                  attributes_to_ignore: List[str], label: str, export_embeddings: bool = False) -> StellarTask:
         """Trigger a Node Attribute Inference session
 
         :param graph:                   Input graph object
@@ -288,16 +697,23 @@ class StellarSession:
         :param node_type:               Type of node to infer attributes on
         :param attributes_to_ignore:    List of attributes to ignore
         :param label:                   Label to be assigned to output graph
+        :param export_embeddings:       Write the node embeddings with the output graph
         :return:                        StellarTask object
         """
         return self._start(self._TASK_NAI, lambda sid: StellarNAIPayload(sid, graph, model, target_attribute, node_type,
-                                                                         attributes_to_ignore, label))
+                                                                         attributes_to_ignore, label,
+                                                                         export_embeddings))
 
     def predict(self, graph: StellarGraph, model: StellarMLModel, target_attribute: str, node_type: str,
                 attributes_to_ignore: Optional[List[str]] = None, label: str = 'nai',
-                timeout: float = 0) -> StellarGraph:
+                timeout: float = 0, export_embeddings: bool = False) -> StellarGraph:
         """Predict attributes on graph elements
 
+        Without a model artifact, a model trained by a previous prediction of the same attribute and node type, on a
+        graph with the same element labels and attribute names, is taken from the session's model registry, if it has
+        one, and only used for inference. If the trained model does not apply to the graph, it is removed and a new
+        model is trained. Other failures are raised, keeping the trained model.
+
         :param graph:   Input graph object
         :param model:   Machine Learning model object
         :param target_attribute:    Attribute to infer
@@ -305,17 +721,90 @@ class StellarSession:
         :param attributes_to_ignore:    List of attributes to ignore
         :param label:                   Label to be assigned to output graph
         :param timeout:                 Timeout in seconds. Defaulted to zero to poll forever.
-        :return:                        Output graph object with predicted attributes
+        :param export_embeddings:       Write the node embeddings with the output graph, see StellarGraph.embeddings
+        :return:                        Output graph object with predicted attributes, and the trained model as its
+                                        model attribute
         """
-        task = self.nai_start(graph, model, target_attribute, node_type, attributes_to_ignore or [], label)
-        res = task.wait_for_result(timeout)
+        def run(m: StellarMLModel) -> StellarResult:
+            task = self.nai_start(graph, m, target_attribute, node_type, attributes_to_ignore or [], label,
+                                  export_embeddings)
+            return task.wait_for_result(timeout)
+
+        key = None
+        if self._registry is not None and model.artifact is None:
+            key = self._registry.key(model, target_attribute, node_type, attributes_to_ignore or [], graph)
+            model = model.with_artifact(self._registry.get(key))
+        res = run(model)
+        if not res.success and key is not None and model.artifact is not None and ARTIFACT_MISMATCH in res.reason:
+            self._registry.remove(key)
+            model = model.with_artifact(None)
+            res = run(model)
         if res.success:
             print("WARNING: Current version does not allow NAI to update its graph label. "
                   "Keeping original label: {}".format(graph.label))
-            return StellarGraph(res.dir, graph.label)  # NAI uses same label instead of creating new graph
+            predicted = StellarGraph(res.dir, graph.label)  # NAI uses same label instead of creating new graph
+            artifact = os.path.join(res.dir, ARTIFACT_DIR)
+            if model.artifact is None and os.path.isdir(artifact):
+                model = model.with_artifact(self._registry.put(key, artifact) if key is not None else artifact)
+            predicted.model = model
+            return predicted
         else:
             raise SessionError(500, res.reason)
 
+    def sweep(self, graph: StellarGraph, models: List[StellarMLModel], targets: List[str], node_type: str,
+              attributes_to_ignore: Optional[List[str]] = None, label: str = 'nai', max_in_flight: int = 4,
+              timeout: float = 0, retries: int = 3) -> List[Dict[str, Any]]:
+        """Predict each target attribute with each model, to compare them.
+
+        At most max_in_flight predictions run at the same time, each started and waited for in its own thread. The
+        predicted attribute of the nodes is read from each output graph as soon as it is available.
+
+        Each row of the returned table has the keys:
+            model (str):            model class name
+            pipeline (str):         pipeline file of the model
+            target_attribute (str): predicted attribute
+            success (bool):         flag for success
+            runtime (float):        seconds from starting the task to its result
+            graph (StellarGraph):   output graph, or None on failure
+            predictions (dict):     attribute value of each node of the node type, by vertex ID
+            reason (str):           reason for failure
+
+        :param graph:                   Input graph object
+        :param models:                  Machine Learning model objects
+        :param targets:                 Attributes to infer
+        :param node_type:               Type of node to infer attributes on
+        :param attributes_to_ignore:    List of attributes to ignore
+        :param label:                   Label to be assigned to output graphs
+        :param max_in_flight:           Maximum number of predictions running at the same time
+        :param timeout:                 Timeout in seconds of each prediction. Defaulted to zero to poll forever.
+        :param retries:                 Number of retries for each task on transient (5xx) errors
+        :return:                        List of rows, one per (model, target) in the order given
+        """
+        def run(config: Tuple[StellarMLModel, str]) -> Dict[str, Any]:
+            model, target = config
+            row = {'model': type(model).__name__, 'pipeline': model.params.get('pipelineFilename'),
+                   'target_attribute': target, 'graph': None, 'predictions': {}, 'reason': ''}
+            started = time.perf_counter()
+            try:
+                task = self._retry(lambda: self.nai_start(graph, model, target, node_type, attributes_to_ignore or [],
+                                                          label), retries)
+                res = task.wait_for_result(timeout)
+            except SessionError as e:
+                res = StellarResult('failed', {'error': e.message})
+            row['runtime'] = time.perf_counter() - started
+            row['success'] = res.success
+            if res.success:
+                row['graph'] = StellarGraph(res.dir, graph.label)  # NAI keeps the label of its input graph
+                row['predictions'] = row['graph'].read_attribute(target, node_type)
+            else:
+                row['reason'] = res.reason
+            return row
+
+        configs = [(model, target) for model in models for target in targets]
+        with span('session.sweep', configurations=len(configs)):
+            with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+                return list(pool.map(run, configs))
+
 
 def create_session(url: str, port: int = 8000) -> StellarSession:
     """Create a new Stellar Session
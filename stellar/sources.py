@@ -0,0 +1,359 @@
+"""Sources
+
+Classes and methods for reading CSV data sources on the client, e.g. to validate them before ingestion.
+
+"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import csv
+import math
+import os
+import random
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Iterator, Set, Tuple, Callable, BinaryIO
+
+Chunk = Dict[str, List[str]]
+ChunkConsumer = Callable[[int, Chunk], None]
+
+_INTEGER = re.compile(r'^[+-]?[0-9]+$')
+_FLOAT = re.compile(r'^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?$')
+_BOOLEAN = re.compile(r'^(true|false)$', re.IGNORECASE)
+
+TYPE_PATTERNS = {
+    'integer': _INTEGER,
+    'long': _INTEGER,
+    'float': _FLOAT,
+    'double': _FLOAT,
+    'boolean': _BOOLEAN
+}
+
+
+_PARSERS = {
+    'integer': int,
+    'long': int,
+    'float': float,
+    'double': float,
+    'boolean': lambda v: v.lower() == 'true'
+}
+
+# multiline versions of the type patterns, to match all values of a column joined by newlines at once
+_COLUMN_PATTERNS = {t: re.compile(p.pattern, p.flags | re.MULTILINE) for t, p in TYPE_PATTERNS.items()}
+
+# most specific type first
+_INFERRED_TYPES = ('boolean', 'integer', 'float')
+
+
+def read_header(path: str) -> List[str]:
+    """Read column names from the first row of a CSV file
+
+    :param path:    path to CSV file
+    :return:        list of column names
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as fp:
+        return next(csv.reader(fp), [])
+
+
+class SourceStats:
+    """Statistics of a scanned data source
+
+    Attributes:
+        path (str):     path to source file
+        rows (int):     number of rows read, excluding the header
+        bytes (int):    number of bytes read
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.rows = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        return "SourceStats(path=\"{}\",rows={},bytes={})".format(self.path, self.rows, self.bytes)
+
+
+def _count_lines(fp: BinaryIO, stats: SourceStats) -> Iterator[str]:
+    """Decode lines of a binary file, counting bytes read
+
+    :param fp:      binary file object
+    :param stats:   statistics to update
+    :return:        iterator of lines
+    """
+    for line in fp:
+        stats.bytes += len(line)
+        yield line.decode('utf-8')
+
+
+def read_chunks(path: str, chunk_size: int = 10000, limit: Optional[int] = None,
+                stats: Optional[SourceStats] = None) -> Iterator[Tuple[int, Chunk]]:
+    """Stream a CSV file as column-oriented chunks
+
+    :param path:        path to CSV file
+    :param chunk_size:  number of rows per chunk
+    :param limit:       maximum number of rows to read. Defaulted to read all rows
+    :param stats:       statistics to update with rows and bytes read
+    :return:            iterator of (index of first row in chunk, dict of {column: values})
+    """
+    stats = stats or SourceStats(path)
+    with open(path, 'rb') as fp:
+        reader = csv.reader(_count_lines(fp, stats))
+        header = next(reader, [])
+        start, rows = 0, list()
+        for row in reader:
+            if limit is not None and start + len(rows) >= limit:
+                break
+            rows.append(row)
+            stats.rows += 1
+            if len(rows) == chunk_size:
+                yield start, to_columns(header, rows)
+                start, rows = start + len(rows), list()
+        if rows:
+            yield start, to_columns(header, rows)
+
+
+class SourceScanner:
+    """Reads each data source once, feeding its chunks to every consumer registered for that path
+
+    """
+    def __init__(self, chunk_size: int = 10000, limit: Optional[int] = None) -> None:
+        """Initialise
+
+        :param chunk_size:  number of rows per chunk
+        :param limit:       maximum number of rows to read per source. Defaulted to read all rows
+        """
+        self.chunk_size = chunk_size
+        self.limit = limit
+        self._consumers = OrderedDict()  # type: Dict[str, List[ChunkConsumer]]
+
+    def __repr__(self):
+        return "SourceScanner(sources={})".format(list(self._consumers.keys()))
+
+    def add(self, path: str, consumer: Optional[ChunkConsumer] = None) -> 'SourceScanner':
+        """Register a source, and optionally a consumer of its chunks
+
+        :param path:        path to CSV file
+        :param consumer:    callable taking (index of first row in chunk, dict of {column: values})
+        :return:            self
+        """
+        consumers = self._consumers.setdefault(path, list())
+        if consumer is not None:
+            consumers.append(consumer)
+        return self
+
+    def scan(self) -> Dict[str, SourceStats]:
+        """Read all registered sources
+
+        :return:    dict of {path: statistics}
+        """
+        stats = OrderedDict()
+        for path, consumers in self._consumers.items():
+            stats[path] = SourceStats(path)
+            for start, chunk in read_chunks(path, self.chunk_size, self.limit, stats[path]):
+                for consume in consumers:
+                    consume(start, chunk)
+        return stats
+
+
+def split_csv(path: str, partitions: int, output_dir: str) -> List[str]:
+    """Split a CSV file on row boundaries into files of roughly equal size, each with the header row
+
+    :param path:        path to CSV file
+    :param partitions:  number of files to split into
+    :param output_dir:  directory to write the files to
+    :return:            paths of the written files, some of which may contain only the header
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(path))
+    shards = [os.path.join(output_dir, "{}.part{:04d}{}".format(name, i, ext or '.csv')) for i in range(partitions)]
+    target = os.path.getsize(path) / partitions
+    stats = SourceStats(path)
+    files = [open(shard, 'w', encoding='utf-8', newline='') for shard in shards]
+    try:
+        writers = [csv.writer(fp) for fp in files]
+        with open(path, 'rb') as fp:
+            reader = csv.reader(_count_lines(fp, stats))
+            header = next(reader, [])
+            for w in writers:
+                w.writerow(header)
+            for row in reader:
+                # bytes read include the current row, so a row goes to the shard its last byte falls into
+                index = min(int((stats.bytes - 1) // target), partitions - 1) if target else 0
+                writers[index].writerow(row)
+    finally:
+        for f in files:
+            f.close()
+    return shards
+
+
+def write_known_ids(columns: List[Tuple[str, str, str]], known: Callable[[str, List[str]], Set[str]],
+                    output_prefix: str, header: str, chunk_size: int = 10000) -> Dict[str, str]:
+    """Write the distinct IDs found in columns of CSV files that are known, e.g. as nodes of another source, to one
+    single-column CSV file per node type
+
+    :param columns:         list of (path to CSV file, column name, node type)
+    :param known:           callable returning the known IDs among a list of IDs of a node type
+    :param output_prefix:   prefix of the written files, followed by '.<node type>.csv'
+    :param header:          header of the ID column of the written files
+    :param chunk_size:      number of rows read at a time
+    :return:                dict of {node type: path to written file}
+    """
+    written = dict()  # type: Dict[str, Set[str]]
+    files = dict()
+    try:
+        for path, column, node_type in columns:
+            for _, chunk in read_chunks(path, chunk_size):
+                ids = [i for i in set(chunk[column]) if i and i not in written.get(node_type, ())]
+                ids = sorted(known(node_type, ids)) if ids else []
+                if not ids:
+                    continue
+                if node_type not in files:
+                    files[node_type] = open('{}.{}.csv'.format(output_prefix, node_type), 'w', encoding='utf-8',
+                                            newline='')
+                    csv.writer(files[node_type]).writerow([header])
+                    written[node_type] = set()
+                csv.writer(files[node_type]).writerows([i] for i in ids)
+                written[node_type].update(ids)
+    finally:
+        for fp in files.values():
+            fp.close()
+    return {node_type: fp.name for node_type, fp in files.items()}
+
+
+def profile_sources(mappings: List, chunk_size: int = 10000) -> Dict[str, SourceStats]:
+    """Count rows and bytes of each distinct source of a list of mappings
+
+    :param mappings:    list of node and edge mappings
+    :param chunk_size:  number of rows read at a time
+    :return:            dict of {path: statistics}
+    """
+    scanner = SourceScanner(chunk_size)
+    for m in mappings:
+        scanner.add(m.path)
+    return scanner.scan()
+
+
+def to_columns(header: List[str], rows: List[List[str]]) -> Chunk:
+    """Transpose rows into columns, padding short rows with empty values
+
+    :param header:  column names
+    :param rows:    list of rows
+    :return:        dict of {column: values}
+    """
+    width = len(header)
+    columns = zip(*[r[:width] + [''] * (width - len(r)) for r in rows])
+    return dict(zip(header, (list(c) for c in columns)))
+
+
+def invalid_values(values: List[str], attribute_type: str) -> List[int]:
+    """Find values that cannot be parsed as the given attribute type. Empty values are treated as missing.
+
+    :param values:          column values
+    :param attribute_type:  schema attribute type, e.g. 'integer'
+    :return:                indices of invalid values
+    """
+    pattern = TYPE_PATTERNS.get(attribute_type.lower())
+    if pattern is None:
+        return []
+    match = pattern.match
+    return [i for i, v in enumerate(values) if v and not match(v.strip())]
+
+
+def parse_values(values: List[str], attribute_type: str) -> List[any]:
+    """Parse values as the given attribute type. Empty and invalid values are parsed as None.
+
+    :param values:          column values
+    :param attribute_type:  schema attribute type, e.g. 'integer'
+    :return:                parsed values
+    """
+    parse = _PARSERS.get(attribute_type.lower())
+    if parse is None:
+        return [v if v else None for v in values]
+    pattern = TYPE_PATTERNS[attribute_type.lower()]
+    return [parse(v.strip()) if v and pattern.match(v.strip()) else None for v in values]
+
+
+def reservoir_sample(path: str, size: int, limit: Optional[int] = None, seed: Optional[int] = None,
+                     stats: Optional[SourceStats] = None) -> Chunk:
+    """Uniformly sample rows of a CSV file in one pass and bounded memory, with Li's reservoir algorithm L, which
+    draws random numbers only for the rows that enter the sample.
+
+    :param path:    path to CSV file
+    :param size:    number of rows to sample
+    :param limit:   maximum number of rows to read. Defaulted to read all rows
+    :param seed:    random seed
+    :param stats:   statistics to update with rows and bytes read
+    :return:        dict of {column: sampled values}
+    """
+    rng = random.Random(seed)
+    stats = stats or SourceStats(path)
+    sample = list()  # type: List[List[str]]
+    with open(path, 'rb') as fp:
+        reader = csv.reader(_count_lines(fp, stats))
+        header = next(reader, [])
+        w = math.exp(math.log(1.0 - rng.random()) / size) if size > 0 else 0.0
+        next_index = size + int(math.log(1.0 - rng.random()) / math.log(1 - w)) if 0 < w < 1 else size
+        for i, row in enumerate(reader):
+            if limit is not None and i >= limit:
+                break
+            stats.rows += 1
+            if i < size:
+                sample.append(row)
+            elif i == next_index:
+                sample[rng.randrange(size)] = row
+                w *= math.exp(math.log(1.0 - rng.random()) / size)
+                next_index += 1 + (int(math.log(1.0 - rng.random()) / math.log(1 - w)) if 0 < w < 1 else 0)
+    return to_columns(header, sample)
+
+
+def count_matches(values: List[str], attribute_type: str) -> int:
+    """Count values that parse as the given attribute type, matching the whole column with a single regex scan
+
+    :param values:          non-empty column values
+    :param attribute_type:  schema attribute type, e.g. 'integer'
+    :return:                number of matching values
+    """
+    pattern = _COLUMN_PATTERNS.get(attribute_type.lower())
+    if pattern is None:
+        return len(values)
+    text = "\n".join(v.strip().replace("\n", " ").replace("\r", " ") for v in values)
+    return len(pattern.findall(text))
+
+
+def infer_type(values: List[str], min_confidence: float = 0.95) -> Tuple[str, float]:
+    """Infer the most specific attribute type of a column. Empty values are treated as missing.
+
+    :param values:          column values
+    :param min_confidence:  minimum fraction of non-empty values that must parse as the type
+    :return:                (attribute type, confidence). The confidence of a specific type is the fraction of non-empty
+                            values that parse as it, and that of 'string' the fraction that parse as no other type
+    """
+    present = [v for v in values if v]
+    if not present:
+        return 'string', 0.0
+    best = 0.0
+    for attribute_type in _INFERRED_TYPES:
+        confidence = count_matches(present, attribute_type) / len(present)
+        if confidence >= min_confidence:
+            return attribute_type, confidence
+        best = max(best, confidence)
+    # a mostly numeric column is a less certain string than a column of words
+    return 'string', 1.0 - best
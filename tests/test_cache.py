@@ -0,0 +1,137 @@
+"""Test for Result Cache"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.cache import *
+from stellar.session import StellarSession, CompletedTask
+from stellar.nai import StellarNAIPayload
+from stellar.graph import StellarGraph
+from stellar.model import Node2Vec
+from redis import StrictRedis
+import httpretty
+import json
+import os
+
+
+EPGM_PATH = 'tests/res/lotr.epgm'
+
+
+def nai_payload(session_id, path=EPGM_PATH, target='target_attr'):
+    return StellarNAIPayload(session_id, StellarGraph(path, 'test'), Node2Vec(), target, 'type', [], 'test_nai')
+
+
+def test_fingerprint(tmpdir):
+    f = tmpdir.join('data.csv')
+    f.write('Id\n1\n')
+    before = fingerprint(str(f))
+    assert fingerprint(str(f)) == before
+    f.write('Id\n1\n2\n')
+    assert fingerprint(str(f)) != before
+    assert fingerprint(str(tmpdir.join('nothing'))) is None
+    assert len(fingerprint(EPGM_PATH).splitlines()) == 3
+
+
+def test_key():
+    assert ResultCache.key('nai', nai_payload('a')) == ResultCache.key('nai', nai_payload('b'))
+    assert ResultCache.key('nai', nai_payload('a')) != ResultCache.key('nai', nai_payload('a', target='other'))
+    assert ResultCache.key('nai', nai_payload('a')) != ResultCache.key('er', nai_payload('a'))
+    assert ResultCache.key('nai', nai_payload('a', path='/mnt/coordinator/graph.epgm')) is None
+
+
+def test_get_put(tmpdir):
+    cache = ResultCache(str(tmpdir.join('cache.db')))
+    assert cache.get('key') is None
+    cache.put('key', 'nai', 'sid', 'completed', EPGM_PATH)
+    assert cache.get('key') == ('sid', 'completed', EPGM_PATH)
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_get_output_removed(tmpdir):
+    cache = ResultCache(str(tmpdir.join('cache.db')))
+    out = tmpdir.mkdir('out.epgm')
+    cache.put('key', 'nai', 'sid', 'completed', str(out))
+    out.remove()
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_eviction(tmpdir):
+    outs = [str(tmpdir.mkdir('o{}'.format(i))) for i in range(3)]
+    cache = ResultCache(str(tmpdir.join('cache.db')), max_bytes=2 * (4 + 3 + 3 + 9 + len(outs[0])))
+    cache.put('key1', 'nai', 'sid', 'completed', outs[0])
+    cache.put('key2', 'nai', 'sid', 'completed', outs[1])
+    cache.get('key1')
+    cache.put('key3', 'nai', 'sid', 'completed', outs[2])
+    assert len(cache) == 2
+    assert cache.get('key2') is None
+    assert cache.get('key1') is not None
+
+
+@httpretty.activate
+def test_session_cache(tmpdir, monkeypatch):
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/nai/start')
+    out = str(tmpdir.mkdir('out.epgm'))
+    monkeypatch.setattr(StrictRedis, 'get',
+                        lambda *_: json.dumps({'status': 'completed', 'nai': {'output': out, 'error': ''}}))
+    session = StellarSession('12.12.12.12', 8000, cache=ResultCache(str(tmpdir.join('cache.db'))))
+    graph = StellarGraph(EPGM_PATH, 'test')
+    session.predict(graph, Node2Vec(), 'target_attr', 'type')
+    requests_made = len(httpretty.latest_requests())
+    task = session.nai_start(graph, Node2Vec(), 'target_attr', 'type', [], 'nai')
+    assert isinstance(task, CompletedTask)
+    assert task.session_id == 'test_session'
+    assert task.is_done()
+    assert task.wait_for_result().dir == out
+    assert len(httpretty.latest_requests()) == requests_made
+    task = session.nai_start(graph, Node2Vec(), 'other_attr', 'type', [], 'nai')
+    assert not isinstance(task, CompletedTask)
+
+
+@httpretty.activate
+def test_session_cache_failure_not_cached(tmpdir, monkeypatch):
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/nai/start')
+    monkeypatch.setattr(StrictRedis, 'get',
+                        lambda *_: u'{"status": "failed", "nai": {"output": "", "error":"failed"}}')
+    cache = ResultCache(str(tmpdir.join('cache.db')))
+    session = StellarSession('12.12.12.12', 8000, cache=cache)
+    session.nai_start(StellarGraph(EPGM_PATH, 'test'), Node2Vec(), 'target_attr', 'type', [], 'nai')\
+        .wait_for_result()
+    assert len(cache) == 0
+
+
+@httpretty.activate
+def test_session_cache_input_not_visible(tmpdir, monkeypatch):
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/nai/start')
+    out = str(tmpdir.mkdir('out.epgm'))
+    monkeypatch.setattr(StrictRedis, 'get',
+                        lambda *_: json.dumps({'status': 'completed', 'nai': {'output': out, 'error': ''}}))
+    cache = ResultCache(str(tmpdir.join('cache.db')))
+    session = StellarSession('12.12.12.12', 8000, cache=cache)
+    graph = StellarGraph('/mnt/coordinator/graph.epgm', 'test')
+    session.nai_start(graph, Node2Vec(), 'target_attr', 'type', [], 'nai').wait_for_result()
+    assert len(cache) == 0
+    assert not isinstance(session.nai_start(graph, Node2Vec(), 'target_attr', 'type', [], 'nai'), CompletedTask)
@@ -0,0 +1,89 @@
+"""Test for graph diffs"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from contextlib import ExitStack
+from stellar.diff import *
+from stellar.epgm import graph_head, write_elements
+from stellar.graph import StellarGraph
+import pytest
+
+
+EPGM_PATH = 'tests/res/lotr.epgm'
+
+
+def write_graph(path, vertices, edges, label='Person'):
+    """Write a single-graph EPGM directory from (id, data) vertices and (id, source, target) edges"""
+    write_elements(path, 'graphs', [graph_head('g', 'G')])
+    write_elements(path, 'vertices', [{'id': i, 'data': d, 'meta': {'label': label, 'graphs': ['G']}}
+                                      for i, d in vertices])
+    write_elements(path, 'edges', [{'id': i, 'source': s, 'target': t, 'data': {},
+                                    'meta': {'label': 'knows', 'graphs': ['G']}} for i, s, t in edges])
+
+
+@pytest.fixture
+def graphs(tmpdir):
+    old, new = str(tmpdir.join('old')), str(tmpdir.join('new'))
+    write_graph(old, [(str(i), {'name': 'n{}'.format(i)}) for i in range(9, -1, -1)],
+                [('e1', '1', '2'), ('e2', '2', '3'), ('e3', '3', '4')])
+    vertices = [(str(i), {'name': 'n{}'.format(i)}) for i in range(1, 12)]
+    vertices[2] = ('3', {'name': 'three', 'risk': 'high'})
+    vertices[3] = ('4', {})
+    write_graph(new, vertices, [('e1', '1', '2'), ('e2', '2', '5'), ('e4', '4', '5')])
+    return old, new
+
+
+@pytest.mark.parametrize('run_size', [RUN_SIZE, 3])
+def test_diff(graphs, tmpdir, run_size):
+    result = diff(*graphs, run_size=run_size, workdir=str(tmpdir))
+    assert result
+    assert result.vertices.added == ['10', '11']
+    assert result.vertices.removed == ['0']
+    assert result.vertices.changed == {'3': {'name': ('n3', 'three'), 'risk': (None, 'high')},
+                                       '4': {'name': ('n4', None)}}
+    assert result.edges.added == ['e4']
+    assert result.edges.removed == ['e3']
+    assert result.edges.changed == {'e2': {':target': ('3', '5')}}
+    assert sorted(p.basename for p in tmpdir.listdir()) == ['new', 'old']  # run files removed
+
+
+def test_sorted_elements_last_version(tmpdir):
+    path = str(tmpdir.join('g'))
+    write_graph(path, [('b', {'v': 1}), ('a', {}), ('b', {'v': 2}), ('c', {}), ('b', {'v': 3})], [])
+    for run_size in [1, 2, 10]:
+        with ExitStack() as stack:
+            elements = list(sorted_elements(path, 'vertices', 'G', str(tmpdir.join('runs')), stack, run_size))
+        assert [(i, v['data']) for i, v in elements] == [('a', {}), ('b', {'v': 3}), ('c', {})]
+
+
+def test_diff_label(tmpdir):
+    a, b = str(tmpdir.join('a')), str(tmpdir.join('b'))
+    write_graph(a, [('1', {})], [])
+    write_graph(b, [('1', {})], [], label='Company')
+    assert diff(a, b).vertices.changed == {'1': {':label': ('Person', 'Company')}}
+
+
+def test_graph_diff(graphs):
+    old, new = StellarGraph(graphs[0], 'g'), StellarGraph(graphs[1], 'g')
+    assert not StellarGraph(EPGM_PATH, '').diff(StellarGraph(EPGM_PATH, ''))
+    assert repr(old.diff(new)) == "GraphDiff(vertices=ElementDiff(added=2,removed=1,changed=2)," \
+                                  "edges=ElementDiff(added=1,removed=1,changed=1))"
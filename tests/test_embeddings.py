@@ -0,0 +1,83 @@
+"""Test for Embeddings"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from stellar.embeddings import *
+from stellar.graph import StellarGraph
+
+
+@pytest.fixture()
+def store(tmpdir):
+    """Two clusters of 50 vectors each, around the x and y axes"""
+    rng = np.random.default_rng(0)
+    matrix = np.vstack([[10, 0, 0] + rng.normal(size=(50, 3)), [0, 10, 0] + rng.normal(size=(50, 3))])
+    ids = ['v{}'.format(i) for i in range(100)]
+    write_embeddings(str(tmpdir), ids, matrix)
+    return EmbeddingStore(str(tmpdir))
+
+
+def test_write_embeddings(store):
+    assert len(store) == 100
+    assert isinstance(store.matrix, np.memmap)
+    assert store.matrix.dtype == np.float32
+    assert not store.matrix.flags.writeable
+    assert store['v1'] is not None and store['v1'].shape == (3,)
+    with pytest.raises(ValueError):
+        write_embeddings(store.path, ['a'], np.zeros((2, 3)))
+
+
+def test_graph_embeddings(store, tmpdir):
+    assert StellarGraph(store.path, 'graph').embeddings().ids == store.ids
+    with pytest.raises(FileNotFoundError):
+        StellarGraph(str(tmpdir.join('missing')), 'graph').embeddings()
+
+
+def test_nearest_exact(store, monkeypatch):
+    import stellar.embeddings as embeddings
+    monkeypatch.setattr(embeddings, '_BLOCK_ROWS', 7)
+    nearest = store.nearest('v3', k=5)
+    assert len(nearest) == 5
+    assert 'v3' not in [v for v, _ in nearest]
+    assert all(int(v[1:]) < 50 for v, _ in nearest)
+    assert [s for _, s in nearest] == sorted([s for _, s in nearest], reverse=True)
+    monkeypatch.setattr(embeddings, '_BLOCK_ROWS', 1000)
+    unblocked = store.nearest('v3', k=5)
+    assert [v for v, _ in unblocked] == [v for v, _ in nearest]
+    assert [s for _, s in unblocked] == pytest.approx([s for _, s in nearest])
+    assert store.nearest(np.array([0, 1, 0]), k=1)[0][0] in store.ids[50:]
+
+
+def test_nearest_index(store):
+    index = store.build_index(lists=4, seed=1)
+    assert len(index.rows) == 100
+    assert index.offsets[-1] == 100
+    reopened = EmbeddingStore(store.path)
+    assert reopened.index is not None
+    exact = reopened.nearest('v60', k=10, exact=True)
+    approximate = reopened.nearest('v60', k=10, probes=4)
+    assert [v for v, _ in approximate] == [v for v, _ in exact]
+    assert [s for _, s in approximate] == pytest.approx([s for _, s in exact])
+    assert all(int(v[1:]) >= 50 for v, _ in reopened.nearest('v60', k=10, probes=1))
@@ -0,0 +1,85 @@
+"""Test for EPGM"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.epgm import *
+from stellar.graph import StellarGraph
+
+
+EPGM_PATH = 'tests/res/lotr.epgm'
+
+
+def write_graph(path, graph_id, vertices, edges):
+    """Write a single-graph EPGM directory from (id, data) vertices and (id, source, target) edges"""
+    write_elements(path, 'graphs', [graph_head('shard', graph_id)])
+    write_elements(path, 'vertices', [{'id': i, 'data': d, 'meta': {'label': 'Paper', 'graphs': [graph_id]}}
+                                      for i, d in vertices])
+    write_elements(path, 'edges', [{'id': i, 'source': s, 'target': t, 'data': {},
+                                    'meta': {'label': 'cites', 'graphs': [graph_id]}} for i, s, t in edges])
+
+
+def test_iter_elements():
+    assert len(list(iter_elements(EPGM_PATH, 'graphs'))) == 5
+    assert len(list(iter_elements(EPGM_PATH, 'vertices'))) == 7
+    assert len(list(iter_elements(EPGM_PATH, 'edges'))) == 11
+
+
+def test_write_elements(tmpdir):
+    path = str(tmpdir.join('out.epgm'))
+    for kind in KINDS:
+        assert write_elements(path, kind, iter_elements(EPGM_PATH, kind)) == len(list(iter_elements(EPGM_PATH, kind)))
+    assert StellarGraph(path, '').to_networkx().number_of_edges() == 11
+
+
+def test_new_id():
+    assert len(new_id()) == 32
+    assert new_id() != new_id()
+
+
+def test_merge(tmpdir):
+    a, b, out = str(tmpdir.join('a')), str(tmpdir.join('b')), str(tmpdir.join('out'))
+    write_graph(a, 'GA', [('1', {'x': 1}), ('2', {})], [('e1', '1', '2')])
+    write_graph(b, 'GB', [('2', {'y': 2}), ('3', {})], [('e2', '2', '3')])
+    graph_id = merge([a, b], out, 'merged')
+    graphs = list(iter_elements(out, 'graphs'))
+    assert [g['id'] for g in graphs] == ['GA', 'GB', graph_id]
+    assert graphs[-1]['meta']['label'] == 'merged'
+    vertices = {v['id']: v for v in iter_elements(out, 'vertices')}
+    assert sorted(vertices.keys()) == ['1', '2', '3']
+    assert vertices['2']['data'] == {'y': 2}
+    assert vertices['2']['meta']['graphs'] == ['GA', graph_id, 'GB']
+    g = StellarGraph(out, 'merged').to_networkx()
+    assert g.number_of_nodes() == 3
+    assert g.number_of_edges() == 2
+
+
+def test_merge_key(tmpdir):
+    a, b, out = str(tmpdir.join('a')), str(tmpdir.join('b')), str(tmpdir.join('out'))
+    write_graph(a, 'GA', [('a1', {ID_ATTRIBUTE: 'p1'}), ('a2', {ID_ATTRIBUTE: 'p2'})], [('e1', 'a1', 'a2')])
+    write_graph(b, 'GB', [('b1', {ID_ATTRIBUTE: 'p1'}), ('b2', {ID_ATTRIBUTE: 'p2', 'x': 1})], [('e2', 'b2', 'b1')])
+    graph_id = merge([a, b], out, 'merged', key=ID_ATTRIBUTE)
+    vertices = {v['id']: v for v in iter_elements(out, 'vertices')}
+    assert sorted(vertices.keys()) == ['a1', 'a2']
+    assert vertices['a2']['data'] == {ID_ATTRIBUTE: 'p2', 'x': 1}
+    assert vertices['a2']['meta']['graphs'] == ['GA', graph_id, 'GB']
+    edges = {e['id']: (e['source'], e['target']) for e in iter_elements(out, 'edges')}
+    assert edges == {'e1': ('a1', 'a2'), 'e2': ('a2', 'a1')}
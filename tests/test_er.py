@@ -28,6 +28,7 @@ import stellar as st
 from redis import StrictRedis
 import httpretty
 import pytest
+import json
 
 
 stellar_addr = "http://localhost:3000"
@@ -42,6 +43,27 @@ def test_er_payload():
     assert payload.sessionId == 'test_session'
     assert payload.input == 'graph.epgm'
     assert payload.label == 'test_er'
+    assert payload.parameters == {'attribute_thresholds': {}}
+
+
+def test_er_payload_parameters():
+    graph = StellarGraph('graph.epgm', 'test_er_ori')
+    resolver = EntityResolution(blocking_keys=['name'], max_block_size=50, max_candidates=10, num_perm=64, bands=16)
+    payload = StellarERPayload('test_session', graph, resolver, {'name': 0.9, 'city': 0.5}, 'test_er')
+    assert payload.parameters == {
+        'attribute_thresholds': {'name': 0.9, 'city': 0.5},
+        'blocking_keys': ['name'],
+        'max_block_size': 50,
+        'max_candidates': 10,
+        'num_perm': 64,
+        'bands': 16
+    }
+    with pytest.raises(ValueError):
+        StellarERPayload('test_session', graph, resolver, {'name': 1.5}, 'test_er')
+    with pytest.raises(ValueError):
+        EntityResolution(max_block_size=0)
+    with pytest.raises(ValueError):
+        EntityResolution(num_perm=32, bands=5)
 
 
 @httpretty.activate
@@ -55,6 +77,17 @@ def test_er_start():
     assert task._session_id == "coordinator:sessions:dummy_session_id"
 
 
+@httpretty.activate
+def test_er_start_parameters():
+    httpretty.register_uri(httpretty.POST, stellar_addr_er, body=u'{"sessionId": "melon"}')
+    httpretty.register_uri(httpretty.GET, stellar_addr_session, body=u'{"sessionId": "dummy_session_id"}')
+    ss = st.create_session(url=stellar_addr)
+    ss.er_start(graph=StellarGraph('graph.epgm', 'test_er_ori'), resolver=EntityResolution(max_block_size=20),
+                attribute_thresholds={'name': 0.8}, label='test_er')
+    posted = json.loads(httpretty.last_request().body.decode('utf-8'))
+    assert posted['parameters'] == {'attribute_thresholds': {'name': 0.8}, 'max_block_size': 20}
+
+
 @httpretty.activate
 def test_er(monkeypatch):
     httpretty.register_uri(httpretty.POST, stellar_addr_er)
@@ -0,0 +1,54 @@
+"""Test for Local GCN"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import pytest
+
+np = pytest.importorskip('numpy')
+sp = pytest.importorskip('scipy.sparse')
+
+from stellar.local.gcn import *
+
+
+@pytest.fixture()
+def two_stars():
+    """Stars around nodes 0 and 5, joined by edge 4 - 9, with parallel edge and self loop on 1"""
+    src = np.array([0, 0, 0, 0, 5, 5, 5, 5, 4, 0, 1])
+    dst = np.array([1, 2, 3, 4, 6, 7, 8, 9, 9, 1, 1])
+    return normalized_adjacency(10, src, dst)
+
+
+def test_normalized_adjacency(two_stars):
+    adj = two_stars.toarray()
+    assert (adj == adj.T).all()
+    assert adj[0, 0] == pytest.approx(1 / 5)
+    assert adj[0, 1] == pytest.approx(1 / np.sqrt(5 * 2))
+    assert adj[1, 1] == pytest.approx(1 / 2)
+    assert adj[0, 5] == 0
+
+
+@pytest.mark.parametrize('batch_size', [None, 1])
+def test_gcn_classifier(two_stars, batch_size):
+    x = sp.identity(10, format='csr')
+    labelled, y = np.array([0, 1, 5, 6]), np.array([0, 0, 1, 1])
+    model = GCNClassifier(epochs=100, batch_size=batch_size, seed=1).fit(two_stars, x, labelled, y, 2)
+    assert list(model.predict(two_stars, x)) == [0] * 5 + [1] * 5
@@ -23,6 +23,7 @@ __license__ = "Apache 2.0"
 
 from stellar.graph import *
 import pytest
+import json
 
 
 EPGM_PATH = 'tests/res/lotr.epgm'
@@ -109,3 +110,77 @@ def test_to_graphml(tmpdir):
     assert graph.to_graphml(filepath=path)
     assert graph.to_graphml(filepath=path, inc_type_as='type')
     assert not StellarGraph("", "").to_graphml(filepath=path)
+
+
+def test_compact(tmpdir):
+    path = str(tmpdir.join('compact.epgm'))
+    graph = StellarGraph(EPGM_PATH, "").compact(path, keep=['base-line'])
+    assert graph.path == path
+    epgm = graph._load_epgm()
+    assert [g['meta']['label'] for g in epgm['graphs']] == ['base-line']
+    assert all(el['meta']['graphs'] == ['8A78E8727773486C8AABAEA5B33C16CE'] for el in epgm['vertices'] + epgm['edges'])
+    assert len(epgm['vertices']) == 5
+    vertex_ids = set(v['id'] for v in epgm['vertices'])
+    assert all(e['source'] in vertex_ids and e['target'] in vertex_ids for e in epgm['edges'])
+    full = StellarGraph(EPGM_PATH, "")._load_graph(index=1)
+    assert len(graph._load_graph()['edges']) == len(full['edges'])
+
+
+def test_compact_sort(tmpdir):
+    graph = StellarGraph(EPGM_PATH, "").compact(str(tmpdir.join('sorted.epgm')), sort=True)
+    epgm = graph._load_epgm()
+    assert len(epgm['graphs']) == 5
+    assert len(epgm['vertices']) == 7
+    assert len(epgm['edges']) == 11
+    assert [v['id'] for v in epgm['vertices']] == sorted(v['id'] for v in epgm['vertices'])
+    assert [e['source'] for e in epgm['edges']] == sorted(e['source'] for e in epgm['edges'])
+
+
+def test_compact_sort_runs(tmpdir):
+    graph = StellarGraph(EPGM_PATH, "")
+    in_memory = graph.compact(str(tmpdir.join('memory.epgm')), sort=True)._load_epgm()
+    runs = graph.compact(str(tmpdir.join('runs.epgm')), sort=True, run_size=2, workdir=str(tmpdir))._load_epgm()
+    assert runs == in_memory
+
+
+def test_compact_superseded(tmpdir):
+    source = tmpdir.join('versions.epgm')
+    source.mkdir()
+    source.join('graphs.json').write('{"data":{},"meta":{"label":"g"},"id":"G"}\n')
+    source.join('vertices.json').write('{"data":{"v":1},"meta":{"label":"A","graphs":["G"]},"id":"1"}\n'
+                                       '{"data":{},"meta":{"label":"A","graphs":["G"]},"id":"2"}\n'
+                                       '{"data":{"v":2},"meta":{"label":"A","graphs":["G"]},"id":"1"}\n')
+    source.join('edges.json').write('')
+    epgm = StellarGraph(str(source), "g").compact(str(tmpdir.join('out.epgm')))._load_epgm()
+    assert [(v['id'], v['data']) for v in epgm['vertices']] == [('2', {}), ('1', {'v': 2})]
+
+
+def test_read_attribute():
+    graph = StellarGraph(EPGM_PATH, '')
+    g = graph.to_networkx(inc_type_as='_type')
+    assert graph.read_attribute('name') == {n: d['name'] for n, d in g.nodes(data=True) if 'name' in d}
+    people = graph.read_attribute('name', node_type='Person')
+    assert people == {n: d['name'] for n, d in g.nodes(data=True) if 'name' in d and d['_type'] == 'Person'}
+    assert len(people) > 0
+    assert graph.read_attribute('missing') == {}
+
+
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_read_attribute_non_ascii(tmpdir, ensure_ascii):
+    source = tmpdir.join('accents.epgm')
+    source.mkdir()
+    source.join('graphs.json').write('{"data":{},"meta":{"label":"g"},"id":"G"}\n')
+    vertex = {'data': {'caf\u00e9': 'cr\u00e8me'}, 'meta': {'label': 'Caf\u00e9', 'graphs': ['G']}, 'id': '1'}
+    source.join('vertices.json').write_text(json.dumps(vertex, ensure_ascii=ensure_ascii) + '\n', encoding='utf-8')
+    source.join('edges.json').write('')
+    graph = StellarGraph(str(source), 'g')
+    assert graph.read_attribute('caf\u00e9') == {'1': 'cr\u00e8me'}
+    assert graph.read_attribute('caf\u00e9', node_type='Caf\u00e9') == {'1': 'cr\u00e8me'}
+
+
+def test_read_attribute_series():
+    pd = pytest.importorskip('pandas')
+    series = StellarGraph(EPGM_PATH, '').read_attribute('race', node_type='Person', as_series=True)
+    assert isinstance(series, pd.Series)
+    assert series.name == 'race'
+    assert series.to_dict() == StellarGraph(EPGM_PATH, '').read_attribute('race', node_type='Person')
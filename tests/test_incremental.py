@@ -0,0 +1,208 @@
+"""Test for Incremental Ingestion"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.incremental import *
+from stellar.session import StellarSession, StellarResult, CompletedTask
+from stellar.sources import read_chunks
+from stellar.epgm import write_elements, graph_head, iter_elements, element_path, ID_ATTRIBUTE
+from stellar.local import LocalCoordinator
+from stellar.local.ingest import ingest
+import stellar as st
+import pytest
+import itertools
+
+
+@pytest.fixture()
+def log_csv(tmpdir):
+    f = tmpdir.join('log.csv')
+    f.write('Id,name\n1,a\n2,b\n')
+    return f
+
+
+def test_watermark(log_csv):
+    mark = watermark(str(log_csv))
+    assert mark['offset'] == len('Id,name\n1,a\n2,b\n')
+    assert is_appended(str(log_csv), mark)
+    log_csv.write('3,c\n', mode='a')
+    assert is_appended(str(log_csv), mark)
+    log_csv.write('Id,name\n1,a\n2,x\n')
+    assert not is_appended(str(log_csv), mark)
+    log_csv.write('Id,name\n')
+    assert not is_appended(str(log_csv), mark)
+
+
+def test_watermark_partial_row(log_csv):
+    log_csv.write('3,c', mode='a')
+    assert watermark(str(log_csv))['offset'] == len('Id,name\n1,a\n2,b\n')
+
+
+def test_write_delta(log_csv, tmpdir):
+    mark = watermark(str(log_csv))
+    log_csv.write('3,c\n4,', mode='a')
+    delta = str(tmpdir.join('delta.csv'))
+    new_mark = write_delta(str(log_csv), mark, delta)
+    assert open(delta).read() == 'Id,name\n3,c\n'
+    assert new_mark['offset'] == mark['offset'] + 4
+    log_csv.write('d\n', mode='a')
+    write_delta(str(log_csv), new_mark, delta)
+    assert open(delta).read() == 'Id,name\n4,d\n'
+
+
+def test_checkpoint(log_csv, tmpdir):
+    path = str(tmpdir.join('checkpoint.json'))
+    state = IngestCheckpoint(path)
+    assert not state.is_valid('key')
+    state.save('key', 'graph.epgm', {str(log_csv): watermark(str(log_csv))})
+    state = IngestCheckpoint(path)
+    assert state.graph == 'graph.epgm'
+    assert state.is_valid('key')
+    assert not state.is_valid('other key')
+
+
+def test_vertex_index(tmpdir):
+    index = VertexIndex(str(tmpdir.join('vertices.db')))
+    index.add(('A', str(i), 'v{}'.format(i)) for i in range(1200))
+    index.add([('B', '1', 'b1'), ('A', '1', 'w1')])
+    assert len(index) == 1201
+    found = index.lookup('A', [str(i) for i in range(0, 2400, 2)])
+    assert len(found) == 600
+    assert found['1000'] == 'v1000'
+    assert index.lookup('A', ['1']) == {'1': 'w1'}
+    assert index.lookup('B', ['1', '2']) == {'1': 'b1'}
+    index.clear()
+    assert len(index) == 0
+
+
+def test_ingest_incremental(log_csv, tmpdir, monkeypatch):
+    ingested = []
+    counter = itertools.count()
+
+    def ingest_start(self, schema, mappings, label):
+        """Ingest one vertex per row"""
+        out = str(tmpdir.join('out{}'.format(next(counter))))
+        ids = [i for m in mappings for _, chunk in read_chunks(m.path) for i in chunk['Id']]
+        ingested.append(ids)
+        write_elements(out, 'graphs', [graph_head(label, 'G')])
+        write_elements(out, 'vertices', [{'id': i, 'data': {ID_ATTRIBUTE: i}, 'meta': {'label': 'Row', 'graphs': ['G']}}
+                                         for i in ids])
+        write_elements(out, 'edges', [])
+        return CompletedTask('ingest', 'sid', StellarResult('completed', {'output': out}))
+
+    monkeypatch.setattr(StellarSession, 'ingest_start', ingest_start)
+    schema = st.create_schema().add_node_type('Row', {'name': 'string'})
+    mappings = [schema.node['Row'].create_map(str(log_csv), 'Id', {'name': 'name'})]
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    session = StellarSession('localhost', 3000)
+
+    graph = session.ingest(schema, mappings, 'log', checkpoint=checkpoint)
+    assert ingested == [['1', '2']]
+    assert session.ingest(schema, mappings, 'log', checkpoint=checkpoint).path == graph.path
+    assert len(ingested) == 1
+
+    log_csv.write('3,c\n', mode='a')
+    graph = session.ingest(schema, mappings, 'log', checkpoint=checkpoint)
+    assert ingested[-1] == ['3']
+    assert sorted(v['id'] for v in iter_elements(graph.path, 'vertices')) == ['1', '2', '3']
+    assert graph.to_networkx().number_of_nodes() == 3
+
+    log_csv.write('Id,name\n9,z\n')
+    session.ingest(schema, mappings, 'log', checkpoint=checkpoint)
+    assert ingested[-1] == ['9']
+
+
+def coordinator_session(workdir):
+    """Local session whose ingestion, like the coordinator's, only writes the mapped attributes of vertices"""
+    backend = LocalCoordinator(workdir)
+
+    def ingest_mapped(payload, output_path):
+        ingest(payload, output_path)
+        if not all(ID_ATTRIBUTE in m for m in payload['mapping']['nodes']):
+            vertices = list(iter_elements(output_path, 'vertices'))
+            for v in vertices:
+                del v['data'][ID_ATTRIBUTE]
+            write_elements(output_path, 'vertices', vertices)
+        return output_path
+
+    backend._engines['ingest'] = ingest_mapped
+    return StellarSession('localhost', 0, backend=backend)
+
+
+def test_ingest_incremental_coordinator(tmpdir):
+    papers, cites = tmpdir.join('papers.csv'), tmpdir.join('cites.csv')
+    papers.write('Id,title\n' + ''.join('p{},t{}\n'.format(i, i) for i in range(10)))
+    cites.write('Source,Target\n' + ''.join('p{},p{}\n'.format(i, (i + 1) % 10) for i in range(10)))
+    schema = st.create_schema().add_node_types({'Paper': {'title': 'string'}})
+    schema.add_edge_types({'cites': ('Paper', 'Paper')})
+    mappings = schema.create_maps([
+        {'node_type': 'Paper', 'path': str(papers), 'column': 'Id', 'map_attributes': {'title': 'title'}},
+        {'edge_type': 'cites', 'path': str(cites), 'src': 'Source', 'dst': 'Target'}
+    ])
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    ss = coordinator_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'papers', checkpoint=checkpoint)
+    first = open(element_path(graph.path, 'vertices')).read()
+    assert len(VertexIndex(checkpoint + '.vertices.db')) == 10
+
+    papers.write(''.join('p{},t{}\n'.format(i, i) for i in range(10, 15)), mode='a')
+    cites.write(''.join('p{},p{}\n'.format(i, i - 10) for i in range(10, 15)) + 'p3,p99\n', mode='a')
+    assert ss.ingest(schema, mappings, 'papers', checkpoint=checkpoint).path == graph.path
+    assert open(element_path(graph.path, 'vertices')).read().startswith(first)
+    endpoints = [i for _, chunk in read_chunks(checkpoint + '.endpoints.Paper.csv') for i in chunk[ID_ATTRIBUTE]]
+    assert sorted(endpoints) == ['p0', 'p1', 'p2', 'p3', 'p4']  # only the indexed vertices new edges refer to
+    g = graph.to_networkx()
+    full = ss.ingest(schema, mappings, 'papers').to_networkx()
+    assert g.number_of_nodes() == full.number_of_nodes() == 15
+    assert g.number_of_edges() == full.number_of_edges() == 15
+
+    papers.write('p3,new title\n', mode='a')
+    g = ss.ingest(schema, mappings, 'papers', checkpoint=checkpoint).to_networkx()
+    assert g.number_of_nodes() == 15
+    assert g.number_of_edges() == 15
+    assert [v['title'] for _, v in g.nodes(data=True) if v[ID_ATTRIBUTE] == 'p3'] == ['new title']
+    assert graph.read_attribute('title')[VertexIndex(checkpoint + '.vertices.db').lookup('Paper', ['p3'])['p3']] == \
+        'new title'
+
+
+def test_ingest_incremental_appended_during_ingest(log_csv, tmpdir, monkeypatch):
+    ingested = []
+
+    def ingest_start(self, schema, mappings, label):
+        """Ingest one vertex per row, while another row is appended to the source"""
+        ids = [i for m in mappings for _, chunk in read_chunks(m.path) for i in chunk['Id']]
+        ingested.append(ids)
+        log_csv.write('{},x\n'.format(len(ingested) + 2), mode='a')
+        out = str(tmpdir.join('out{}'.format(len(ingested))))
+        write_elements(out, 'graphs', [graph_head(label, 'G')])
+        write_elements(out, 'vertices', [{'id': i, 'data': {ID_ATTRIBUTE: i}, 'meta': {'label': 'Row', 'graphs': ['G']}}
+                                         for i in ids])
+        write_elements(out, 'edges', [])
+        return CompletedTask('ingest', 'sid', StellarResult('completed', {'output': out}))
+
+    monkeypatch.setattr(StellarSession, 'ingest_start', ingest_start)
+    schema = st.create_schema().add_node_type('Row', {'name': 'string'})
+    mappings = [schema.node['Row'].create_map(str(log_csv), 'Id', {'name': 'name'})]
+    checkpoint = str(tmpdir.join('checkpoint.json'))
+    session = StellarSession('localhost', 3000)
+    session.ingest(schema, mappings, 'log', checkpoint=checkpoint)
+    session.ingest(schema, mappings, 'log', checkpoint=checkpoint)
+    assert ingested == [['1', '2'], ['3']]
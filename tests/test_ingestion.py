@@ -22,7 +22,15 @@ __copyright__ = """
 __license__ = "Apache 2.0"
 
 from stellar.ingestion import *
+from stellar.session import StellarSession
+from stellar.epgm import write_elements, graph_head, iter_elements, ID_ATTRIBUTE
+from stellar.local import LocalCoordinator
+from stellar.local.ingest import ingest
 from redis import StrictRedis
+import requests
+import json
+import pickle
+import os
 import stellar as st
 import pytest
 import httpretty
@@ -187,3 +195,239 @@ def test_ingest(monkeypatch):
     ss = st.create_session(url=stellar_addr)
     graph = ss.ingest(graph_schema(), graph_mappings(), 'test_ingest')
     assert graph.path == "test_path.epgm"
+
+
+@pytest.fixture()
+def papers_sources(tmpdir):
+    papers = tmpdir.join('papers.csv')
+    papers.write('Id,title,year\n1,Graphs,2001\n2,Nodes,200x\n3,Edges,\n')
+    authors = tmpdir.join('authors.csv')
+    authors.write('Source,Target,Author\n1,2,Ann\n2,4,Bob\n5,3,Cat\n')
+    schema = create_schema()
+    schema.add_node_type('Paper', {'title': 'string', 'year': 'integer'})
+    schema.add_edge_type('SharesAuthor', 'Paper', 'Paper', {'author': 'string'})
+    mappings = [
+        schema.node['Paper'].create_map(str(papers), 'Id', {'title': 'title', 'year': 'year'}),
+        schema.edge['SharesAuthor'].create_map(str(authors), 'Source', 'Target', {'author': 'Author'})
+    ]
+    return schema, mappings
+
+
+def test_validate_sources(papers_sources):
+    schema, mappings = papers_sources
+    report = schema.validate_sources(mappings, chunk_size=2)
+    assert not report.valid
+    assert len(report.errors) == 3
+    assert "1 values of column 'year' are not integer" in report.errors[0]
+    assert "['200x']" in report.errors[0]
+    assert "1 IDs in column 'Source'" in report.errors[1]
+    assert "['5']" in report.errors[1]
+    assert "1 IDs in column 'Target'" in report.errors[2]
+
+
+def test_validate_sources_many_invalid(tmpdir):
+    papers = tmpdir.join('papers.csv')
+    papers.write('Id,year\n' + ''.join('{},y{}\n'.format(i, i) for i in range(100)))
+    schema = create_schema()
+    schema.add_node_type('Paper', {'year': 'integer'})
+    mapping = schema.node['Paper'].create_map(str(papers), 'Id', {'year': 'year'})
+    report = schema.validate_sources([mapping], chunk_size=3)
+    assert "100 values of column 'year' are not integer" in report.errors[0]
+    assert "['y0', 'y1', 'y2', 'y3', 'y4']" in report.errors[0]
+
+
+def test_validate_sources_sample(papers_sources):
+    schema, mappings = papers_sources
+    report = schema.validate_sources(mappings, sample=1)
+    assert report.valid
+    assert str(report) == "No problems found"
+
+
+def test_validate_sources_missing(papers_sources, tmpdir):
+    schema, mappings = papers_sources
+    bad = [
+        schema.node['Paper'].create_map(mappings[0].path, 'PaperId'),
+        schema.node['Paper'].create_map(str(tmpdir.join('missing.csv')), 'Id')
+    ]
+    report = schema.validate_sources(bad)
+    assert len(report.errors) == 2
+    assert "missing columns ['PaperId']" in report.errors[0]
+    assert "file does not exist" in report.errors[1]
+
+
+def test_validate_sources_stats(papers_sources):
+    schema, mappings = papers_sources
+    mappings.append(schema.edge['SharesAuthor'].create_map(mappings[0].path, 'Id', 'Id', {'author': 'title'}))
+    report = schema.validate_sources(mappings)
+    assert len(report.sources) == 2
+    assert report.sources[mappings[0].path].rows == 3
+
+
+def coordinator_session(workdir):
+    """Local session whose ingestion, like the coordinator's, only writes the mapped attributes of vertices"""
+    backend = LocalCoordinator(workdir)
+
+    def ingest_mapped(payload, output_path):
+        ingest(payload, output_path)
+        if not all(ID_ATTRIBUTE in m for m in payload['mapping']['nodes']):
+            vertices = list(iter_elements(output_path, 'vertices'))
+            for v in vertices:
+                del v['data'][ID_ATTRIBUTE]
+            write_elements(output_path, 'vertices', vertices)
+        return output_path
+
+    backend._engines['ingest'] = ingest_mapped
+    return StellarSession('localhost', 0, backend=backend)
+
+
+@pytest.fixture()
+def cites_sources(tmpdir):
+    papers = tmpdir.join('papers.csv')
+    papers.write('Id,title\n' + ''.join('p{},t{}\n'.format(i, i) for i in range(20)))
+    cites = tmpdir.join('cites.csv')
+    cites.write('Source,Target\n' + ''.join('p{},p{}\n'.format(i, (i + 7) % 20) for i in range(20)) + 'p3,p99\n')
+    schema = create_schema().add_node_types({'Paper': {'title': 'string'}})
+    schema.add_edge_types({'cites': ('Paper', 'Paper'), 'same': ('Paper', 'Paper')})
+    return schema, schema.create_maps([
+        {'node_type': 'Paper', 'path': str(papers), 'column': 'Id', 'map_attributes': {'title': 'title'}},
+        {'edge_type': 'cites', 'path': str(cites), 'src': 'Source', 'dst': 'Target'},
+        {'edge_type': 'same', 'path': str(papers), 'src': 'Id', 'dst': 'Id'}
+    ])
+
+
+def test_ingest_partitioned(cites_sources, tmpdir):
+    schema, mappings = cites_sources
+    ss = coordinator_session(str(tmpdir.join('work')))
+    whole = ss.ingest(schema, mappings, 'papers').to_networkx()
+    assert all(ID_ATTRIBUTE not in v for _, v in whole.nodes(data=True))
+    graph = ss.ingest(schema, mappings, 'papers', partitions=2, output_path=str(tmpdir.join('merged.epgm')))
+    assert graph.path == str(tmpdir.join('merged.epgm'))
+    g = graph.to_networkx()
+    assert g.number_of_nodes() == whole.number_of_nodes() == 20
+    assert g.number_of_edges() == whole.number_of_edges() == 40
+    assert sorted(v['title'] for _, v in g.nodes(data=True)) == sorted(v['title'] for _, v in whole.nodes(data=True))
+    for name in ('cites', 'papers'):
+        shards = os.listdir(str(tmpdir.join(name + '.csv.shards')))
+        assert sorted(s for s in shards if '.ids' not in s) == [name + '.part0000.csv', name + '.part0001.csv']
+
+
+def test_schema_to_payload_memoized():
+    schema = create_schema().add_node_type('A')
+    fragment = schema.to_payload()
+    assert schema.to_payload() is fragment
+    assert StellarIngestPayload('id', schema, [], 'label').graphSchema is fragment
+    schema.add_node_type('B')
+    assert schema.to_payload() is not fragment
+    assert [c['name'] for c in schema.to_payload()['classes']] == ['A', 'B']
+    schema.add_edge_type('AB', 'A', 'B')
+    assert schema.to_payload()['classLinks'] == [{'name': 'AB', 'source': 'A', 'target': 'B', 'props': {}}]
+
+
+def test_schema_type_references():
+    schema = create_schema().add_node_types({'A': None, 'B': {'n': 'integer'}})
+    schema.add_edge_types({'AB': ('A', 'B'), 'BB': ('B', 'B', {'w': 'float'})})
+    assert schema.edge['BB'].attribute_types == {'w': 'float'}
+    assert schema.edge_types_of('B') == ['AB', 'BB']
+    schema.add_edge_type('AB', 'A', 'A')
+    assert schema.edge_types_of('A') == ['AB']
+    assert schema.edge_types_of('B') == ['BB']
+    schema.add_edge_type('AC', 'A', 'C')
+    assert schema.dangling_references() == {'C': ['AC']}
+    with pytest.raises(KeyError):
+        schema.validate()
+    schema.add_node_type('C')
+    assert schema.validate() is schema
+
+
+def test_add_edge_types_unknown_node_type():
+    schema = create_schema().add_node_types({'A': None})
+    with pytest.raises(KeyError):
+        schema.add_edge_types({'AA': ('A', 'A'), 'AB': ('A', 'B')})
+    assert schema.edge == {}
+
+
+def test_create_maps(graph_schema):
+    schema = graph_schema
+    mappings = schema.create_maps([
+        {'node_type': 'dst node 2', 'path': 'path', 'column': 'DstId2', 'map_attributes': {'number': 'Number'}},
+        {'edge_type': 'edge', 'path': 'path', 'src': 'SrcId', 'dst': 'DstId'}
+    ])
+    assert mappings[0].attributes == {'number': 'Number'}
+    assert mappings[1].src_type == 'src node'
+    with pytest.raises(KeyError) as e:
+        schema.create_maps([
+            {'node_type': 'missing', 'path': 'path', 'column': 'Id'},
+            {'node_type': 'src node', 'path': 'path', 'column': 'SrcId', 'map_attributes': {'bad': 'Bad'}},
+            {'edge_type': 'edge', 'path': 'path', 'src': 'SrcId', 'dst': 'DstId'}
+        ])
+    assert "0: type 'missing'" in str(e.value) and "1: " in str(e.value) and "2: " not in str(e.value)
+
+
+@pytest.mark.parametrize('name', ['schema.json', 'schema.jsonl', 'schema.yaml'])
+def test_schema_file_roundtrip(graph_schema, tmpdir, name):
+    path = str(tmpdir.join(name))
+    graph_schema.to_file(path)
+    schema = GraphSchema.from_file(path)
+    assert schema.to_payload() == graph_schema.to_payload()
+    assert schema.edge_types_of('dst node 2') == ['edge 2']
+
+
+def test_schema_file_cache(graph_schema, tmpdir):
+    path, cache = str(tmpdir.join('schema.json')), str(tmpdir.join('cache'))
+    graph_schema.to_file(path)
+    schema = GraphSchema.from_file(path, cache_dir=cache)
+    assert len(os.listdir(cache)) == 1
+    cached = os.path.join(cache, os.listdir(cache)[0])
+    with open(cached, 'wb') as fp:
+        pickle.dump(create_schema().add_node_type('cached'), fp)
+    assert list(GraphSchema.from_file(path, cache_dir=cache).node.keys()) == ['cached']
+    schema.add_node_type('changed').to_file(path)
+    assert 'changed' in GraphSchema.from_file(path, cache_dir=cache).node
+    assert len(os.listdir(cache)) == 2
+
+
+def test_schema_file_cache_invalid(graph_schema, tmpdir):
+    path, cache = str(tmpdir.join('schema.json')), str(tmpdir.join('cache'))
+    graph_schema.to_file(path)
+    GraphSchema.from_file(path, cache_dir=cache)
+    cached = os.path.join(cache, os.listdir(cache)[0])
+    assert cached.endswith('.v1.pickle')
+    with open(cached, 'wb') as fp:
+        fp.write(pickle.dumps(create_schema())[:-5])  # truncated
+    schema = GraphSchema.from_file(path, cache_dir=cache)
+    assert sorted(schema.node.keys()) == sorted(graph_schema.node.keys())
+    assert list(GraphSchema.from_file(path, cache_dir=cache).node.keys()) == list(schema.node.keys())
+
+
+@pytest.mark.parametrize('name', ['mappings.json', 'mappings.yml'])
+def test_mappings_file_roundtrip(graph_schema, tmpdir, name):
+    path = str(tmpdir.join(name))
+    mappings = graph_schema.create_maps([
+        {'node_type': 'dst node 2', 'path': 'path', 'column': 'DstId2', 'map_attributes': {'number': 'Number'}},
+        {'edge_type': 'edge 2', 'path': 'path', 'src': 'SrcId', 'dst': 'DstId2', 'map_attributes': {'str': 'A'}}
+    ])
+    save_mappings(mappings, path)
+    loaded = graph_schema.load_mappings(path)
+    assert [mapping_spec(m) for m in loaded] == [mapping_spec(m) for m in mappings]
+    assert loaded[1].src_type == 'src node'
+
+
+def test_create_schema_from_sources(papers_sources):
+    _, mappings = papers_sources
+    papers, authors = mappings[0].path, mappings[1].path
+    proposal = st.create_schema_from_sources([authors, papers], {
+        papers: 'Id',
+        authors: ('Source', 'papers', 'Target', 'papers')
+    }, min_confidence=0.5, names={authors: 'SharesAuthor'})
+    schema = proposal.schema
+    assert schema.node['papers'].attribute_types == {'title': 'string', 'year': 'integer'}
+    assert schema.edge['SharesAuthor'].attribute_types == {'Author': 'string'}
+    assert schema.validate() is schema
+    assert [type(m) for m in proposal.mappings] == [NodeMapping, EdgeMapping]
+    assert proposal.mappings[1].src == 'Source' and proposal.mappings[1].attributes == {'Author': 'Author'}
+    year = proposal.columns[papers]['year']
+    assert (year.confidence, year.sampled, year.missing) == (0.5, 3, 1)
+    assert [(p, c) for p, c, _ in proposal.uncertain()] == [(papers, 'year')]
+    assert proposal.sources[papers].rows == 3
+    with pytest.raises(KeyError):
+        st.create_schema_from_sources([papers], {})
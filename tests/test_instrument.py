@@ -0,0 +1,126 @@
+"""Test for Instrumentation"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.instrument import *
+from stellar.session import StellarSession, StellarTask
+from stellar.payload import Payload
+from stellar.graph import StellarGraph
+from redis import StrictRedis
+import httpretty
+import pytest
+
+
+EPGM_PATH = 'tests/res/lotr.epgm'
+
+
+@pytest.fixture()
+def recorder():
+    rec = InMemoryRecorder()
+    set_instrument(rec)
+    yield rec
+    set_instrument(None)
+
+
+def test_span(recorder):
+    with span('phase', key='value') as s:
+        s.set_attribute('other', 1)
+    record('phase', 2.0)
+    assert len(recorder.spans) == 2
+    assert recorder.spans[0].attributes == {'key': 'value', 'other': 1}
+    summary = recorder.summary()
+    assert summary['phase']['count'] == 2
+    assert summary['phase']['max'] == 2.0
+    assert summary['phase']['total'] >= 2.0
+
+
+def test_report(recorder, capsys):
+    record('http.get', 0.5)
+    record('http.post', 1.5)
+    recorder.report()
+    out = capsys.readouterr().out
+    assert out.splitlines()[0].split() == ['phase', 'count', 'total(s)', 'mean(s)', 'max(s)']
+    assert 'http.post' in out
+    recorder.clear()
+    assert recorder.spans == []
+
+
+def test_no_instrument():
+    set_instrument(None)
+    assert type(get_instrument()) is Instrument
+    with span('phase'):
+        pass
+
+
+def test_open_telemetry():
+    class FakeOtelSpan:
+        def __init__(self, name, attributes, start_time):
+            self.name, self.attributes, self.start_time = name, attributes, start_time
+
+        def end(self, end_time):
+            self.end_time = end_time
+
+    class FakeTracer:
+        spans = []
+
+        def start_span(self, name, attributes, start_time):
+            self.spans.append(FakeOtelSpan(name, attributes, start_time))
+            return self.spans[-1]
+
+    tracer = FakeTracer()
+    set_instrument(OpenTelemetryInstrument(tracer))
+    record('phase', 1.0, key='value')
+    set_instrument(None)
+    assert tracer.spans[0].name == 'phase'
+    assert tracer.spans[0].attributes == {'key': 'value'}
+    assert tracer.spans[0].end_time - tracer.spans[0].start_time == pytest.approx(1e9)
+
+
+@httpretty.activate
+def test_session_spans(recorder):
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/test_task/start')
+    StellarSession('12.12.12.12', 8000)._start('test_task', lambda sid: Payload(sid, "test_label"))
+    names = [s.name for s in recorder.spans]
+    assert names == ['http.get', 'http.post', 'session.start']
+    assert recorder.spans[0].attributes == {'endpoint': 'init', 'status_code': 200}
+    assert recorder.spans[1].attributes['bytes'] > 0
+
+
+def test_task_status_spans(recorder, monkeypatch):
+    states = iter(['init', 'running', 'running', 'completed', 'completed'])
+    monkeypatch.setattr(StellarTask, 'check_status', lambda self: next(states))
+    monkeypatch.setattr(StrictRedis, 'get', lambda *_: u'{"status": "completed", "nai": {"output": "out.epgm"}}')
+    monkeypatch.setattr('polling.time.sleep', lambda _: None)
+    StellarTask('localhost', 6379, 'nai', 'sid').wait_for_result()
+    assert [s.name for s in recorder.spans] == ['task.init', 'task.running', 'task.wait']
+    assert recorder.spans[0].attributes == {'task': 'nai'}
+
+
+def test_graph_spans(recorder):
+    StellarGraph(EPGM_PATH, "").to_networkx()
+    load, to_nx = recorder.spans
+    assert load.name == 'graph.load'
+    assert load.attributes['elements'] == 5 + 7 + 11
+    assert load.attributes['bytes'] > 0
+    assert load.attributes['parse_time'] <= load.duration
+    assert to_nx.name == 'graph.to_networkx'
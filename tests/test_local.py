@@ -0,0 +1,312 @@
+"""Test for Local Backend"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.local import *
+from stellar.local.ingest import ID_ATTRIBUTE
+from stellar.ingestion import StellarIngestPayload
+from stellar.session import SessionError
+from stellar.graph import StellarGraph
+from stellar.entity import EntityResolution
+from stellar.registry import ModelRegistry
+import stellar as st
+import pytest
+import json
+import os
+
+
+@pytest.fixture()
+def papers(tmpdir):
+    papers = tmpdir.join('papers.csv')
+    papers.write('Id,title,year\np1,Graphs,2001\np2,Nodes,200x\np3,Edges,2003\n')
+    authors = tmpdir.join('authors.csv')
+    authors.write('Source,Target,Author\np1,p2,Ann\np2,p3,Bob\np3,p9,Cat\n')
+    schema = st.create_schema()
+    schema.add_node_type('Paper', {'title': 'string', 'year': 'integer'})
+    schema.add_edge_type('SharesAuthor', 'Paper', 'Paper', {'author': 'string'})
+    mappings = [
+        schema.node['Paper'].create_map(str(papers), 'Id', {'title': 'title', 'year': 'year'}),
+        schema.edge['SharesAuthor'].create_map(str(papers), 'Id', 'Id', {'author': 'title'}),
+        schema.edge['SharesAuthor'].create_map(str(authors), 'Source', 'Target', {'author': 'Author'})
+    ]
+    return schema, mappings
+
+
+def test_ingest(papers, tmpdir):
+    schema, mappings = papers
+    payload = json.loads(StellarIngestPayload('sid', schema, mappings, 'papers').to_json())
+    path = ingest(payload, str(tmpdir.join('out.epgm')), chunk_size=2)
+    graph = StellarGraph(path, 'papers')
+    epgm = graph._load_epgm()
+    assert [g['meta']['label'] for g in epgm['graphs']] == ['papers']
+    vertices = {v['data'][ID_ATTRIBUTE]: v for v in epgm['vertices']}
+    assert sorted(vertices.keys()) == ['p1', 'p2', 'p3']
+    assert vertices['p1']['data'] == {ID_ATTRIBUTE: 'p1', 'title': 'Graphs', 'year': 2001}
+    assert 'year' not in vertices['p2']['data']
+    assert vertices['p1']['meta']['label'] == 'Paper'
+    assert len(epgm['edges']) == 5  # edge to unknown paper p9 is dropped
+    g = graph.to_networkx()
+    assert g.number_of_nodes() == 3
+    assert g.number_of_edges() == 5
+    authors = sorted(attr['author'] for _, _, attr in g.edges(data=True))
+    assert authors == ['Ann', 'Bob', 'Edges', 'Graphs', 'Nodes']
+
+
+def test_local_session(papers, tmpdir):
+    schema, mappings = papers
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'papers')
+    assert graph.path.startswith(str(tmpdir.join('work')))
+    assert graph.label == 'papers'
+    assert graph.to_networkx().number_of_nodes() == 3
+
+
+def test_local_session_failure(papers, tmpdir):
+    schema, mappings = papers
+    mappings[0].path = str(tmpdir.join('missing.csv'))
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    with pytest.raises(SessionError):
+        ss.ingest(schema, mappings, 'papers')
+
+
+def test_local_coordinator_unknown_task(tmpdir):
+    task = LocalCoordinator(str(tmpdir)).start('unknown', lambda sid: Payload(sid, 'label'))
+    result = task.wait_for_result()
+    assert not result.success
+    assert 'cannot be run locally' in result.reason
+
+
+@pytest.fixture()
+def communities(tmpdir):
+    """Two 6-cliques joined by one edge, with a 'group' known for some nodes of each"""
+    people = tmpdir.join('people.csv')
+    groups = {0: 'a', 1: 'a', 2: 'a', 6: 'b', 7: 'b', 8: 'b'}
+    people.write('Id,group,age\n' + ''.join('n{},{},{}\n'.format(i, groups.get(i, ''), 30 + i % 3) for i in range(12)))
+    knows = tmpdir.join('knows.csv')
+    pairs = [(i, j) for c in (0, 6) for i in range(c, c + 6) for j in range(i + 1, c + 6)] + [(5, 6)]
+    knows.write('Source,Target\n' + ''.join('n{},n{}\n'.format(i, j) for i, j in pairs))
+    schema = st.create_schema().add_node_types({'Person': {'group': 'string', 'age': 'integer'}})
+    schema.add_edge_types({'knows': ('Person', 'Person')})
+    return schema, schema.create_maps([
+        {'node_type': 'Person', 'path': str(people), 'column': 'Id',
+         'map_attributes': {'group': 'group', 'age': 'age'}},
+        {'edge_type': 'knows', 'path': str(knows), 'src': 'Source', 'dst': 'Target'}
+    ])
+
+
+@pytest.mark.parametrize('model,ignore', [(st.model.Node2Vec(), None), (st.model.GCN(), ['age'])])
+def test_local_nai(communities, tmpdir, model, ignore):
+    pytest.importorskip('numpy')
+    pytest.importorskip('scipy')
+    schema, mappings = communities
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    predicted = ss.predict(graph, model, 'group', 'Person', attributes_to_ignore=ignore, label='nai',
+                           export_embeddings=True)
+    heads = [g['meta']['label'] for g in predicted._load_epgm()['graphs']]
+    assert heads == ['people', 'nai']
+    groups = {v[ID_ATTRIBUTE]: v['group'] for _, v in predicted.to_networkx().nodes(data=True)}
+    assert all(groups['n{}'.format(i)] == 'a' for i in range(6))
+    assert all(groups['n{}'.format(i)] == 'b' for i in range(6, 12))
+    embeddings = predicted.embeddings()
+    assert sorted(embeddings.ids) == sorted(predicted.to_networkx().nodes())
+    assert len(embeddings.nearest(embeddings.ids[0], k=3)) == 3
+
+
+def test_local_nai_metric_learning(communities, tmpdir):
+    pytest.importorskip('numpy')
+    schema, mappings = communities
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    with pytest.raises(SessionError, match='cannot be run locally'):
+        ss.predict(graph, st.model.Node2Vec(metric_learning=True), 'group', 'Person')
+
+
+def test_local_sweep(communities, tmpdir):
+    pytest.importorskip('numpy')
+    pytest.importorskip('scipy')
+    schema, mappings = communities
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    table = ss.sweep(graph, [st.model.Node2Vec(), st.model.GCN()], ['group', 'unknown'], 'Person',
+                     attributes_to_ignore=['age'], max_in_flight=2)
+    assert [(r['model'], r['target_attribute']) for r in table] == [
+        ('Node2Vec', 'group'), ('Node2Vec', 'unknown'), ('GCN', 'group'), ('GCN', 'unknown')]
+    assert [r['success'] for r in table] == [True, False, True, False]
+    assert all(r['runtime'] > 0 for r in table)
+    for row in table[::2]:
+        assert row['pipeline'] in ('pipeline_basic.json', 'pipeline_gcn.json')
+        assert len(row['predictions']) == 12
+        assert sorted(set(row['predictions'].values())) == ['a', 'b']
+        assert row['graph'].label == 'people'
+    assert table[1]['graph'] is None and table[1]['predictions'] == {}
+    assert table[1]['reason']
+
+
+def test_local_nai_not_numeric(communities, tmpdir):
+    pytest.importorskip('numpy')
+    schema, mappings = communities
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    with pytest.raises(SessionError):
+        ss.predict(graph, st.model.Node2Vec(), 'age', 'Person')
+
+
+def other_graph(ss, communities, tmpdir):
+    """Graph of the same people with the edges of the first clique only"""
+    schema, mappings = communities
+    knows = tmpdir.join('knows2.csv')
+    knows.write('Source,Target\n' + ''.join('n{},n{}\n'.format(i, j) for i in range(6) for j in range(i + 1, 6)))
+    mappings = [mappings[0], schema.edge['knows'].create_map(str(knows), 'Source', 'Target')]
+    return ss.ingest(schema, mappings, 'people')
+
+
+def test_local_nai_model_reuse(communities, tmpdir):
+    pytest.importorskip('numpy')
+    pytest.importorskip('scipy')
+    schema, mappings = communities
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    for model in [st.model.Node2Vec(), st.model.GCN()]:
+        predicted = ss.predict(graph, model, 'group', 'Person')
+        assert model.artifact is None
+        assert predicted.model.artifact == os.path.join(predicted.path, 'model')
+        again = ss.predict(graph, predicted.model, 'group', 'Person')
+        assert again.read_attribute('group', 'Person') == predicted.read_attribute('group', 'Person')
+        assert not os.path.exists(os.path.join(again.path, 'model'))  # inference only
+        assert again.model.artifact == predicted.model.artifact
+        with pytest.raises(SessionError):
+            ss.predict(graph, predicted.model, 'age', 'Person')  # trained for another attribute
+
+    other = other_graph(ss, communities, tmpdir)
+    node2vec = ss.predict(graph, st.model.Node2Vec(), 'group', 'Person')
+    with pytest.raises(SessionError):
+        ss.predict(other, node2vec.model, 'group', 'Person')  # embeddings of another graph
+    gcn = ss.predict(graph, st.model.GCN(), 'group', 'Person')
+    assert len(ss.predict(other, gcn.model, 'group', 'Person').read_attribute('group', 'Person')) == 12
+
+
+def test_local_nai_registry(communities, tmpdir):
+    pytest.importorskip('numpy')
+    pytest.importorskip('scipy')
+    schema, mappings = communities
+    registry = ModelRegistry(str(tmpdir.join('registry')))
+    ss = StellarSession('localhost', 0, backend=LocalCoordinator(str(tmpdir.join('work'))), registry=registry)
+    graph = ss.ingest(schema, mappings, 'people')
+    first = ss.predict(graph, st.model.GCN(), 'group', 'Person', attributes_to_ignore=['age'])
+    assert first.model.artifact.startswith(registry.path)
+    assert len(registry) == 1
+    second = ss.predict(graph, st.model.GCN(), 'group', 'Person', attributes_to_ignore=['age'])
+    assert not os.path.exists(os.path.join(second.path, 'model'))
+    assert second.read_attribute('group') == first.read_attribute('group')
+
+    # node identity features do not apply to another graph, so a new model is trained and registered
+    other = ss.predict(other_graph(ss, communities, tmpdir), st.model.GCN(), 'group', 'Person',
+                       attributes_to_ignore=['age'])
+    assert os.path.exists(os.path.join(other.path, 'model'))
+    assert len(registry) == 1
+
+
+def test_local_nai_registry_failure(communities, tmpdir, monkeypatch):
+    pytest.importorskip('numpy')
+    pytest.importorskip('scipy')
+    schema, mappings = communities
+    registry = ModelRegistry(str(tmpdir.join('registry')))
+    ss = StellarSession('localhost', 0, backend=LocalCoordinator(str(tmpdir.join('work'))), registry=registry)
+    graph = ss.ingest(schema, mappings, 'people')
+    stored = ss.predict(graph, st.model.GCN(), 'group', 'Person', attributes_to_ignore=['age']).model.artifact
+
+    def fail(payload, output_path):
+        raise OSError('disk full')
+
+    monkeypatch.setattr('stellar.local.gcn.gcn', fail)
+    with pytest.raises(SessionError, match='disk full'):
+        ss.predict(graph, st.model.GCN(), 'group', 'Person', attributes_to_ignore=['age'])
+    assert len(registry) == 1
+    assert os.path.isdir(stored)
+
+
+@pytest.fixture()
+def people(tmpdir):
+    people = tmpdir.join('people.csv')
+    people.write('Id,name,city\n'
+                 'p1,Jonathan Smith,Canberra\n'
+                 'p2,Jonathon Smith,Canberra\n'
+                 'p3,Jonathan Smith,Sydney\n'
+                 'p4,Mary Jones,Canberra\n'
+                 'p5,jonathan  SMITH,canberra\n')
+    schema = st.create_schema().add_node_types({'Person': {'name': 'string', 'city': 'string'}})
+    return schema, schema.create_maps([
+        {'node_type': 'Person', 'path': str(people), 'column': 'Id', 'map_attributes': {'name': 'name', 'city': 'city'}}
+    ])
+
+
+def test_local_er_resolve():
+    pytest.importorskip('scipy')
+    from stellar.local.er import resolve
+    vertices = [{'id': str(i), 'meta': {'label': label}, 'data': {'name': name}} for i, (label, name) in enumerate([
+        ('A', 'Jonathan Smith'), ('A', 'Mary Jones'), ('B', 'Jonathan Smith'), ('A', 'Jonathan Smith '), ('A', ''),
+        ('A', '')])]
+    # vertices of different types are never duplicates, and neither are vertices without compared values
+    assert resolve(vertices, {'name': 0.9}, workers=1) == [(3, 0)]
+    assert resolve(vertices, {}, workers=1) == [(3, 0)]
+    assert resolve([], {'name': 0.9}) == []
+
+
+def test_local_er_workers(monkeypatch):
+    pytest.importorskip('scipy')
+    import stellar.local.er as local_er
+    vertices = [{'id': str(i), 'meta': {'label': 'A'}, 'data': {'name': 'name {}'.format(i % 4)}} for i in range(12)]
+    serial = local_er.resolve(vertices, {'name': 0.9}, workers=1)
+    monkeypatch.setattr(local_er, '_ROWS_PER_TASK', 5)
+    assert local_er.resolve(vertices, {'name': 0.9}, workers=2) == serial
+    assert serial == [(i, i % 4) for i in range(4, 12)]
+
+
+def test_local_er(people, tmpdir):
+    pytest.importorskip('scipy')
+    schema, mappings = people
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    payload = {'input': graph.path, 'label': 'er', 'parameters': {'attribute_thresholds': {'name': 0.6, 'city': 0.9}}}
+    from stellar.local.er import er, DUPLICATE_OF
+    resolved = StellarGraph(er(payload, str(tmpdir.join('er.epgm')), workers=1), 'er')
+    elements = resolved._load_epgm()
+    assert [g['meta']['label'] for g in elements['graphs']] == ['people', 'er']
+    ids = {v['id']: v['data'][ID_ATTRIBUTE] for v in elements['vertices']}
+    duplicates = sorted((ids[e['source']], ids[e['target']]) for e in elements['edges']
+                        if e['meta']['label'] == DUPLICATE_OF)
+    assert duplicates == [('p2', 'p1'), ('p5', 'p1')]
+    assert len(resolved.to_networkx().edges()) == 2
+
+
+def test_local_session_er(people, tmpdir):
+    pytest.importorskip('scipy')
+    schema, mappings = people
+    ss = st.create_local_session(str(tmpdir.join('work')))
+    graph = ss.ingest(schema, mappings, 'people')
+    # without thresholds, all string attributes are compared at the default threshold
+    assert ss.entity_resolution(graph, EntityResolution(), label='er').to_networkx().number_of_edges() == 1
+    resolved = ss.entity_resolution(graph, EntityResolution(blocking_keys=['name']), {'name': 0.6, 'city': 0.9})
+    assert resolved.to_networkx().number_of_edges() == 2
+    resolved = ss.entity_resolution(graph, EntityResolution(max_candidates=1), {'name': 0.6, 'city': 0.9})
+    assert resolved.to_networkx().number_of_edges() == 1
@@ -50,6 +50,14 @@ def test_nai_payload():
     assert payload.parameters['attributes_to_ignore'] == ['ignored_1', 'ignored_2']
     assert payload.label == 'test_nai'
     assert payload.pipelineFilename == 'pipeline_basic.json'
+    assert 'export_embeddings' not in payload.parameters
+    payload = StellarNAIPayload('test_session', graph, Node2Vec(), 'target_attr', 'type', [], 'test_nai',
+                                export_embeddings=True)
+    assert payload.parameters['export_embeddings'] is True
+    assert 'model_artifact' not in payload.parameters
+    model = Node2Vec().with_artifact('/models/node2vec')
+    payload = StellarNAIPayload('test_session', graph, model, 'target_attr', 'type', [], 'test_nai')
+    assert payload.parameters['model_artifact'] == '/models/node2vec'
 
 
 @pytest.fixture()
@@ -0,0 +1,78 @@
+"""Test for Local Node2Vec"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from stellar.local.node2vec import *
+
+
+@pytest.fixture()
+def path_graph():
+    """CSR adjacency of the path 0 - 1 - 2 - 3, and isolated node 4"""
+    indptr = np.array([0, 1, 3, 5, 6, 6])
+    indices = np.array([1, 0, 2, 1, 3, 2])
+    return indptr, indices
+
+
+def test_random_walks(path_graph):
+    indptr, indices = path_graph
+    walks = random_walks(indptr, indices, np.arange(5), 10, p=1.0, q=1.0, seed=1)
+    assert walks.shape == (5, 10)
+    assert (walks[4] == 4).all()
+    steps = np.abs(np.diff(walks[:4], axis=1))
+    assert (steps == 1).all()
+
+
+def test_random_walks_bias(path_graph):
+    indptr, indices = path_graph
+    starts = np.ones(2000, dtype=np.int64)
+    # after 1 -> 2, returning to 1 is 100 times less likely than moving on to 3
+    returns = random_walks(indptr, indices, starts, 3, p=100.0, q=1.0, seed=2)
+    returns = returns[returns[:, 1] == 2]
+    assert (returns[:, 2] == 1).mean() < 0.05
+    returns = random_walks(indptr, indices, starts, 3, p=0.01, q=1.0, seed=2)
+    returns = returns[returns[:, 1] == 2]
+    assert (returns[:, 2] == 1).mean() > 0.95
+
+
+def test_generate_walks_workers(path_graph, monkeypatch):
+    import stellar.local.node2vec as n2v
+    indptr, indices = path_graph
+    monkeypatch.setattr(n2v, '_WALKS_PER_TASK', 7)
+    serial = generate_walks(indptr, indices, 4, 5, 1.0, 1.0, workers=1, seed=3)
+    parallel = generate_walks(indptr, indices, 4, 5, 1.0, 1.0, workers=2, seed=3)
+    assert serial.shape == (20, 5)
+    assert (serial == parallel).all()
+
+
+def test_embed(path_graph):
+    indptr, indices = path_graph
+    walks = generate_walks(indptr, indices, 20, 10, 1.0, 1.0, workers=1, seed=4)
+    matrix = ppmi(walks, 5, 2)
+    assert (matrix.values > 0).all()
+    assert 4 not in matrix.rows
+    embeddings = embed(matrix, 3, seed=4)
+    assert embeddings.shape == (5, 3)
+    assert (embeddings[4] == 0).all()
@@ -0,0 +1,127 @@
+"""Test for Pipeline"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.pipeline import *
+from stellar.session import SessionError
+from stellar.model import Node2Vec, GCN
+from stellar.entity import EntityResolution
+import stellar as st
+from redis import StrictRedis
+import itertools
+import httpretty
+import pytest
+import json
+
+
+stellar_addr = "http://localhost:3000"
+stellar_addr_session = stellar_addr + "/init"
+
+
+def register_coordinator():
+    """Coordinator handing out unique session IDs and accepting all tasks"""
+    counter = itertools.count()
+
+    def init(request, uri, response_headers):
+        return [200, response_headers, json.dumps({'sessionId': 'sid{}'.format(next(counter))})]
+
+    httpretty.register_uri(httpretty.GET, stellar_addr_session, body=init)
+    for task in ['ingest', 'er', 'nai']:
+        httpretty.register_uri(httpretty.POST, stellar_addr + '/{}/start'.format(task))
+
+
+def completed(_, key):
+    """Redis state of a completed session, with output path derived from the session ID"""
+    out = {'output': key.split(':')[-1] + '.epgm', 'error': ''}
+    return json.dumps({'status': 'completed', 'ingest': out, 'er': out, 'nai': out})
+
+
+def build_pipeline():
+    schema = st.create_schema().add_node_type('Paper', {'venue': 'string'})
+    mappings = [schema.node['Paper'].create_map('papers.csv', 'Id', {'venue': 'venue'})]
+    return st.create_pipeline(st.create_session(url=stellar_addr))\
+        .ingest('ingest', schema, mappings, label='papers')\
+        .entity_resolution('er', 'ingest', EntityResolution())\
+        .predict('n2v', 'er', Node2Vec(), 'venue', 'Paper')\
+        .predict('gcn', 'er', GCN(), 'venue', 'Paper')
+
+
+@httpretty.activate
+def test_pipeline_run(monkeypatch):
+    register_coordinator()
+    monkeypatch.setattr(StrictRedis, 'get', completed)
+    pipeline = build_pipeline()
+    graphs = pipeline.run()
+    assert set(graphs.keys()) == {'ingest', 'er', 'n2v', 'gcn'}
+    assert graphs['ingest'].label == 'papers'
+    assert graphs['n2v'].label == 'papers'
+    assert graphs['gcn'].label == 'papers'
+    assert graphs['er'].path == pipeline.state['er'] + '.epgm'
+    assert len(set(pipeline.state.values())) == 4
+    assert set(pipeline.timings.keys()) == {'ingest', 'er', 'n2v', 'gcn'}
+    assert all(t >= 0 for t in pipeline.timings.values())
+
+
+@httpretty.activate
+def test_pipeline_resume(monkeypatch):
+    register_coordinator()
+    monkeypatch.setattr(StrictRedis, 'get', completed)
+    pipeline = build_pipeline()
+    graphs = pipeline.run(resume={'ingest': 'previous_ingest', 'er': 'previous_er'})
+    assert graphs['ingest'].path == 'previous_ingest.epgm'
+    assert graphs['er'].path == 'previous_er.epgm'
+    assert pipeline.state['ingest'] == 'previous_ingest'
+    inits = {r.path for r in httpretty.latest_requests() if r.method == 'POST'}
+    assert inits == {'/nai/start'}
+
+
+@httpretty.activate
+def test_pipeline_resume_failed(monkeypatch):
+    register_coordinator()
+
+    def get(_, key):
+        if key.endswith('previous_ingest'):
+            return json.dumps({'status': 'failed', 'ingest': {'output': '', 'error': 'failed'}})
+        return completed(_, key)
+
+    monkeypatch.setattr(StrictRedis, 'get', get)
+    pipeline = build_pipeline()
+    pipeline.run(resume={'ingest': 'previous_ingest'})
+    assert pipeline.state['ingest'] != 'previous_ingest'
+
+
+@httpretty.activate
+def test_pipeline_error(monkeypatch):
+    register_coordinator()
+    monkeypatch.setattr(StrictRedis, 'get',
+                        lambda *_: u'{"status": "aborted", "ingest": {"output": "", "error": "testing abort"}}')
+    with pytest.raises(SessionError):
+        build_pipeline().run()
+
+
+def test_pipeline_unknown_stage():
+    pipeline = st.create_pipeline(st.create_session(url=stellar_addr))
+    with pytest.raises(KeyError):
+        pipeline.entity_resolution('er', 'ingest', EntityResolution())
+    pipeline.entity_resolution('er', StellarGraph('graph.epgm', 'test'), EntityResolution())
+    with pytest.raises(KeyError):
+        pipeline.entity_resolution('er', StellarGraph('graph.epgm', 'test'), EntityResolution())
@@ -0,0 +1,99 @@
+"""Test for ModelRegistry"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.registry import *
+from stellar.model import Node2Vec, GCN
+from stellar.epgm import write_elements, graph_head
+import json
+import os
+
+
+def artifact(tmpdir, name, size=10):
+    path = tmpdir.join(name)
+    path.mkdir()
+    path.join('model.json').write(json.dumps({'pipeline': 'pipeline_gcn.json'}))
+    path.join('weights.npz').write('x' * size)
+    return str(path)
+
+
+def write_graph(path, vertices):
+    """Write a single-graph EPGM directory of Person vertices with the given data"""
+    write_elements(path, 'graphs', [graph_head('g', 'G')])
+    write_elements(path, 'vertices', [{'id': str(i), 'data': d, 'meta': {'label': 'Person', 'graphs': ['G']}}
+                                      for i, d in enumerate(vertices)])
+    write_elements(path, 'edges', [])
+    return StellarGraph(path, 'g')
+
+
+def test_key(tmpdir):
+    a = write_graph(str(tmpdir.join('a.epgm')), [{'risk': 1, 'x': 2}])
+    b = write_graph(str(tmpdir.join('b.epgm')), [{'risk': 3}, {'x': 4}])
+    assert ModelRegistry.key(GCN(), 'risk', 'Person', ['x', 'y'], a) == \
+        ModelRegistry.key(GCN(), 'risk', 'Person', ['y', 'x'], b)  # inductive, same schema
+    assert ModelRegistry.key(GCN(), 'risk', 'Person', [], a) != ModelRegistry.key(GCN(), 'age', 'Person', [], a)
+    assert ModelRegistry.key(Node2Vec(), 'risk', 'Person', [], a) != \
+        ModelRegistry.key(Node2Vec(), 'risk', 'Person', [], b)  # transductive
+    assert ModelRegistry.key(Node2Vec(), 'risk', 'Person', [], a) != \
+        ModelRegistry.key(Node2Vec(metric_learning=True), 'risk', 'Person', [], a)
+
+
+def test_key_schema(tmpdir):
+    a = write_graph(str(tmpdir.join('a.epgm')), [{'risk': 1, 'x': 2}])
+    c = write_graph(str(tmpdir.join('c.epgm')), [{'risk': 1, 'z': 2}])
+    assert ModelRegistry.key(GCN(), 'risk', 'Person', [], a) != ModelRegistry.key(GCN(), 'risk', 'Person', [], c)
+    missing = StellarGraph(str(tmpdir.join('missing.epgm')), 'g')  # not visible from the client
+    assert ModelRegistry.key(GCN(), 'risk', 'Person', [], missing) == \
+        ModelRegistry.key(GCN(), 'risk', 'Person', [], StellarGraph(str(tmpdir.join('other.epgm')), 'g'))
+
+
+def test_get_put(tmpdir):
+    registry = ModelRegistry(str(tmpdir.join('registry')))
+    assert registry.get('k1') is None
+    stored = registry.put('k1', artifact(tmpdir, 'a'))
+    assert stored != str(tmpdir.join('a'))
+    assert registry.get('k1') == stored
+    assert os.path.isfile(os.path.join(stored, 'weights.npz'))
+    assert len(ModelRegistry(str(tmpdir.join('registry')))) == 1
+    registry.remove('k1')
+    assert registry.get('k1') is None
+    assert not os.path.exists(stored)
+
+
+def test_lru_eviction(tmpdir):
+    registry = ModelRegistry(str(tmpdir.join('registry')), max_bytes=400)
+    for k in ['k1', 'k2', 'k3']:
+        registry.put(k, artifact(tmpdir, k, size=100))
+    registry.get('k1')  # k2 is now least recently used
+    registry.put('k4', artifact(tmpdir, 'k4', size=100))
+    assert len(registry) == 3
+    assert registry.get('k2') is None
+    assert not os.path.exists(str(tmpdir.join('registry', 'k2')))
+    assert all(registry.get(k) is not None for k in ['k1', 'k3', 'k4'])
+
+
+def test_clear(tmpdir):
+    registry = ModelRegistry(str(tmpdir.join('registry')))
+    stored = registry.put('k1', artifact(tmpdir, 'a'))
+    registry.clear()
+    assert len(registry) == 0
+    assert not os.path.exists(stored)
@@ -0,0 +1,130 @@
+"""Test for graph sampling"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.epgm import graph_head, iter_elements, write_elements
+from stellar.graph import StellarGraph
+from stellar.sampling import *
+import pytest
+
+
+@pytest.fixture
+def chain(tmpdir):
+    """Path 0 - 1 - ... - 9 of Person vertices, with a Location vertex linked to vertex 0"""
+    path = str(tmpdir.join('chain.epgm'))
+    write_elements(path, 'graphs', [graph_head('chain', 'G')])
+    vertices = [{'id': str(i), 'data': {'age': i}, 'meta': {'label': 'Person', 'graphs': ['G']}} for i in range(10)]
+    vertices.append({'id': 'loc', 'data': {}, 'meta': {'label': 'Location', 'graphs': ['G']}})
+    write_elements(path, 'vertices', vertices)
+    edges = [{'id': 'e{}'.format(i), 'source': str(i), 'target': str(i + 1), 'data': {},
+              'meta': {'label': 'knows', 'graphs': ['G']}} for i in range(9)]
+    edges.append({'id': 'eloc', 'source': '0', 'target': 'loc', 'data': {},
+                  'meta': {'label': 'lives-in', 'graphs': ['G']}})
+    write_elements(path, 'edges', edges)
+    return path
+
+
+def test_vertex_ids(chain):
+    assert len(vertex_ids(chain)) == 11
+    assert vertex_ids(chain, ['Location']) == ['loc']
+
+
+def test_k_hop(chain):
+    assert k_hop(chain, ['5'], 0) == {'5'}
+    assert k_hop(chain, ['5'], 2) == {'3', '4', '5', '6', '7'}
+    assert k_hop(chain, ['1'], 1) == {'0', '1', '2'}
+    assert k_hop(chain, ['1'], 2) == {'0', '1', '2', '3', 'loc'}
+    assert k_hop(chain, ['1'], 2, node_types=['Person']) == {'0', '1', '2', '3'}
+
+
+def test_uniform(chain):
+    sample = uniform(chain, 4, node_types=['Person'], seed=1)
+    assert len(sample) == 4
+    assert sample <= set(str(i) for i in range(10))
+    assert sample == uniform(chain, 4, node_types=['Person'], seed=1)
+    assert uniform(chain, 100) == set(vertex_ids(chain))
+
+
+def test_forest_fire(chain):
+    sample = forest_fire(chain, 5, seed=2)
+    assert len(sample) == 5
+    assert sample == forest_fire(chain, 5, seed=2)
+    assert forest_fire(chain, 100, seed=2) == set(vertex_ids(chain))
+    with pytest.raises(ValueError):
+        forest_fire(chain, 5, forward=1)
+
+
+def test_write_subgraph(chain, tmpdir):
+    out = str(tmpdir.join('out.epgm'))
+    assert write_subgraph(chain, {'0', '1', '2', 'loc'}, out, 'sample') == 4
+    graphs = list(iter_elements(out, 'graphs'))
+    assert [g['meta']['label'] for g in graphs] == ['chain', 'sample']
+    edges = list(iter_elements(out, 'edges'))
+    assert sorted(e['id'] for e in edges) == ['e0', 'e1', 'eloc']
+    assert all(e['meta']['graphs'] == ['G', graphs[-1]['id']] for e in edges)
+
+
+def test_graph_sampling(chain, tmpdir):
+    graph = StellarGraph(chain, 'chain')
+    g = graph.k_hop(['5'], 1, str(tmpdir.join('k_hop'))).to_networkx()
+    assert sorted(g.nodes()) == ['4', '5', '6']
+    assert g.number_of_edges() == 2
+
+    sub = graph.subgraph(['Person'], str(tmpdir.join('people')), label='people')
+    assert sub.label == 'people'
+    g = sub.to_networkx()
+    assert g.number_of_nodes() == 10
+    assert g.number_of_edges() == 9
+
+    for method in ['uniform', 'forest_fire']:
+        assert graph.sample(3, str(tmpdir.join(method)), method=method, seed=0).to_networkx().number_of_nodes() == 3
+    with pytest.raises(ValueError):
+        graph.sample(3, str(tmpdir.join('other')), method='snowball')
+
+
+@pytest.fixture
+def versions(tmpdir):
+    """Graph 'new' of vertices 1 and 2, added after graph 'old' also containing vertex 3, with two versions of 2"""
+    path = str(tmpdir.join('versions.epgm'))
+    write_elements(path, 'graphs', [graph_head('old', 'G1'), graph_head('new', 'G2')])
+    write_elements(path, 'vertices', [
+        {'id': '1', 'data': {}, 'meta': {'label': 'Person', 'graphs': ['G1', 'G2']}},
+        {'id': '2', 'data': {'v': 1}, 'meta': {'label': 'Person', 'graphs': ['G1', 'G2']}},
+        {'id': '3', 'data': {}, 'meta': {'label': 'Person', 'graphs': ['G1']}},
+        {'id': '2', 'data': {'v': 2}, 'meta': {'label': 'Person', 'graphs': ['G1', 'G2']}}
+    ])
+    write_elements(path, 'edges', [
+        {'id': 'a', 'source': '1', 'target': '2', 'data': {}, 'meta': {'label': 'knows', 'graphs': ['G1', 'G2']}},
+        {'id': 'b', 'source': '2', 'target': '3', 'data': {}, 'meta': {'label': 'knows', 'graphs': ['G1']}}
+    ])
+    return path
+
+
+def test_sampling_last_graph(versions, tmpdir):
+    assert vertex_ids(versions) == ['1', '2']
+    assert k_hop(versions, ['1'], 3) == {'1', '2'}
+    assert uniform(versions, 10) == {'1', '2'}
+    assert forest_fire(versions, 10, seed=0) == {'1', '2'}
+    out = str(tmpdir.join('out.epgm'))
+    assert write_subgraph(versions, {'1', '2', '3'}, out, 'sample') == 2
+    assert [(v['id'], v['data']) for v in iter_elements(out, 'vertices')] == [('1', {}), ('2', {'v': 2})]
+    assert [e['id'] for e in iter_elements(out, 'edges')] == ['a']
@@ -166,3 +166,156 @@ def test_start():
     task = session._start('test_task', lambda sid: Payload(sid, "test_label"))
     assert task._session_id == 'coordinator:sessions:test_session'
     assert task._name == 'test_task'
+
+
+def test_submit_many(monkeypatch):
+    ids = iter(range(3))
+    posted = []
+
+    def post(self, endpoint, data, compress=False):
+        posted.append(json.loads(data))
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    monkeypatch.setattr(StellarSession, '_get_session_id', lambda self: 's{}'.format(next(ids)))
+    monkeypatch.setattr(StellarSession, '_post', post)
+    session = StellarSession('12.12.12.12', 8000)
+    graph = StellarGraph('graph.epgm', 'test')
+    specs = [('nai', dict(graph=graph, model=StellarMLModel({}), target_attribute=attr, node_type='type',
+                          attributes_to_ignore=[], label='nai')) for attr in ['a', 'b', 'c']]
+    tasks = session.submit_many(specs, max_in_flight=2)
+    assert len(tasks) == 3
+    assert all(t._name == 'nai' for t in tasks)
+    assert sorted(t._session_id for t in tasks) == ['coordinator:sessions:s0', 'coordinator:sessions:s1',
+                                                     'coordinator:sessions:s2']
+    assert sorted(p['parameters']['target_attribute'] for p in posted) == ['a', 'b', 'c']
+
+
+@httpretty.activate
+def test_submit_many_order():
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"sid"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/er/start')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/nai/start')
+    session = StellarSession('12.12.12.12', 8000)
+    graph = StellarGraph('graph.epgm', 'test')
+    specs = [
+        ('er', dict(graph=graph, resolver=StellarEntityResolver({}), attribute_thresholds={}, label='er')),
+        ('nai', dict(graph=graph, model=StellarMLModel({}), target_attribute='a', node_type='type',
+                     attributes_to_ignore=[], label='nai'))
+    ]
+    tasks = session.submit_many(specs)
+    assert [t._name for t in tasks] == ['er', 'nai']
+
+
+@httpretty.activate
+def test_submit_many_retry(monkeypatch):
+    monkeypatch.setattr(StellarSession, '_RETRY_BACKOFF', 0)
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/er/start',
+                           responses=[httpretty.Response(body='', status=503), httpretty.Response(body='')])
+    session = StellarSession('12.12.12.12', 8000)
+    specs = [('er', dict(graph=StellarGraph('graph.epgm', 'test'), resolver=StellarEntityResolver({}),
+                         attribute_thresholds={}, label='er'))]
+    tasks = session.submit_many(specs, retries=1)
+    assert tasks[0]._session_id == 'coordinator:sessions:test_session'
+
+
+@httpretty.activate
+def test_submit_many_no_retry_client_error(monkeypatch):
+    monkeypatch.setattr(StellarSession, '_RETRY_BACKOFF', 0)
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/er/start',
+                           responses=[httpretty.Response(body='', status=400), httpretty.Response(body='')])
+    session = StellarSession('12.12.12.12', 8000)
+    specs = [('er', dict(graph=StellarGraph('graph.epgm', 'test'), resolver=StellarEntityResolver({}),
+                         attribute_thresholds={}, label='er'))]
+    with pytest.raises(SessionError):
+        session.submit_many(specs, retries=3)
+    with pytest.raises(ValueError):
+        session.submit_many([('bad', {})])
+
+
+def test_sweep_start_error(monkeypatch):
+    def post(self, endpoint, data, compress=False):
+        response = requests.Response()
+        response.status_code = 400
+        response.reason = 'Bad Request'
+        return response
+
+    monkeypatch.setattr(StellarSession, '_get_session_id', lambda self: 'sid')
+    monkeypatch.setattr(StellarSession, '_post', post)
+    session = StellarSession('12.12.12.12', 8000)
+    table = session.sweep(StellarGraph('graph.epgm', 'test'), [StellarMLModel({'pipelineFilename': 'p.json'})],
+                          ['a', 'b'], 'type')
+    assert [(r['target_attribute'], r['success'], r['reason']) for r in table] == [('a', False, 'Bad Request'),
+                                                                                  ('b', False, 'Bad Request')]
+    assert table[0]['pipeline'] == 'p.json'
+
+
+def test_session_id_pool():
+    ids = iter('abcdefgh')
+    pool = SessionIdPool(lambda: next(ids), size=2, ttl=60)
+    pool.refill()
+    assert len(pool) == 2
+    assert pool.take() == 'a'
+    pool.close()
+
+
+def test_session_id_pool_stale():
+    ids = iter(range(100))
+    pool = SessionIdPool(lambda: str(next(ids)), size=2, ttl=0.01)
+    pool.refill()
+    time.sleep(0.05)
+    assert pool.take() not in ('0', '1')  # buffered ids are stale, so a new one is fetched
+    pool.close()
+
+
+def test_session_id_pool_empty():
+    def fail():
+        raise SessionError(500, "unavailable")
+    pool = SessionIdPool(fail, size=2, ttl=60)
+    pool.refill()
+    assert len(pool) == 0
+    with pytest.raises(SessionError):
+        pool.take()
+    pool.close()
+
+
+@httpretty.activate
+def test_start_prefetch():
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/test_task/start')
+    session = StellarSession('12.12.12.12', 8000, prefetch=2)
+    session._id_pool.refill()
+    assert len(session._id_pool) == 2
+    task = session._start('test_task', lambda sid: Payload(sid, "test_label"))
+    assert task._session_id == 'coordinator:sessions:test_session'
+    session.close()
+    assert session._id_pool is None
+
+
+def test_payload_to_json_compact():
+    payload = Payload('sid', 'label')
+    assert payload.to_json(compact=True) == '{"sessionId":"sid","label":"label"}'
+    assert json.loads(payload.to_json()) == json.loads(payload.to_json(compact=True))
+
+
+@httpretty.activate
+def test_session_post_compressed():
+    httpretty.register_uri(httpretty.POST, 'http://12341234:5000/endpt')
+    session = StellarSession('12341234', 5000)
+    session._post('endpt', u'{"somekey": "someval"}', compress=True)
+    request = httpretty.last_request()
+    assert request.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(request.body).decode('utf-8')) == {'somekey': 'someval'}
+
+
+@httpretty.activate
+def test_start_compact():
+    httpretty.register_uri(httpretty.GET, 'http://12.12.12.12:8000/init', body=u'{"sessionId":"test_session"}')
+    httpretty.register_uri(httpretty.POST, 'http://12.12.12.12:8000/test_task/start')
+    StellarSession('12.12.12.12', 8000, compact=True)._start('test_task', lambda sid: Payload(sid, "test_label"))
+    assert httpretty.last_request().body == b'{"sessionId":"test_session","label":"test_label"}'
+    StellarSession('12.12.12.12', 8000, compress=True)._start('test_task', lambda sid: Payload(sid, "test_label"))
+    assert gzip.decompress(httpretty.last_request().body) == b'{"sessionId":"test_session","label":"test_label"}'
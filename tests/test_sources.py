@@ -0,0 +1,160 @@
+"""Test for Sources"""
+
+__copyright__ = """
+
+    This file is part of stellar-py, Stellar Python Client.
+
+    Copyright 2018 CSIRO Data61
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+
+"""
+__license__ = "Apache 2.0"
+
+from stellar.sources import *
+import pytest
+import os
+
+
+@pytest.fixture()
+def papers_csv(tmpdir):
+    f = tmpdir.join('papers.csv')
+    f.write('Id,title,year\n1,"Graphs, and more",2001\n2,Nodes,2002\n3,Edges\n4,Walks,200x\n')
+    return str(f)
+
+
+def test_read_header(papers_csv):
+    assert read_header(papers_csv) == ['Id', 'title', 'year']
+
+
+def test_read_chunks(papers_csv):
+    chunks = list(read_chunks(papers_csv, chunk_size=3))
+    assert [start for start, _ in chunks] == [0, 3]
+    assert chunks[0][1]['title'] == ['Graphs, and more', 'Nodes', 'Edges']
+    assert chunks[0][1]['year'] == ['2001', '2002', '']
+    assert chunks[1][1]['Id'] == ['4']
+
+
+def test_read_chunks_limit(papers_csv):
+    chunks = list(read_chunks(papers_csv, chunk_size=3, limit=2))
+    assert len(chunks) == 1
+    assert chunks[0][1]['Id'] == ['1', '2']
+
+
+def test_invalid_values():
+    assert invalid_values(['1', '-2', '', '3.5', 'x'], 'integer') == [3, 4]
+    assert invalid_values(['1', '-2.5', '1e3', '.5', 'x'], 'double') == [4]
+    assert invalid_values(['true', 'False', 'yes'], 'boolean') == [2]
+    assert invalid_values(['anything'], 'string') == []
+
+
+def test_read_chunks_stats(papers_csv):
+    stats = SourceStats(papers_csv)
+    list(read_chunks(papers_csv, stats=stats))
+    assert stats.rows == 4
+    assert stats.bytes == os.path.getsize(papers_csv)
+
+
+def test_source_scanner(papers_csv, tmpdir):
+    other = tmpdir.join('other.csv')
+    other.write('Id\n1\n2\n')
+    seen = []
+    scanner = SourceScanner(chunk_size=2)
+    scanner.add(papers_csv, lambda start, chunk: seen.append(('a', start, chunk['Id'])))
+    scanner.add(papers_csv, lambda start, chunk: seen.append(('b', start, chunk['Id'])))
+    scanner.add(str(other))
+    stats = scanner.scan()
+    assert seen == [('a', 0, ['1', '2']), ('b', 0, ['1', '2']), ('a', 2, ['3', '4']), ('b', 2, ['3', '4'])]
+    assert list(stats.keys()) == [papers_csv, str(other)]
+    assert stats[str(other)].rows == 2
+    assert stats[str(other)].bytes == 7
+
+
+def test_source_scanner_reads_once(papers_csv, monkeypatch):
+    import stellar.sources
+    calls = []
+    read = stellar.sources.read_chunks
+    monkeypatch.setattr(stellar.sources, 'read_chunks', lambda path, *args: calls.append(path) or read(path, *args))
+    scanner = SourceScanner()
+    for _ in range(3):
+        scanner.add(papers_csv, lambda start, chunk: None)
+    scanner.scan()
+    assert calls == [papers_csv]
+
+
+def test_profile_sources(papers_csv):
+    class Mapping:
+        path = papers_csv
+    stats = profile_sources([Mapping(), Mapping()])
+    assert len(stats) == 1
+    assert stats[papers_csv].rows == 4
+
+
+def test_split_csv(tmpdir):
+    source = tmpdir.join('big.csv')
+    source.write('Id,text\n' + ''.join('{},"row\n{}"\n'.format(i, i) for i in range(100)))
+    shards = split_csv(str(source), 3, str(tmpdir.join('shards')))
+    assert [os.path.basename(s) for s in shards] == ['big.part0000.csv', 'big.part0001.csv', 'big.part0002.csv']
+    ids = [chunk['Id'] for s in shards for _, chunk in read_chunks(s)]
+    assert all(20 < len(i) < 45 for i in ids)
+    assert sum(ids, []) == [str(i) for i in range(100)]
+    assert list(read_chunks(shards[0]))[0][1]['text'][0] == 'row\n0'
+
+
+def test_split_csv_small(tmpdir):
+    source = tmpdir.join('small.csv')
+    source.write('Id\n1\n')
+    shards = split_csv(str(source), 3, str(tmpdir.join('shards')))
+    assert [read_header(s) for s in shards] == [['Id']] * 3
+    assert sum(len(list(read_chunks(s))) for s in shards) == 1
+
+
+def test_write_known_ids(tmpdir):
+    source = tmpdir.join('edges.csv')
+    source.write('Source,Target\na,b\nb,c\na,x\n')
+    known = {'A': {'a', 'b'}, 'B': {'b', 'c'}}
+    files = write_known_ids([(str(source), 'Source', 'A'), (str(source), 'Target', 'B')],
+                            lambda t, ids: known[t].intersection(ids), str(tmpdir.join('ids')), 'Id', chunk_size=2)
+    assert sorted(files) == ['A', 'B']
+    assert [i for _, chunk in read_chunks(files['A']) for i in chunk['Id']] == ['a', 'b']
+    assert [i for _, chunk in read_chunks(files['B']) for i in chunk['Id']] == ['b', 'c']
+    assert write_known_ids([(str(source), 'Source', 'A')], lambda t, ids: set(), str(tmpdir.join('none')), 'Id') == {}
+
+
+def test_parse_values():
+    assert parse_values(['1', '', 'x', ' 2 '], 'integer') == [1, None, None, 2]
+    assert parse_values(['1.5', '1e3'], 'double') == [1.5, 1000.0]
+    assert parse_values(['true', 'False', 'no'], 'boolean') == [True, False, None]
+    assert parse_values(['a', ''], 'string') == ['a', None]
+
+
+def test_reservoir_sample(tmpdir):
+    path = tmpdir.join('rows.csv')
+    path.write('n\n' + ''.join('{}\n'.format(i) for i in range(1000)))
+    stats = SourceStats(str(path))
+    sample = reservoir_sample(str(path), 50, seed=1, stats=stats)
+    assert len(sample['n']) == len(set(sample['n'])) == 50
+    assert stats.rows == 1000
+    assert sample == reservoir_sample(str(path), 50, seed=1)
+    assert max(int(n) for n in sample['n']) >= 50
+    assert reservoir_sample(str(path), 50, limit=10)['n'] == [str(i) for i in range(10)]
+
+
+def test_infer_type():
+    assert infer_type(['1', ' 2', '']) == ('integer', 1.0)
+    assert infer_type(['1', '2.5', '-3e2']) == ('float', 1.0)
+    assert infer_type(['True', 'false']) == ('boolean', 1.0)
+    assert infer_type(['', '']) == ('string', 0.0)
+    assert infer_type(['1', '2', '3', 'x']) == ('string', 0.25)
+    assert infer_type(['1', '2', '3', 'x'], min_confidence=0.75) == ('integer', 0.75)
+    assert count_matches(['1\n2', '3'], 'integer') == 1